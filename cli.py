@@ -625,7 +625,16 @@ def cmd_clean(args):
             cleaned.append(str(pyc))
         
         print_success(f"{len(cleaned)} fichiers de cache supprimés")
-    
+
+        print_info("Suppression du cache des résultats de requêtes...")
+        from src.database.result_cache import DEFAULT_CACHE_PATH, purge_result_cache
+        if purge_result_cache():
+            print_success(f"Cache de requêtes supprimé ({DEFAULT_CACHE_PATH})")
+        from src.database.cost_model import DEFAULT_COST_MODEL_PATH
+        if DEFAULT_COST_MODEL_PATH.exists():
+            DEFAULT_COST_MODEL_PATH.unlink()
+            print_success(f"Modèles de coût supprimés ({DEFAULT_COST_MODEL_PATH})")
+
     if args.logs or args.all:
         print_info("Nettoyage des logs...")
         logs_dir = ROOT_DIR / "logs"
@@ -1115,7 +1124,7 @@ Pour plus d'aide sur une commande:
     # ========== clean ==========
     parser_clean = subparsers.add_parser('clean', help='Nettoyer le projet')
     parser_clean.add_argument('--all', action='store_true', help='Tout nettoyer')
-    parser_clean.add_argument('--cache', action='store_true', help='Caches Python')
+    parser_clean.add_argument('--cache', action='store_true', help='Caches Python, cache des résultats de requêtes et modèles de coût')
     parser_clean.add_argument('--logs', action='store_true', help='Fichiers log')
     parser_clean.add_argument('--results', action='store_true', help='Résultats')
     parser_clean.add_argument('--build', action='store_true', help='Artefacts de build')
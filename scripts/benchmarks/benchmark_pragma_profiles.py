@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Benchmark script to compare SQLite PRAGMA profiles in MATILDA.
+
+Each profile (see database.database_connection_manager.PRAGMA_PROFILES) is
+applied to every pooled connection, then a bounded MATILDA discovery is run
+on each database.
+
+Metrics measured:
+- Total runtime
+- Number of rules discovered
+- Number of distinct join queries compiled (statement cache misses)
+- Peak memory usage
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / 'src'))
+
+from algorithms.matilda import MATILDA
+from database.alchemy_utility import AlchemyUtility
+from database.database_connection_manager import PRAGMA_PROFILES
+
+
+def benchmark_profile(db_path: str, profile: str, max_table: int = 3,
+                      max_vars: int = 4, max_rules: int = None,
+                      timeout: int = 300) -> Dict[str, Any]:
+    """
+    Benchmark a single PRAGMA profile on a database.
+
+    :param db_path: Path to database file.
+    :param profile: Name of the PRAGMA profile.
+    :param max_table: Maximum number of tables per rule.
+    :param max_vars: Maximum number of variables per rule.
+    :param max_rules: Maximum number of rules to discover (None = unlimited).
+    :param timeout: Maximum time in seconds (None = no timeout).
+    :return: Dictionary with benchmark results.
+    """
+    print(f"\nBenchmarking profile '{profile}' on {os.path.basename(db_path)}")
+
+    tracemalloc.start()
+    start_time = time.time()
+    rules = 0
+    try:
+        with AlchemyUtility(f"sqlite:///{db_path}", create_index=False, create_csv=False,
+                            create_tsv=False, get_data=False, pragma_profile=profile) as db:
+            matilda = MATILDA(db)
+            for _ in matilda.discover_rules(max_table=max_table, max_vars=max_vars):
+                rules += 1
+                if max_rules and rules >= max_rules:
+                    break
+                if timeout and time.time() - start_time > timeout:
+                    print(f"  Timeout reached after {timeout}s")
+                    break
+            query_utility = db.query_utility
+            cache_misses = query_utility.cache_misses
+            cache_hits = query_utility.cache_hits
+        total_time = time.time() - start_time
+        _, peak = tracemalloc.get_traced_memory()
+        result = {
+            'database': db_path,
+            'profile': profile,
+            'metrics': {
+                'total_rules_discovered': rules,
+                'total_time_seconds': total_time,
+                'statement_cache_misses': cache_misses,
+                'statement_cache_hits': cache_hits,
+                'peak_memory_mb': peak / (1024 * 1024),
+            },
+        }
+        print(f"  {rules} rules in {total_time:.2f}s")
+        return result
+    except Exception as e:
+        print(f"  ERROR: {e}")
+        return {'database': db_path, 'profile': profile, 'error': str(e)}
+    finally:
+        tracemalloc.stop()
+
+
+def print_summary(results: List[Dict[str, Any]]):
+    """Print a comparison table of the benchmark results."""
+    print("\n" + "=" * 80)
+    print(f"{'Database':<30} {'Profile':<12} {'Rules':<8} {'Time (s)':<10} {'Speedup':<8}")
+    print("=" * 80)
+    baselines = {
+        r['database']: r['metrics']['total_time_seconds']
+        for r in results if 'error' not in r and r['profile'] == 'default'
+    }
+    for result in results:
+        name = os.path.basename(result['database'])
+        if 'error' in result:
+            print(f"{name:<30} {result['profile']:<12} {'ERROR':<8}")
+            continue
+        metrics = result['metrics']
+        baseline = baselines.get(result['database'])
+        speedup = (f"{baseline / metrics['total_time_seconds']:.2f}x"
+                   if baseline and metrics['total_time_seconds'] else '-')
+        print(f"{name:<30} {result['profile']:<12} "
+              f"{metrics['total_rules_discovered']:<8} "
+              f"{metrics['total_time_seconds']:<10.2f} {speedup:<8}")
+    print("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark SQLite PRAGMA profiles for MATILDA discovery.',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Compare all profiles on the large-scale databases
+  python scripts/benchmarks/benchmark_pragma_profiles.py
+
+  # Compare two profiles on a single database
+  python scripts/benchmarks/benchmark_pragma_profiles.py data/db/BupaImperfect.db --profiles default fast_read
+        """
+    )
+    parser.add_argument('databases', nargs='*',
+                        help='SQLite database files (default: data/large_scale/*.db)')
+    parser.add_argument('--profiles', nargs='+', choices=sorted(PRAGMA_PROFILES),
+                        default=['default', 'fast_read', 'read_only', 'low_memory'],
+                        help='PRAGMA profiles to compare')
+    parser.add_argument('--output-dir', default='results/benchmarks',
+                        help='Output directory for results (default: results/benchmarks)')
+    parser.add_argument('--max-table', type=int, default=3,
+                        help='Maximum tables per rule (default: 3)')
+    parser.add_argument('--max-vars', type=int, default=4,
+                        help='Maximum variables per rule (default: 4)')
+    parser.add_argument('--max-rules', type=int, default=None,
+                        help='Maximum rules to discover per run (default: unlimited)')
+    parser.add_argument('--timeout', type=int, default=300,
+                        help='Timeout in seconds per run (default: 300)')
+
+    args = parser.parse_args()
+
+    databases = args.databases or sorted(glob.glob('data/large_scale/*.db'))
+    if not databases:
+        print("ERROR: No database given and none found in data/large_scale/")
+        return 1
+
+    results = []
+    for db_path in databases:
+        if not os.path.exists(db_path):
+            print(f"ERROR: Database file not found: {db_path}")
+            continue
+        for profile in args.profiles:
+            results.append(benchmark_profile(
+                db_path, profile,
+                max_table=args.max_table,
+                max_vars=args.max_vars,
+                max_rules=args.max_rules,
+                timeout=args.timeout,
+            ))
+
+    print_summary(results)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    timestamp = time.strftime('%Y%m%d_%H%M%S')
+    output_file = os.path.join(args.output_dir, f'pragma_profiles_{timestamp}.json')
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to: {output_file}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -29,7 +29,6 @@ sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 
 from algorithms.matilda import MATILDA
 from database.alchemy_utility import AlchemyUtility
-from heuristics.path_search import create_heuristic
 
 
 def benchmark_algorithm(db_path: str, algorithm: str, heuristic: str = None, 
@@ -71,13 +70,13 @@ def benchmark_algorithm(db_path: str, algorithm: str, heuristic: str = None,
             'max_table': max_table,
             'max_vars': max_vars,
         }
+        if timeout:
+            # MATILDA stops by itself and returns the rules found so far.
+            kwargs['timeout'] = timeout
         
         # Add heuristic for A-star
         if algorithm == 'astar' and heuristic:
-            from algorithms.MATILDA.tgd_discovery import init
-            cg, mapper, _ = init(db, max_nb_occurrence=1)
-            heuristic_func = create_heuristic(db, mapper, heuristic)
-            kwargs['heuristic_func'] = heuristic_func
+            kwargs['astar_heuristic'] = heuristic
         
         # Discover rules
         rule_count = 0
@@ -135,6 +134,7 @@ def benchmark_algorithm(db_path: str, algorithm: str, heuristic: str = None,
                 'peak_memory_mb': round(peak / (1024 * 1024), 2),
                 'current_memory_mb': round(current / (1024 * 1024), 2),
             },
+            'discovery_summary': matilda.discovery_summary,
             'rules': rules_discovered[:10],  # Save first 10 rules as examples
         }
         
@@ -162,9 +162,15 @@ class StressTest:
                 print(f"Warning: Could not extract monitoring data: {monitor_err}")
                 pass
             
+            # A run stopped by its timeout is a partial result, not a failure.
+            summary = matilda.discovery_summary or {}
+            
             # Results
             result = {
                 'success': True,
+                'completed': summary.get('completed', True),
+                'stop_reason': summary.get('stop_reason'),
+                'unexplored_paths': summary.get('unexplored_paths', 0),
                 'runtime_seconds': round(elapsed, 2),
                 'num_rules': len(rules),
                 'rules_per_second': round(len(rules) / elapsed, 2) if elapsed > 0 else 0,
@@ -175,7 +181,10 @@ class StressTest:
             }
             
             print(f"\n{'='*70}")
-            print(f"✅ MATILDA COMPLETED")
+            if result['completed']:
+                print(f"✅ MATILDA COMPLETED")
+            else:
+                print(f"⏱️  MATILDA STOPPED ({result['stop_reason']}), PARTIAL RESULTS")
             print(f"{'='*70}")
             print(f"Runtime:         {elapsed:.2f}s")
             print(f"Rules found:     {len(rules)}")
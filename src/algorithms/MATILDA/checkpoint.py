@@ -0,0 +1,172 @@
+import gzip
+import itertools
+import logging
+import os
+import pickle
+import time
+from typing import Any, Optional
+
+# Seconds between two checkpoints when resuming without an interval.
+DEFAULT_CHECKPOINT_INTERVAL = 60
+
+# Bumped when the content of the checkpoints changes; older ones are not resumed.
+CHECKPOINT_VERSION = 2
+
+
+class DiscoveryCheckpoint:
+    """
+    Periodic snapshots of a sequential discovery run, from which a later run
+    resumes with the same final results.
+
+    The traversal explores the start nodes of the constraint graph one after
+    the other, in a fixed order and each from scratch, so its position is a
+    cursor: the index of the current start node and the number of its
+    candidates already evaluated. A snapshot holds the cursor and what the
+    evaluated candidates produced: the rules (or the top-k heap), the splits
+    that exceeded the query budget, the number of rules found and the rules
+    indexed for subsumption. On resume,
+    the start nodes before the cursor are skipped and the traversal of the
+    current one is replayed up to the cursor without evaluating its candidates.
+
+    ``mark`` records the state between two candidates and ``save`` writes the
+    last marked state, so an interrupted candidate is evaluated again on resume
+    and none of its rules are duplicated. Snapshots are gzip-compressed pickles,
+    written atomically.
+
+    :param path: The checkpoint file.
+    :param interval: Seconds between two snapshots.
+    :param settings: What the results depend on (settings, database fingerprint);
+                     a checkpoint taken with other settings is not resumed.
+    """
+
+    def __init__(self, path: str, interval: float, settings: dict):
+        self.path = path
+        self.interval = interval
+        self.settings = settings
+        self.start_index = 0
+        self.position = 0
+        # A list, or a SpillableList under a memory budget.
+        self.rules = []
+        self.saves = 0
+        self.overhead_seconds = 0.0
+        self.size = 0
+        self._skip = 0
+        self._marked: Optional[dict] = None
+        self._subsumption: Optional[list] = None
+        self._last_save = time.monotonic()
+
+    def restore(self) -> Optional[dict]:
+        """
+        Load the checkpoint and move the cursor to it. Returns the saved state
+        (``rules``, ``top_k``, ``budget_exceeded``, ``rules_found``, ``subsumption``,
+        ``completed``),
+        or None if there is no checkpoint for these settings.
+        """
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with gzip.open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            logging.warning(f"Unreadable checkpoint {self.path}, starting from scratch: {e}")
+            return None
+        if state.get("version") != CHECKPOINT_VERSION or state.get("settings") != self.settings:
+            logging.warning(f"The checkpoint {self.path} was taken with other settings, starting from scratch.")
+            return None
+        self.start_index = state["start_index"]
+        self.position = self._skip = state["position"]
+        self.rules = list(state["rules"])
+        self._subsumption = state["subsumption"]
+        self._marked = dict(
+            state,
+            rules=len(self.rules),
+            subsumption=len(self._subsumption) if self._subsumption is not None else None,
+        )
+        return state
+
+    def start_node(self, index: int):
+        """Move the cursor to a start node (the traversal's start_callback)."""
+        if index != self.start_index:
+            self._skip = 0
+        self.start_index = index
+        self.position = 0
+
+    def skip(self) -> bool:
+        """True for the candidates of the current start node evaluated before the checkpoint."""
+        if self._skip == 0:
+            return False
+        self._skip -= 1
+        self.position += 1
+        return True
+
+    def mark(
+        self,
+        budget_exceeded: list,
+        rules_found: int,
+        top_k_state: Optional[tuple] = None,
+        evaluated: bool = False,
+        subsumption: Optional[list] = None,
+    ):
+        """
+        Record the state between two candidates, and save it if the interval has
+        passed since the last snapshot.
+
+        :param budget_exceeded: The splits that exceeded the query budget so far.
+        :param rules_found: The number of rules found so far.
+        :param top_k_state: The top-k heap (see TopKRules.state), if any.
+        :param evaluated: A candidate of the current start node was just evaluated.
+        :param subsumption: The records of the subsumption index (see SubsumptionIndex),
+                            if any; only appended to between two marks.
+        """
+        started = time.monotonic()
+        if evaluated:
+            self.position += 1
+        self._marked = {
+            "start_index": self.start_index,
+            "position": self.position,
+            "rules": len(self.rules),
+            "top_k": top_k_state,
+            "budget_exceeded": list(budget_exceeded),
+            "rules_found": rules_found,
+            "subsumption": len(subsumption) if subsumption is not None else None,
+        }
+        self._subsumption = subsumption
+        self.overhead_seconds += time.monotonic() - started
+        if started - self._last_save >= self.interval:
+            self.save()
+
+    def save(self, completed: bool = False):
+        """Write the last marked state; ``completed`` marks a finished run."""
+        if self._marked is None:
+            return
+        started = time.monotonic()
+        state: dict[str, Any] = dict(
+            self._marked,
+            rules=list(itertools.islice(self.rules, self._marked["rules"])),
+            subsumption=(
+                self._subsumption[:self._marked["subsumption"]]
+                if self._marked["subsumption"] is not None
+                else None
+            ),
+            completed=completed,
+            version=CHECKPOINT_VERSION,
+            settings=self.settings,
+        )
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with gzip.open(temporary, "wb", compresslevel=1) as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.path)
+        self.size = os.path.getsize(self.path)
+        self.saves += 1
+        self._last_save = time.monotonic()
+        self.overhead_seconds += self._last_save - started
+
+    def summary(self, elapsed: float) -> str:
+        """Number of snapshots and their overhead relative to the run time."""
+        share = f" ({self.overhead_seconds / elapsed:.1%} of the run)" if elapsed > 0 else ""
+        return (
+            f"Checkpoint {self.path}: {self.saves} snapshots, {self.size / 1024:.1f} KiB, "
+            f"{self.overhead_seconds:.3f}s overhead{share}"
+        )
@@ -0,0 +1,77 @@
+import time
+from typing import Callable, Optional
+
+from algorithms.MATILDA.candidate_rule_chains import CandidateRule
+from algorithms.MATILDA.constraint_graph import AttributeMapper
+
+
+class DiscoveryDeadline:
+    """
+    Wall-clock and query budgets of a discovery run, checked cooperatively by
+    the traversal and the split evaluation loops.
+
+    Once a budget has run out, ``expired`` stays true with the reason ("timeout"
+    or "query_budget"), the wrapped traversal pruning cuts every path it is asked
+    about without querying and counts it as unexplored, and discovery returns
+    the rules found so far.
+
+    :param timeout: Wall-clock budget in seconds, from the creation of the deadline.
+    :param max_queries: Budget of count and threshold queries.
+    :param query_count: Returns the number of queries executed so far (required
+                        with ``max_queries``).
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        max_queries: Optional[int] = None,
+        query_count: Optional[Callable[[], int]] = None,
+    ):
+        if max_queries is not None and query_count is None:
+            raise ValueError("A query budget needs a query count.")
+        self.start = time.monotonic()
+        self.deadline = self.start + timeout if timeout is not None else None
+        self.max_queries = max_queries
+        self.query_count = query_count
+        self._first_query = query_count() if query_count is not None else 0
+        self.reason: Optional[str] = None
+        self.unexplored_paths = 0
+
+    def queries(self) -> int:
+        """Number of queries executed since the deadline was created."""
+        return self.query_count() - self._first_query if self.query_count is not None else 0
+
+    def expired(self) -> bool:
+        """True once a budget has run out."""
+        if self.reason is None:
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.reason = "timeout"
+            elif self.max_queries is not None and self.queries() >= self.max_queries:
+                self.reason = "query_budget"
+        return self.reason is not None
+
+    def pruning(
+        self, pruning_prediction: Callable[[CandidateRule, AttributeMapper, object], bool]
+    ) -> Callable[[CandidateRule, AttributeMapper, object], bool]:
+        """
+        Wrap a traversal pruning function (True keeps the path) so that, once the
+        deadline has expired, every path is pruned and counted as unexplored.
+        """
+        def deadline_pruning(candidate_rule, mapper, db_inspector) -> bool:
+            if self.expired():
+                self.unexplored_paths += 1
+                return False
+            return pruning_prediction(candidate_rule, mapper, db_inspector)
+
+        return deadline_pruning
+
+    def summary(self, rules: int) -> dict:
+        """Outcome of the run: whether and why it stopped early, and what was left unexplored."""
+        return {
+            "completed": self.reason is None,
+            "stop_reason": self.reason,
+            "elapsed_seconds": round(time.monotonic() - self.start, 3),
+            "queries": self.queries(),
+            "rules": rules,
+            "unexplored_paths": self.unexplored_paths,
+        }
@@ -0,0 +1,126 @@
+"""
+Pipelined asynchronous evaluation of candidate rules for MATILDA.
+
+The traversal keeps generating candidates in a worker thread while the
+queries of earlier candidates are in flight on an asyncio event loop. The
+number of candidates in flight is bounded by a pipeline queue, and results
+are returned in traversal order, so the output matches the sequential
+evaluation.
+"""
+
+import asyncio
+import queue
+import threading
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from algorithms.MATILDA.constraint_graph import JoinableIndexedAttributes
+
+
+CandidateRule = list[JoinableIndexedAttributes]
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _next_candidate(candidates: Iterator[CandidateRule]) -> Optional[CandidateRule]:
+    # Traversals yield a path they keep mutating: copy it before resuming them.
+    candidate = next(candidates, None)
+    return list(candidate) if candidate is not None else None
+
+
+class EvaluationPipeline:
+    """
+    Evaluate candidate rules asynchronously while the traversal runs ahead.
+
+    :param evaluate: Coroutine function evaluating one candidate rule.
+    :param queue_size: Maximum number of candidates in flight.
+    :param on_start: Optional coroutine function run in the event loop before
+                     the first evaluation (e.g. to open an async connection pool).
+    :param on_stop: Optional coroutine function run in the event loop after the
+                    last evaluation.
+    """
+
+    def __init__(
+        self,
+        evaluate: Callable[[CandidateRule], Awaitable[Any]],
+        queue_size: int = 16,
+        on_start: Optional[Callable[[], Awaitable[None]]] = None,
+        on_stop: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        self.evaluate = evaluate
+        self.queue_size = queue_size
+        self.on_start = on_start
+        self.on_stop = on_stop
+
+    def run(self, candidates: Iterable[CandidateRule]) -> Iterator[tuple[CandidateRule, Any]]:
+        """
+        Yield (candidate_rule, evaluation result) pairs in traversal order.
+
+        :param candidates: Candidate rules, typically a traversal generator.
+        """
+        results = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        worker = threading.Thread(
+            target=self._worker, args=(iter(candidates), results, stop), daemon=True
+        )
+        worker.start()
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            stop.set()
+            # Unblock a worker waiting on a full result queue until it exits.
+            while worker.is_alive():
+                try:
+                    results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    def _worker(self, candidates: Iterator[CandidateRule], results: queue.Queue, stop: threading.Event):
+        try:
+            asyncio.run(self._pipeline(candidates, results, stop))
+        except BaseException as error:
+            results.put(_Failure(error))
+        else:
+            results.put(_DONE)
+
+    async def _pipeline(self, candidates: Iterator[CandidateRule], results: queue.Queue, stop: threading.Event):
+        loop = asyncio.get_running_loop()
+        in_flight = asyncio.Queue(maxsize=self.queue_size)
+
+        async def feed(traversal: ThreadPoolExecutor):
+            while not stop.is_set():
+                candidate = await loop.run_in_executor(traversal, _next_candidate, candidates)
+                if candidate is None:
+                    break
+                await in_flight.put((candidate, asyncio.ensure_future(self.evaluate(candidate))))
+            await in_flight.put(None)
+
+        async def drain():
+            while (item := await in_flight.get()) is not None:
+                candidate, task = item
+                result = await task
+                await loop.run_in_executor(None, results.put, (candidate, result))
+
+        if self.on_start is not None:
+            await self.on_start()
+        try:
+            # A single worker advances the traversal, which is not thread-safe.
+            with ThreadPoolExecutor(max_workers=1) as traversal:
+                await asyncio.gather(feed(traversal), drain())
+        finally:
+            if self.on_stop is not None:
+                await self.on_stop()
@@ -6,8 +6,6 @@ to explore the constraint graph and discover candidate rules.
 """
 
 import copy
-import heapq
-from collections import deque
 from collections.abc import Callable, Iterator
 from typing import Optional
 from algorithms.MATILDA.constraint_graph import (
@@ -17,6 +15,7 @@ from algorithms.MATILDA.constraint_graph import (
 )
 from database.alchemy_utility import AlchemyUtility
 from tqdm import tqdm
+from utils.memory_budget import MemoryBudget, SpillableHeap, SpillableQueue
 
 
 CandidateRule = list[JoinableIndexedAttributes]
@@ -33,6 +32,9 @@ def dfs(
     max_table: int = 3,
     max_vars: int = 4,
     next_node_test_func: Optional[Callable] = None,
+    backtrack_func: Optional[Callable[[CandidateRule], None]] = None,
+    start_index: int = 0,
+    start_callback: Optional[Callable[[int], None]] = None,
 ) -> Iterator[CandidateRule]:
     """
     Perform a Depth-First Search (DFS) traversal with pruning.
@@ -51,6 +53,12 @@ def dfs(
     :param max_table: Maximum number of tables allowed in a rule.
     :param max_vars: Maximum number of variables allowed in a rule.
     :param next_node_test_func: Function to test if a node can be added.
+    :param backtrack_func: Optional function called with the current path before
+                           the DFS backtracks from it (e.g. to release cached joins).
+    :param start_index: Without a start node, skip the start nodes before this index
+                        (in the iteration order of graph.nodes), e.g. to resume a run.
+    :param start_callback: Without a start node, called with the index of each start
+                           node before its traversal.
     :yield: Candidate rules found during traversal.
     """
     if visited is None:
@@ -59,8 +67,12 @@ def dfs(
         candidate_rule = []
     
     if start_node is None:
-        for next_node in tqdm(graph.nodes, desc="Initial Nodes (DFS)"):
+        for index, next_node in enumerate(tqdm(graph.nodes, desc="Initial Nodes (DFS)")):
+            if index < start_index:
+                continue
             if next_node_test_func(candidate_rule, next_node, visited, max_table, max_vars):
+                if start_callback is not None:
+                    start_callback(index)
                 yield from dfs(
                     graph,
                     next_node,
@@ -72,6 +84,7 @@ def dfs(
                     max_table=max_table,
                     max_vars=max_vars,
                     next_node_test_func=next_node_test_func,
+                    backtrack_func=backtrack_func,
                 )
         return
     
@@ -80,6 +93,8 @@ def dfs(
     
     # Apply pruning
     if not pruning_prediction(candidate_rule, mapper, db_inspector):
+        if backtrack_func is not None:
+            backtrack_func(candidate_rule)
         return
     
     yield candidate_rule
@@ -102,10 +117,14 @@ def dfs(
                 max_table=max_table,
                 max_vars=max_vars,
                 next_node_test_func=next_node_test_func,
+                backtrack_func=backtrack_func,
             )
             visited.remove(next_node)
             candidate_rule.pop()
 
+    if backtrack_func is not None:
+        backtrack_func(candidate_rule)
+
 
 def bfs(
     graph: ConstraintGraph,
@@ -116,6 +135,9 @@ def bfs(
     max_table: int = 3,
     max_vars: int = 4,
     next_node_test_func: Optional[Callable] = None,
+    start_index: int = 0,
+    start_callback: Optional[Callable[[int], None]] = None,
+    memory_budget: Optional[MemoryBudget] = None,
 ) -> Iterator[CandidateRule]:
     """
     Perform a Breadth-First Search (BFS) traversal with pruning.
@@ -132,13 +154,23 @@ def bfs(
     :param max_table: Maximum number of tables allowed in a rule.
     :param max_vars: Maximum number of variables allowed in a rule.
     :param next_node_test_func: Function to test if a node can be added.
+    :param start_index: Without a start node, skip the start nodes before this index
+                        (in the iteration order of graph.nodes), e.g. to resume a run.
+    :param start_callback: Without a start node, called with the index of each start
+                           node before its traversal.
+    :param memory_budget: Optional memory budget the queue registers with as "frontier";
+                          its tail is spilled to disk under memory pressure.
     :yield: Candidate rules found during traversal.
     """
     if start_node is None:
         # Initialize BFS from all nodes
-        for initial_node in tqdm(graph.nodes, desc="Initial Nodes (BFS)"):
+        for index, initial_node in enumerate(tqdm(graph.nodes, desc="Initial Nodes (BFS)")):
+            if index < start_index:
+                continue
+            if start_callback is not None:
+                start_callback(index)
             # Each starting node begins its own BFS
-            queue = deque([(initial_node, [], set())])
+            queue = _frontier(SpillableQueue([(initial_node, [], set())]), memory_budget)
             
             while queue:
                 current_node, candidate_rule, visited = queue.popleft()
@@ -168,7 +200,7 @@ def bfs(
                         queue.append((next_node, new_candidate_rule, new_visited))
     else:
         # BFS from a specific start node
-        queue = deque([(start_node, [], set())])
+        queue = _frontier(SpillableQueue([(start_node, [], set())]), memory_budget)
         
         while queue:
             current_node, candidate_rule, visited = queue.popleft()
@@ -208,6 +240,9 @@ def astar(
     max_vars: int = 4,
     next_node_test_func: Optional[Callable] = None,
     heuristic_func: Optional[Callable[[CandidateRule, AttributeMapper, AlchemyUtility], float]] = None,
+    start_index: int = 0,
+    start_callback: Optional[Callable[[int], None]] = None,
+    memory_budget: Optional[MemoryBudget] = None,
 ) -> Iterator[CandidateRule]:
     """
     Perform an A-star search traversal with pruning.
@@ -226,6 +261,12 @@ def astar(
     :param next_node_test_func: Function to test if a node can be added.
     :param heuristic_func: Heuristic function to estimate rule quality (lower is better).
                           If None, uses a default heuristic based on rule length.
+    :param start_index: Without a start node, skip the start nodes before this index
+                        (in the iteration order of graph.nodes), e.g. to resume a run.
+    :param start_callback: Without a start node, called with the index of each start
+                           node before its traversal.
+    :param memory_budget: Optional memory budget the priority queue registers with as
+                          "frontier"; its worst entries are spilled to disk under memory pressure.
     :yield: Candidate rules found during traversal.
     """
     if heuristic_func is None:
@@ -234,14 +275,18 @@ def astar(
     
     if start_node is None:
         # Initialize A-star from all nodes
-        for initial_node in tqdm(graph.nodes, desc="Initial Nodes (A*)"):
+        for index, initial_node in enumerate(tqdm(graph.nodes, desc="Initial Nodes (A*)")):
+            if index < start_index:
+                continue
+            if start_callback is not None:
+                start_callback(index)
             # Priority queue: (priority, counter, node, candidate_rule, visited)
             # Counter ensures stable ordering for equal priorities
             counter = 0
-            priority_queue = [(0, counter, initial_node, [], set())]
+            priority_queue = _frontier(SpillableHeap([(0, counter, initial_node, [], set())]), memory_budget)
             
             while priority_queue:
-                priority, _, current_node, candidate_rule, visited = heapq.heappop(priority_queue)
+                priority, _, current_node, candidate_rule, visited = priority_queue.pop()
                 
                 if current_node in visited:
                     continue
@@ -276,17 +321,16 @@ def astar(
                         priority = cost - heuristic  # Lower priority = explored first
                         
                         counter += 1
-                        heapq.heappush(
-                            priority_queue,
+                        priority_queue.push(
                             (priority, counter, next_node, new_candidate_rule, new_visited)
                         )
     else:
         # A-star from a specific start node
         counter = 0
-        priority_queue = [(0, counter, start_node, [], set())]
+        priority_queue = _frontier(SpillableHeap([(0, counter, start_node, [], set())]), memory_budget)
         
         while priority_queue:
-            priority, _, current_node, candidate_rule, visited = heapq.heappop(priority_queue)
+            priority, _, current_node, candidate_rule, visited = priority_queue.pop()
             
             if current_node in visited:
                 continue
@@ -316,12 +360,19 @@ def astar(
                     priority = cost - heuristic
                     
                     counter += 1
-                    heapq.heappush(
-                        priority_queue,
+                    priority_queue.push(
                         (priority, counter, next_node, new_candidate_rule, new_visited)
                     )
 
 
+def _frontier(frontier, memory_budget: Optional[MemoryBudget]):
+    """Register the frontier of a traversal with the memory budget, replacing the previous one."""
+    if memory_budget is not None:
+        frontier.spill_dir = memory_budget.spill_dir
+        memory_budget.register("frontier", frontier.memory_usage, frontier.release_memory)
+    return frontier
+
+
 def get_traversal_algorithm(algorithm_name: str):
     """
     Factory function to get the appropriate traversal algorithm.
@@ -0,0 +1,161 @@
+"""
+Per-table and per-column occurrence limits for MATILDA.
+
+Every compatible attribute pair yields a constraint graph node for each pair
+of table occurrences, so with ``nb_occurrence`` occurrences the graph holds
+about nb_occurrence² nodes per pair. Most extra occurrences are useless: a
+join on a column with one or two distinct values is almost a cross product,
+two occurrences of a table joined on a unique column are the same row, and a
+table that cannot join itself only needs a second occurrence for the rules
+going through another table. The limits derived here drop these occurrences
+before the graph is built.
+"""
+
+from collections import Counter
+from typing import Iterable, Optional, Union
+
+# Columns with at most this many distinct non-NULL values get a single occurrence.
+DEFAULT_LOW_NDV = 2
+
+# Occurrences kept for unique columns and tables that cannot join themselves.
+REDUCED_OCCURRENCES = 2
+
+
+def derive_occurrence_limits(
+    compatible_attributes: Iterable[tuple],
+    statistics,
+    max_nb_occurrence: int,
+    low_ndv: int = DEFAULT_LOW_NDV,
+    overrides: Optional[dict[str, Union[int, dict[str, int]]]] = None,
+    auto: bool = True,
+) -> tuple[dict[str, dict[str, int]], dict[str, dict[str, str]]]:
+    """
+    Number of occurrences of each column of the compatible attribute pairs.
+
+    With ``auto``, a column gets:
+    - 1 occurrence if it has at most ``low_ndv`` distinct non-NULL values;
+    - at most REDUCED_OCCURRENCES if it is unique (a key, or as many distinct values
+      as rows), or if its table cannot join itself (no compatible pair within the
+      table other than a unique column with itself).
+    ``overrides`` then set the limit of a whole table ({table: n}) or of columns
+    ({table: {column: n}}).
+
+    :param compatible_attributes: The compatible (Attribute, Attribute) pairs.
+    :param statistics: The StatisticsCatalog of the database.
+    :param max_nb_occurrence: The number of occurrences of every column without limits.
+    :return: The limits ({table: {column: occurrences}}) of the columns below
+             max_nb_occurrence, and the reason of each limit.
+    """
+    pairs = list(compatible_attributes)
+    attributes = {attribute for pair in pairs for attribute in pair}
+    limits: dict[str, dict[str, int]] = {}
+    reasons: dict[str, dict[str, str]] = {}
+
+    def limit(attribute, occurrences: int, reason: str):
+        current = limits.get(attribute.table, {}).get(attribute.name, max_nb_occurrence)
+        if occurrences < current:
+            limits.setdefault(attribute.table, {})[attribute.name] = occurrences
+            reasons.setdefault(attribute.table, {})[attribute.name] = reason
+
+    if auto:
+        unique = {attribute for attribute in attributes if _is_unique(attribute, statistics)}
+        self_joined = {
+            attr1.table
+            for attr1, attr2 in pairs
+            if attr1.table == attr2.table and not (attr1 == attr2 and attr1 in unique)
+        }
+        for attribute in sorted(attributes, key=lambda a: (a.table, a.name)):
+            if _distinct_values(attribute, statistics) <= low_ndv:
+                limit(attribute, 1, "low_ndv")
+            elif attribute in unique:
+                limit(attribute, REDUCED_OCCURRENCES, "unique")
+            elif attribute.table not in self_joined:
+                limit(attribute, REDUCED_OCCURRENCES, "no_self_join")
+
+    for table, override in (overrides or {}).items():
+        columns = override if isinstance(override, dict) else {
+            attribute.name: override for attribute in attributes if attribute.table == table
+        }
+        for column, occurrences in columns.items():
+            limits.setdefault(table, {})[column] = occurrences
+            reasons.setdefault(table, {})[column] = "override"
+    return limits, reasons
+
+
+def _distinct_values(attribute, statistics) -> int:
+    column = statistics.column_statistics(attribute.table, attribute.name)
+    if column is not None:
+        return column.distinct_count
+    # Counts NULL as a value: at worst one occurrence too many is kept.
+    return statistics.distinct_count(attribute.table, attribute.name)
+
+
+def _is_unique(attribute, statistics) -> bool:
+    if attribute.is_key:
+        return True
+    rows = statistics.row_count(attribute.table)
+    return rows > 1 and statistics.distinct_count(attribute.table, attribute.name) == rows
+
+
+def graph_size(
+    compatible_attributes: Iterable[tuple],
+    max_nb_occurrence: int,
+    limits: Optional[dict[str, dict[str, int]]] = None,
+) -> tuple[int, int]:
+    """
+    Number of nodes and edges of the constraint graph built by init under the
+    given limits, without building it. Two nodes are connected when they share
+    a table occurrence; a pair sharing two table occurrences is one edge.
+    """
+    limits = limits or {}
+
+    def occurrences(attribute) -> int:
+        return min(limits.get(attribute.table, {}).get(attribute.name, max_nb_occurrence), max_nb_occurrence)
+
+    nodes = set()
+    for attr1, attr2 in compatible_attributes:
+        for occurrence1 in range(occurrences(attr1)):
+            for occurrence2 in range(occurrences(attr2)):
+                ends = sorted([(attr1.table, occurrence1, attr1.name), (attr2.table, occurrence2, attr2.name)])
+                nodes.add(tuple(ends))
+    slots = Counter()
+    slot_pairs = Counter()
+    for end1, end2 in nodes:
+        slot1, slot2 = end1[:2], end2[:2]
+        slots[slot1] += 1
+        if slot2 != slot1:
+            slots[slot2] += 1
+            slot_pairs[(slot1, slot2)] += 1
+    edges = sum(n * (n - 1) // 2 for n in slots.values())
+    # Pairs of nodes over the same two table occurrences were counted twice.
+    edges -= sum(n * (n - 1) // 2 for n in slot_pairs.values())
+    return len(nodes), edges
+
+
+def occurrence_limits_report(
+    compatible_attributes: Iterable[tuple],
+    max_nb_occurrence: int,
+    limits: dict[str, dict[str, int]],
+    reasons: dict[str, dict[str, str]],
+) -> dict:
+    """
+    The limits with their reasons, and the size of the constraint graph without and
+    with them. Its edges are the candidates of two nodes the traversal can build.
+    """
+    pairs = list(compatible_attributes)
+    nodes_before, edges_before = graph_size(pairs, max_nb_occurrence)
+    nodes_after, edges_after = graph_size(pairs, max_nb_occurrence, limits)
+    return {
+        "max_nb_occurrence": max_nb_occurrence,
+        "limits": {
+            table: {
+                column: {"occurrences": occurrences, "reason": reasons[table][column]}
+                for column, occurrences in sorted(columns.items())
+            }
+            for table, columns in sorted(limits.items())
+        },
+        "nodes_before": nodes_before,
+        "nodes_after": nodes_after,
+        "edges_before": edges_before,
+        "edges_after": edges_after,
+    }
@@ -0,0 +1,119 @@
+from algorithms.MATILDA.candidate_rule_chains import (
+    CandidateRule,
+    CandidateRuleChains,
+    TableOccurrence,
+)
+from algorithms.MATILDA.constraint_graph import (
+    Attribute,
+    AttributeMapper,
+    IndexedAttribute,
+)
+
+JoinCondition = tuple[str, int, str, str, int, str]
+
+
+class RulePlan:
+    """
+    Everything the evaluation and rendering of a candidate rule derive from it,
+    computed once per candidate: its chains (equivalence classes of attributes),
+    the resolved attributes, its join conditions and the table occurrences of
+    each chain. The x-chains and side conditions of a split are then obtained
+    with set operations on these and cached per split.
+
+    :param candidate_rule: The candidate rule.
+    :param mapper: An instance of AttributeMapper for attribute mapping.
+    """
+
+    def __init__(self, candidate_rule: CandidateRule, mapper: AttributeMapper):
+        self.candidate_rule = candidate_rule
+        self.mapper = mapper
+        self.chains: list[list[IndexedAttribute]] = CandidateRuleChains(candidate_rule).cr_chains
+        self.attributes: dict[IndexedAttribute, Attribute] = {}
+        for pair in candidate_rule:
+            for indexed_attr in pair:
+                if indexed_attr not in self.attributes:
+                    self.attributes[indexed_attr] = mapper.indexed_attribute_to_attribute(indexed_attr)
+        self.join_conditions: list[JoinCondition] = [
+            self.condition(indexed_attr1, indexed_attr2) for indexed_attr1, indexed_attr2 in candidate_rule
+        ]
+        self.table_occurrences: set[TableOccurrence] = {
+            (indexed_attr.i, indexed_attr.j) for indexed_attr in self.attributes
+        }
+        self.chain_occurrences: list[frozenset[TableOccurrence]] = [
+            frozenset((indexed_attr.i, indexed_attr.j) for indexed_attr in chain)
+            for chain in self.chains
+        ]
+        self._occurrence_attributes: dict[TableOccurrence, list[IndexedAttribute]] = {}
+        for chain in self.chains:
+            for indexed_attr in chain:
+                self._occurrence_attributes.setdefault((indexed_attr.i, indexed_attr.j), []).append(indexed_attr)
+        self._x_chains: dict[tuple, list[list[tuple[str, int, str]]]] = {}
+        self._side_conditions: dict[frozenset, list[JoinCondition]] = {}
+
+    def condition(self, indexed_attr1: IndexedAttribute, indexed_attr2: IndexedAttribute) -> JoinCondition:
+        """The join condition equating two attributes of the candidate rule."""
+        attr1 = self.attributes[indexed_attr1]
+        attr2 = self.attributes[indexed_attr2]
+        return attr1.table, indexed_attr1.j, attr1.name, attr2.table, indexed_attr2.j, attr2.name
+
+    def occurrence_attributes(self, table_occurrence: TableOccurrence) -> list[IndexedAttribute]:
+        """The attributes of a table occurrence, in chain order (see tgd_discovery.attr)."""
+        return self._occurrence_attributes.get(table_occurrence, [])
+
+    def x_chains(
+        self,
+        body: set[TableOccurrence],
+        head: set[TableOccurrence],
+        select_body: bool = False,
+        select_head: bool = False,
+    ) -> list[list[tuple[str, int, str]]]:
+        """Same as CandidateRuleChains.get_x_chains, cached per split."""
+        key = (frozenset(body), frozenset(head), select_body, select_head)
+        if key not in self._x_chains:
+            x_chains = []
+            for chain, occurrences in zip(self.chains, self.chain_occurrences):
+                if occurrences.isdisjoint(body) or occurrences.isdisjoint(head):
+                    continue
+                x_chains.append([
+                    (self.attributes[indexed_attr].table, indexed_attr.j, self.attributes[indexed_attr].name)
+                    for indexed_attr in chain
+                    if not (select_body and (indexed_attr.i, indexed_attr.j) not in body)
+                    and not (select_head and (indexed_attr.i, indexed_attr.j) not in head)
+                ])
+            self._x_chains[key] = x_chains
+        return self._x_chains[key]
+
+    def side_conditions(self, side: set[TableOccurrence]) -> list[JoinCondition]:
+        """Same as tgd_discovery.side_conditions, cached per side."""
+        key = frozenset(side)
+        if key not in self._side_conditions:
+            conditions = []
+            for attr1, attr2 in self.candidate_rule:
+                if (attr1.i, attr1.j) in side or (attr2.i, attr2.j) in side:
+                    conditions.append(self.condition(attr2, attr1))
+            for jia in self.candidate_rule:
+                for attr11 in jia:
+                    if (attr11.i, attr11.j) not in side:
+                        continue
+                    for chain in self.chains:
+                        if attr11 not in chain:
+                            continue
+                        for attr22 in chain:
+                            if attr11 != attr22 and attr22 not in jia and (attr22.i, attr22.j) in side:
+                                conditions.append(self.condition(attr22, attr11))
+            self._side_conditions[key] = conditions
+        return self._side_conditions[key]
+
+    def split_queries(
+        self, body: set[TableOccurrence], head: set[TableOccurrence]
+    ) -> dict[str, tuple[list[JoinCondition], list[list[tuple[str, int, str]]]]]:
+        """
+        The join conditions and projected x-chains of the prediction, support and
+        confidence counts of a split (see prediction, calculate_support and
+        calculate_confidence).
+        """
+        return {
+            "prediction": (self.join_conditions, self.x_chains(body, head)),
+            "support": (self.side_conditions(body), self.x_chains(body, head, select_body=True)),
+            "confidence": (self.side_conditions(head), self.x_chains(body, head, select_head=True)),
+        }
@@ -0,0 +1,107 @@
+"""
+Approximate split evaluation on a correlated hash sample.
+
+The prediction, body and head counts of a split are distinct counts of an
+x-projection of the same x-chains. Each is computed on the rows whose projected
+tuple falls in a fixed subset of hash buckets; since the hash only depends on
+the tuple, each distinct tuple is sampled independently, and a tuple of the
+prediction is sampled exactly when the same tuple of a side is, so their ratios
+estimate support and confidence. Each sampled count n gives a score interval for
+the full count (treating n as Poisson with mean rate * count), from which
+intervals for support and confidence follow. A split is accepted on the sample
+only when the intervals leave no doubt; any other split is evaluated exactly, so
+estimates never reject a split.
+"""
+
+from math import sqrt
+from statistics import NormalDist
+from typing import NamedTuple
+
+from database.query_utility import SAMPLE_BUCKETS
+
+
+class SplitEstimate(NamedTuple):
+    """Point estimates and interval bounds of the measures of a split."""
+    support: float
+    support_low: float
+    support_high: float
+    confidence: float
+    confidence_low: float
+    confidence_high: float
+
+    @property
+    def relative_error(self) -> float:
+        """Largest half-width of the two intervals relative to its estimate."""
+        errors = []
+        for value, low, high in (
+            (self.support, self.support_low, self.support_high),
+            (self.confidence, self.confidence_low, self.confidence_high),
+        ):
+            errors.append((high - low) / (2 * value) if value > 0 else float("inf"))
+        return max(errors)
+
+
+class SplitSampler:
+    """
+    Settings and counters of sampled split evaluation.
+
+    :param rate: Fraction of the projected values sampled, rounded to a multiple
+                 of 1 / SAMPLE_BUCKETS.
+    :param tolerance: Largest relative error of an estimate accepted without
+                      exact verification.
+    :param confidence_level: Coverage of the intervals.
+    """
+
+    def __init__(self, rate: float, tolerance: float = 0.1, confidence_level: float = 0.95):
+        if not 0 < rate <= 1:
+            raise ValueError("sampling_rate must be in (0, 1]")
+        if not 0 < confidence_level < 1:
+            raise ValueError("sampling_confidence must be in (0, 1)")
+        self.buckets = min(SAMPLE_BUCKETS, max(1, round(rate * SAMPLE_BUCKETS)))
+        self.rate = self.buckets / SAMPLE_BUCKETS
+        self.tolerance = tolerance
+        self.z = NormalDist().inv_cdf(0.5 + confidence_level / 2)
+        self.accepted = 0
+        self.verified = 0
+
+    def count_interval(self, sampled: int) -> tuple[float, float]:
+        """
+        Interval of the full count given the count on the sample.
+
+        :param sampled: The count on the sample.
+        :return: (low, high) bounds of the full count.
+        """
+        if self.buckets == SAMPLE_BUCKETS:
+            return sampled, sampled
+        z2 = self.z * self.z
+        spread = self.z * sqrt(sampled + z2 / 4)
+        low = (sampled + z2 / 2 - spread) / self.rate
+        high = (sampled + z2 / 2 + spread) / self.rate
+        # The sampled tuples are part of the full count.
+        return max(sampled, low), high
+
+    def estimate(self, prediction: int, body: int, head: int) -> SplitEstimate:
+        """
+        Estimate support and confidence from the sampled counts of a split.
+
+        :param prediction: Sampled prediction count.
+        :param body: Sampled body count.
+        :param head: Sampled head count.
+        """
+        prediction_low, prediction_high = self.count_interval(prediction)
+        measures = []
+        for side in (body, head):
+            side_low, side_high = self.count_interval(side)
+            measures += [
+                prediction / side if side else 0,
+                prediction_low / side_high if side_high else 0,
+                # A non-empty side has at least one tuple.
+                prediction_high / max(side_low, 1),
+            ]
+        return SplitEstimate(*measures)
+
+    def summary(self) -> str:
+        return (
+            f"Sampling at {self.rate:.2%}: {self.accepted} splits accepted on estimates, "
+            f"{self.verified} verified exactly"
+        )
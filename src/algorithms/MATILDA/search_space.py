@@ -0,0 +1,209 @@
+"""
+Search-space estimation for MATILDA.
+
+Forecasts the number of candidates, splits, queries and rules of a discovery
+run, its wall time and the peak size of the traversal frontier, before the run.
+The traversal tree over the constraint graph is sampled with Knuth's random
+probes, and one split of each probed candidate is evaluated to sample the
+query latencies and the acceptance rate.
+"""
+
+import random
+import sys
+import time
+from math import sqrt
+from statistics import mean, pstdev
+from typing import Callable, Optional
+
+from algorithms.MATILDA.constraint_graph import AttributeMapper, ConstraintGraph
+from algorithms.MATILDA.rule_plan import RulePlan
+from algorithms.MATILDA.tgd_discovery import CandidateRule, next_node_test, split_candidate_rule
+
+TRAVERSAL_ALGORITHMS = ("dfs", "bfs", "astar")
+
+
+class SearchSpaceEstimator:
+    """
+    Knuth estimator of the traversal tree explored by discovery.
+
+    Each probe walks from the root down to a leaf, choosing each child uniformly
+    among the extensions the traversal would accept (next_node_test under the
+    max_table and max_vars limits). A node reached through branching factors
+    b1, ..., bd stands for b1 * ... * bd nodes of its depth, so summing any cost
+    over the probed nodes with these weights is an unbiased estimate of the
+    cost of the whole tree. The start nodes are probed in turn rather than at
+    random, which removes most of the variance. The traversals differ at the root only: DFS starts
+    from the nodes accepted by next_node_test on an empty rule, BFS and A-star
+    from every node, so a single set of probes serves the three.
+
+    The structure of the tree costs no query (path_pruning does not prune);
+    the queries come from the splits of the candidates, sampled one per probed
+    candidate with ``evaluate_split``. Its results are cached by split, so that
+    estimates under smaller limits reuse them.
+
+    :param graph: The constraint graph.
+    :param mapper: The attribute mapper of the graph.
+    :param evaluate_split: Evaluates a split (candidate_rule, body, head, plan) as
+                           discovery would; returns True if the rule is accepted.
+    :param query_count: Returns the number of queries executed so far.
+    :param max_head_size: Maximum number of occurrences in the head of a rule.
+    :param probes: Number of random probes of the tree.
+    :param seed: Seed of the probes.
+    """
+
+    def __init__(
+        self,
+        graph: ConstraintGraph,
+        mapper: AttributeMapper,
+        evaluate_split: Callable[[CandidateRule, set, set, RulePlan], bool],
+        query_count: Callable[[], int],
+        max_head_size: int = 1,
+        probes: int = 100,
+        seed: int = 0,
+    ):
+        self.graph = graph
+        self.mapper = mapper
+        self.evaluate_split = evaluate_split
+        self.query_count = query_count
+        self.max_head_size = max_head_size
+        self.probes = probes
+        self.seed = seed
+        # Split -> (queries, seconds, accepted) of its sampled evaluation.
+        self._samples: dict[tuple, tuple[int, float, bool]] = {}
+
+    def estimate(self, max_table: int, max_vars: int) -> dict:
+        """
+        Forecast a run under the given limits for each traversal algorithm.
+
+        :return: {"probes", "sampled_splits", "forecasts": {algorithm: forecast}}, where
+                 a forecast holds the estimated candidates, splits, queries, rules,
+                 seconds, peak_frontier_paths and peak_memory_bytes, and the relative
+                 standard error of the candidate estimate.
+        """
+        roots = list(self.graph.nodes)
+        rng = random.Random(self.seed)
+        # The start nodes are probed in turn, in a random order: most of the variance
+        # comes from the sizes of their subtrees.
+        order = rng.sample(roots, len(roots))
+        totals = {algorithm: [] for algorithm in TRAVERSAL_ALGORITHMS}
+        peaks = {algorithm: 0.0 for algorithm in TRAVERSAL_ALGORITHMS}
+        entry_bytes = 0
+        for probe_index in range(self.probes if roots else 0):
+            root = order[probe_index % len(order)]
+            probe, levels, stack, path = self._probe(root, len(roots), max_table, max_vars, rng)
+            from_dfs = next_node_test([], root, set(), max_table, max_vars)
+            for algorithm in TRAVERSAL_ALGORITHMS:
+                totals[algorithm].append(probe if from_dfs or algorithm != "dfs" else dict.fromkeys(probe, 0.0))
+            # Per start node: BFS holds about two levels, A-star the whole subtree in the worst case.
+            peaks["bfs"] = max(peaks["bfs"], max(a + b for a, b in zip(levels, levels[1:] + [0.0])))
+            peaks["astar"] = max(peaks["astar"], sum(levels))
+            if from_dfs:
+                peaks["dfs"] = max(peaks["dfs"], stack)
+            entry_bytes = max(entry_bytes, _frontier_entry_bytes(path))
+
+        forecasts = {}
+        for algorithm, probes in totals.items():
+            forecast = {
+                measure: mean(probe[measure] for probe in probes) if probes else 0.0
+                for measure in ("candidates", "splits", "queries", "rules", "seconds")
+            }
+            candidates = [probe["candidates"] for probe in probes]
+            forecast["candidates_relative_error"] = (
+                pstdev(candidates) / sqrt(len(candidates)) / forecast["candidates"]
+                if forecast["candidates"] else 0.0
+            )
+            forecast["peak_frontier_paths"] = peaks[algorithm]
+            forecast["peak_memory_bytes"] = peaks[algorithm] * entry_bytes
+            forecasts[algorithm] = forecast
+        return {
+            "max_table": max_table,
+            "max_vars": max_vars,
+            "probes": self.probes if roots else 0,
+            "sampled_splits": len(self._samples),
+            "forecasts": forecasts,
+        }
+
+    def _probe(self, root, root_count: int, max_table: int, max_vars: int, rng: random.Random):
+        """
+        One random walk from ``root``: the weighted costs of its nodes, the estimated
+        size of each level of the subtree of ``root``, the DFS stack size, and the path.
+        """
+        totals = dict.fromkeys(("candidates", "splits", "queries", "rules", "seconds"), 0.0)
+        levels = []
+        stack = 0
+        path = [root]
+        weight = float(root_count)
+        while True:
+            levels.append(weight / root_count)
+            splits, queries, seconds, accepted = self._sample_candidate(path)
+            totals["candidates"] += weight
+            totals["splits"] += weight * splits
+            totals["queries"] += weight * queries
+            totals["seconds"] += weight * seconds
+            totals["rules"] += weight * accepted
+            visited = set(path)
+            children = [
+                node
+                for path_node in path
+                for node in self.graph.neighbors(path_node)
+                if node not in visited and next_node_test(path, node, visited, max_table, max_vars)
+            ]
+            if not children:
+                return totals, levels, stack, path
+            stack += len(children)
+            weight *= len(children)
+            path = path + [rng.choice(children)]
+
+    def _sample_candidate(self, candidate_rule: CandidateRule) -> tuple[int, float, float, float]:
+        """
+        Number of splits of a candidate, and estimates of its queries, seconds and
+        accepted rules from one of its splits chosen at random.
+        """
+        started = time.perf_counter()
+        plan = RulePlan(candidate_rule, self.mapper)
+        splits = [
+            (body, head)
+            for body, head in split_candidate_rule(candidate_rule, plan, self.max_head_size)
+            if body and head and len(head) <= self.max_head_size
+        ]
+        seconds = time.perf_counter() - started
+        if not splits:
+            return 0, 0, seconds, 0
+        # Chosen from the candidate itself, so that the same candidate always samples the same split.
+        body, head = splits[hash(tuple(candidate_rule)) % len(splits)]
+        key = (tuple(candidate_rule), frozenset(body), frozenset(head))
+        if key not in self._samples:
+            first_query = self.query_count()
+            started = time.perf_counter()
+            accepted = self.evaluate_split(candidate_rule, body, head, plan)
+            self._samples[key] = (self.query_count() - first_query, time.perf_counter() - started, accepted)
+        queries, split_seconds, accepted = self._samples[key]
+        n = len(splits)
+        return n, n * queries, seconds + n * split_seconds, n * accepted
+
+
+def _frontier_entry_bytes(path: CandidateRule) -> int:
+    """Approximate size of a BFS or A-star queue entry for a path: the tuple, the path and its visited set."""
+    return sys.getsizeof((0, 0, None, path, None)) + sys.getsizeof(list(path)) + sys.getsizeof(set(path))
+
+
+def recommend_limits(
+    estimate: Callable[[int, int], dict],
+    max_table: int,
+    max_vars: int,
+    time_budget: float,
+    algorithm: str = "dfs",
+) -> Optional[dict]:
+    """
+    Largest limits whose forecast wall time fits in ``time_budget``: max_vars is
+    lowered first, then max_table, down to rules of two tables and two variables.
+
+    :param estimate: Returns the estimate of SearchSpaceEstimator for (max_table, max_vars).
+    :return: The fitting estimate, or None if none fits.
+    """
+    for table_limit in range(max_table, 1, -1):
+        for vars_limit in range(max_vars, 1, -1):
+            planned = estimate(table_limit, vars_limit)
+            if planned["forecasts"][algorithm]["seconds"] <= time_budget:
+                return planned
+    return None
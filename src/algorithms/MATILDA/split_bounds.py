@@ -0,0 +1,241 @@
+"""
+Statistics-based upper bounds on the measures of a split.
+
+Support and confidence both divide the prediction count (the distinct
+x-projection of the candidate join) by the distinct x-projection of one side,
+which joins a subset of the occurrences on a subset of the conditions and so
+counts every projected tuple of the candidate join: neither measure can exceed
+the prediction count nor 1 (see measure_upper_bound). The prediction count is
+itself bounded, without running the join, by the product of the distinct counts of the projected columns and by the
+product of the cardinalities of the joined tables, or, with the frequencies of the
+join columns, by the rows of a spanning tree of the join. split_pruning compares
+these bounds with the configured thresholds and skips the queries of splits that
+cannot pass.
+"""
+
+from math import floor, prod
+from statistics import mean
+from typing import Callable, Optional
+
+from database.statistics_catalog import StatisticsCatalog
+
+# Queries issued by split_pruning for each measure of a split: an emptiness
+# check followed by a count.
+PREDICTION_QUERIES = 2
+SUPPORT_QUERIES = 2
+CONFIDENCE_QUERIES = 2
+
+
+def below_thresholds(
+    support: float,
+    confidence: float,
+    mean_threshold: float,
+    min_support: float = 0,
+    min_confidence: float = 0,
+) -> bool:
+    """
+    Return True if a split whose support and confidence are at most the given
+    values cannot be kept.
+
+    :param support: Upper bound (or exact value) of the support.
+    :param confidence: Upper bound (or exact value) of the confidence.
+    :param mean_threshold: mean(support, confidence) must exceed this value.
+    :param min_support: Minimum support of a kept rule.
+    :param min_confidence: Minimum confidence of a kept rule.
+    """
+    return (
+        support < min_support
+        or confidence < min_confidence
+        or mean([support, confidence]) <= mean_threshold
+    )
+
+
+def measure_upper_bound(prediction_count: float, x_chains: Optional[list]) -> float:
+    """
+    Upper bound of the support and confidence of a split given (an upper bound
+    of) its prediction count.
+
+    Each measure is the prediction count over the count of a side, which is at
+    least 1 for a measure above 0. With projected x-chains the side also counts
+    every projected tuple of the prediction, so the ratio is at most 1 as well.
+
+    :param prediction_count: The prediction count, or an upper bound of it.
+    :param x_chains: The x-chains projected by the prediction query.
+    """
+    if not any(x_chains or []):
+        return prediction_count
+    return min(prediction_count, 1)
+
+
+def count_limit(total_tuples: int, required: float) -> Optional[int]:
+    """
+    Body or head count at which total_tuples / count falls below
+    ``required``. Counting a side up to this limit decides whether the measure
+    can reach ``required``, and a count below the limit is exact.
+
+    :param total_tuples: The prediction count of the split.
+    :param required: The value the measure must reach.
+    :return: The limit, or None when every count passes (``required`` <= 0).
+    """
+    if required <= 0:
+        return None
+    # Rounded up so that float error never makes the limit too small.
+    return floor(total_tuples / required * (1 + 1e-9)) + 1
+
+
+class SplitBounds:
+    """
+    Upper bounds of split measures from a statistics catalog, with a count of
+    the queries they made unnecessary.
+
+    :param statistics: The catalog providing row and distinct counts.
+    :param join_frequencies: Also bound the join rows with the frequency of the most
+                             frequent value of the join columns.
+    :param query_cost: Predicted latency of a count query given its join conditions and
+                       projection, or None when unknown (see CostModel); the cost
+                       estimates use it instead of the table sizes when available.
+    """
+
+    def __init__(
+        self,
+        statistics: StatisticsCatalog,
+        join_frequencies: bool = False,
+        query_cost: Optional[Callable[[list, Optional[list]], Optional[float]]] = None,
+    ):
+        self.statistics = statistics
+        self.join_frequencies = join_frequencies
+        self.query_cost = query_cost
+        self.queries_avoided = 0
+        self.splits_pruned = 0
+
+    def prediction_upper_bound(
+        self,
+        join_conditions: list[tuple[str, int, str, str, int, str]],
+        x_chains: Optional[list[list[tuple[str, int, str]]]],
+    ) -> int:
+        """
+        Upper bound of the prediction count of a split.
+
+        :param join_conditions: The join conditions of the candidate rule.
+        :param x_chains: The x-chains projected by the prediction query (the first
+                         attribute of each chain is projected).
+        :return: An upper bound of the number of distinct projected tuples, or of
+                 join rows when nothing is projected.
+        """
+        occurrences = set()
+        for table1, occurrence1, _, table2, occurrence2, _ in join_conditions:
+            occurrences.add((table1, occurrence1))
+            occurrences.add((table2, occurrence2))
+        projected = [x_class[0] for x_class in x_chains or [] if x_class]
+        # A projected occurrence outside the join is cross joined.
+        occurrences.update((table, occurrence) for table, occurrence, _ in projected)
+        rows = self.join_rows_upper_bound(join_conditions, occurrences)
+        if not projected:
+            return rows
+        distinct = prod(
+            self.statistics.distinct_count(table, attribute) for table, _, attribute in projected
+        )
+        return min(rows, distinct)
+
+    def join_rows_upper_bound(
+        self,
+        join_conditions: list[tuple[str, int, str, str, int, str]],
+        occurrences: set[tuple[str, int]],
+    ) -> int:
+        """
+        Upper bound of the number of rows of the join of some table occurrences.
+
+        Without join frequencies, the product of their cardinalities. Otherwise,
+        joining an occurrence through an equality on one of its columns multiplies
+        the rows by at most the frequency of the most frequent value of that
+        column, so the rows of any spanning tree of the join conditions, grown
+        from each occurrence in turn along the least frequent columns, also bound
+        the join; occurrences joined by no condition are cross joined.
+
+        :param join_conditions: The join conditions.
+        :param occurrences: The (table name, occurrence) pairs of the join.
+        """
+        rows = prod(self.statistics.row_count(table) for table, _ in occurrences)
+        if not self.join_frequencies:
+            return rows
+        edges = [
+            ((table1, occurrence1), (table2, occurrence2), attribute1, attribute2)
+            for table1, occurrence1, attribute1, table2, occurrence2, attribute2 in join_conditions
+            if (table1, occurrence1) != (table2, occurrence2)
+        ]
+        for start in occurrences:
+            reached = {start}
+            bound = self.statistics.row_count(start[0])
+            while True:
+                step = None
+                for occurrence1, occurrence2, attribute1, attribute2 in edges:
+                    for source, target, attribute in (
+                        (occurrence1, occurrence2, attribute2),
+                        (occurrence2, occurrence1, attribute1),
+                    ):
+                        if source in reached and target not in reached:
+                            frequency = self.statistics.max_frequency(target[0], attribute)
+                            if step is None or frequency < step[0]:
+                                step = (frequency, target)
+                if step is None:
+                    break
+                bound *= step[0]
+                reached.add(step[1])
+            bound *= prod(self.statistics.row_count(table) for table, _ in occurrences - reached)
+            rows = min(rows, bound)
+        return rows
+
+    def estimated_cost(
+        self,
+        occurrences: set[tuple[int, int]],
+        mapper,
+        join_conditions: Optional[list[tuple[str, int, str, str, int, str]]] = None,
+        count_over: Optional[list[list[tuple[str, int, str]]]] = None,
+    ) -> float:
+        """
+        Rough cost of counting over the join of some table occurrences: the
+        predicted latency of the count query when its join conditions are given and
+        the cost model is trained, else the number of rows scanned, i.e. the sum
+        of the cardinalities of their tables.
+
+        :param occurrences: The (table index, occurrence) pairs of a body or head.
+        :param mapper: The AttributeMapper giving table names.
+        :param join_conditions: The join conditions of the count query.
+        :param count_over: Its projected x-chains.
+        """
+        if self.query_cost is not None and join_conditions is not None:
+            cost = self.query_cost(join_conditions, count_over)
+            if cost is not None:
+                return cost
+        return sum(
+            self.statistics.row_count(mapper.index_to_table_name[table]) for table, _ in occurrences
+        )
+
+    def split_cost(self, plan, body: set[tuple[int, int]], head: set[tuple[int, int]]) -> Optional[float]:
+        """
+        Predicted latency of the count queries of a split (see RulePlan.split_queries),
+        or None while the cost model is not trained.
+        """
+        if self.query_cost is None:
+            return None
+        total = 0.0
+        for join_conditions, count_over in plan.split_queries(body, head).values():
+            cost = self.query_cost(join_conditions, count_over)
+            if cost is None:
+                return None
+            total += cost
+        return total
+
+    def order_splits(self, plan, splits: list) -> list:
+        """
+        The (body, head) splits of a candidate, cheapest predicted first, or in their
+        original order while the cost model is not trained.
+        """
+        costs = [self.split_cost(plan, body, head) for body, head in splits]
+        if not costs or None in costs:
+            return splits
+        return [split for _, split in sorted(zip(costs, splits), key=lambda pair: pair[0])]
+
+    def avoid(self, queries: int):
+        """Record queries skipped because a bound ruled the split out."""
+        self.queries_avoided += queries
@@ -0,0 +1,144 @@
+"""
+Subsumption of candidate splits by accepted rules for MATILDA.
+
+A split whose head, and the join conditions reaching it, are those of an
+accepted rule, and whose body holds the body of that rule (its table
+occurrences and their join conditions) and more, is a specialization of the
+rule. When every body tuple of the accepted rule has a head tuple (support 1),
+each body tuple of the specialization is one of them restricted by the extra
+conditions, so the specialization holds too: it is implied by the accepted
+rule and its measures cannot improve on it. Such splits are skipped before
+any query.
+"""
+
+from collections import defaultdict
+from typing import Iterable
+
+from algorithms.MATILDA.constraint_graph import JoinableIndexedAttributes
+
+TableOccurrence = tuple[int, int]
+Condition = tuple[tuple[int, int, int], tuple[int, int, int]]
+# (head, head conditions, body, body conditions) of an accepted rule.
+SubsumptionRecord = tuple[
+    frozenset[TableOccurrence], frozenset[Condition], frozenset[TableOccurrence], frozenset[Condition]
+]
+
+# Support from which an accepted rule subsumes its specializations.
+SUBSUMING_SUPPORT = 1.0
+
+
+def split_signature(
+    candidate_rule: Iterable[JoinableIndexedAttributes],
+    body: Iterable[TableOccurrence],
+    head: Iterable[TableOccurrence],
+) -> SubsumptionRecord:
+    """
+    The head, the join conditions involving a head occurrence, the body and the
+    join conditions between body occurrences of a split.
+    """
+    body, head = frozenset(body), frozenset(head)
+    head_conditions, body_conditions = set(), set()
+    for jia in candidate_rule:
+        attr1, attr2 = jia.pair
+        condition = ((attr1.i, attr1.j, attr1.k), (attr2.i, attr2.j, attr2.k))
+        if (attr1.i, attr1.j) in head or (attr2.i, attr2.j) in head:
+            head_conditions.add(condition)
+        else:
+            body_conditions.add(condition)
+    return head, frozenset(head_conditions), body, frozenset(body_conditions)
+
+
+class SubsumptionIndex:
+    """
+    Online index of the accepted rules that subsume their specializations.
+
+    Rules are keyed by their head signature (the head occurrences and the join
+    conditions involving them); under a key, the body of each rule is kept as
+    two bitsets, of its table occurrences and of its join conditions, so that
+    the body of a split holds the body of an indexed rule when both bitsets
+    are subsets of those of the split. Bits are numbered as occurrences and
+    conditions are first indexed.
+
+    :param min_support: Support from which an accepted rule is indexed.
+    """
+
+    def __init__(self, min_support: float = SUBSUMING_SUPPORT):
+        self.min_support = min_support
+        # Indexed rules in acceptance order, as saved in checkpoints.
+        self.records: list[SubsumptionRecord] = []
+        self.splits_skipped = 0
+        self._occurrence_bits: dict[TableOccurrence, int] = {}
+        self._condition_bits: dict[Condition, int] = {}
+        self._bodies: dict[tuple, list[tuple[int, int]]] = defaultdict(list)
+
+    def add(
+        self,
+        candidate_rule: Iterable[JoinableIndexedAttributes],
+        body: Iterable[TableOccurrence],
+        head: Iterable[TableOccurrence],
+        support: float,
+        exact: bool = True,
+    ) -> bool:
+        """
+        Index an accepted rule if it subsumes its specializations (an exact
+        support of at least ``min_support``); return True if it was indexed.
+        """
+        if not exact or support < self.min_support:
+            return False
+        self._add(split_signature(candidate_rule, body, head))
+        return True
+
+    def _add(self, record: SubsumptionRecord):
+        head, head_conditions, body, body_conditions = record
+        occurrences = self._bits(body, self._occurrence_bits, assign=True)
+        conditions = self._bits(body_conditions, self._condition_bits, assign=True)
+        self._bodies[(head, head_conditions)].append((occurrences, conditions))
+        self.records.append(record)
+
+    def subsumed(
+        self,
+        candidate_rule: Iterable[JoinableIndexedAttributes],
+        body: Iterable[TableOccurrence],
+        head: Iterable[TableOccurrence],
+    ) -> bool:
+        """True if the split is an indexed rule or one of its specializations."""
+        head, head_conditions, body, body_conditions = split_signature(candidate_rule, body, head)
+        bodies = self._bodies.get((head, head_conditions))
+        if not bodies:
+            return False
+        # Occurrences and conditions without a bit are in no indexed body.
+        occurrences = self._bits(body, self._occurrence_bits)
+        conditions = self._bits(body_conditions, self._condition_bits)
+        for indexed_occurrences, indexed_conditions in bodies:
+            if indexed_occurrences & ~occurrences == 0 and indexed_conditions & ~conditions == 0:
+                self.splits_skipped += 1
+                return True
+        return False
+
+    @staticmethod
+    def _bits(items: Iterable, numbering: dict, assign: bool = False) -> int:
+        bits = 0
+        for item in items:
+            bit = numbering.get(item)
+            if bit is None:
+                if not assign:
+                    continue
+                bit = numbering[item] = len(numbering)
+            bits |= 1 << bit
+        return bits
+
+    def state(self) -> list[SubsumptionRecord]:
+        """Snapshot of the index, restored by ``restore`` (e.g. from a checkpoint)."""
+        return list(self.records)
+
+    def restore(self, records: Iterable[SubsumptionRecord]):
+        """Replace the indexed rules by a snapshot taken with ``state``."""
+        self.records = []
+        self._occurrence_bits.clear()
+        self._condition_bits.clear()
+        self._bodies.clear()
+        for record in records:
+            self._add(record)
+
+    def __len__(self) -> int:
+        return len(self.records)
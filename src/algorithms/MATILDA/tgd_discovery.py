@@ -1,5 +1,7 @@
+import asyncio
 import copy
 from collections.abc import Callable, Iterator
+from typing import NamedTuple, Optional, Union
 from itertools import chain, combinations
 from statistics import mean
 import logging
@@ -19,6 +21,18 @@ from algorithms.MATILDA.constraint_graph import (
     JoinableIndexedAttributes,
 )
 from algorithms.MATILDA.candidate_rule_chains import CandidateRuleChains
+from algorithms.MATILDA.occurrence_limits import derive_occurrence_limits, occurrence_limits_report
+from algorithms.MATILDA.rule_plan import RulePlan
+from algorithms.MATILDA.sampling import SplitEstimate, SplitSampler
+from algorithms.MATILDA.split_bounds import (
+    CONFIDENCE_QUERIES,
+    PREDICTION_QUERIES,
+    SUPPORT_QUERIES,
+    SplitBounds,
+    below_thresholds,
+    count_limit,
+    measure_upper_bound,
+)
 from algorithms.MATILDA.graph_traversal import (
     dfs as dfs_traversal,
     bfs as bfs_traversal,
@@ -26,6 +40,8 @@ from algorithms.MATILDA.graph_traversal import (
     get_traversal_algorithm,
 )
 from database.alchemy_utility import AlchemyUtility
+from database.statistics_catalog import StatisticsCatalog
+from utils.memory_budget import MemoryBudget
 import time
 import os
 
@@ -56,11 +72,26 @@ def init(
     max_nb_occurrence: int = 3,
     max_nb_occurrence_per_table_and_column: dict[str, dict[str, int]] = {},
     results_path: str = None,
+    min_node_join_rows: int = 0,
+    collect_statistics: bool = False,
+    auto_occurrence_limits: bool = False,
+    occurrence_limits: dict[str, Union[int, dict[str, int]]] = None,
 ) -> tuple[ConstraintGraph, AttributeMapper, list[JoinableIndexedAttributes]]:
     """
     Initialize the constraint graph and attribute mapper.
     :param db_inspector: AlchemyUtility instance
     :param max_nb_occurrence: Maximum number of occurrences for each table
+    :param max_nb_occurrence_per_table_and_column: Number of occurrences of some
+                                                   columns ({table: {column: n}}).
+    :param min_node_join_rows: Drop the nodes whose two-attribute join has fewer rows
+                               before building the graph (see prune_sparse_nodes).
+    :param collect_statistics: Profile all tables into the statistics catalog of
+                               db_inspector, saved next to the compatibility export
+                               and reused while the database is unchanged.
+    :param auto_occurrence_limits: Derive the number of occurrences of each column from
+                                   the statistics (see derive_occurrence_limits).
+    :param occurrence_limits: Number of occurrences of tables ({table: n}) or columns
+                              ({table: {column: n}}), over the derived ones.
     :return: A tuple containing the constraint graph, attribute mapper, and list of compatible indexed attributes
     """
     # Input validation
@@ -127,6 +158,37 @@ def init(
 
         mapper = AttributeMapper(table_name_to_index, attribute_name_to_index)
 
+        time_statistics = time.time()
+        if collect_statistics:
+            db_inspector.collect_statistics(
+                f"{results_path}/statistics_{base_name}.json" if results_path else None
+            )
+        time_statistics = time.time() - time_statistics
+
+        time_occurrence_limits = time.time()
+        if auto_occurrence_limits or occurrence_limits:
+            limits, reasons = derive_occurrence_limits(
+                compatible_attributes,
+                db_inspector.statistics,
+                max_nb_occurrence,
+                overrides=occurrence_limits,
+                auto=auto_occurrence_limits,
+            )
+            for table, columns in max_nb_occurrence_per_table_and_column.items():
+                for column, occurrences in columns.items():
+                    limits.setdefault(table, {})[column] = occurrences
+                    reasons.setdefault(table, {})[column] = "override"
+            max_nb_occurrence_per_table_and_column = limits
+            report = occurrence_limits_report(compatible_attributes, max_nb_occurrence, limits, reasons)
+            print(
+                f"Occurrence limits: {report['nodes_before']} -> {report['nodes_after']} nodes, "
+                f"{report['edges_before']} -> {report['edges_after']} edges"
+            )
+            if results_path:
+                with open(f"{results_path}/occurrence_limits_{base_name}.json", "w") as f:
+                    json.dump(report, f, indent=4)
+        time_occurrence_limits = time.time() - time_occurrence_limits
+
         # List creation of compatible indexed attributes
         jia_list: list[JoinableIndexedAttributes] = []
         for table_occurrence1 in range(max_nb_occurrence):
@@ -136,14 +198,14 @@ def init(
                         max_nb_occurrence_per_table_and_column.get(attr1.table, {}).get(
                             attr1.name, max_nb_occurrence
                         )
-                        < table_occurrence1
+                        <= table_occurrence1
                     ):
                         continue
                     if (
                         max_nb_occurrence_per_table_and_column.get(attr2.table, {}).get(
                             attr2.name, max_nb_occurrence
                         )
-                        < table_occurrence2
+                        <= table_occurrence2
                     ):
                         continue
                     # if (
@@ -157,6 +219,10 @@ def init(
                     )
                     jia_list.append(jia)
         jia_list.sort()
+        time_node_pruning = time.time()
+        if min_node_join_rows > 0:
+            jia_list = prune_sparse_nodes(jia_list, mapper, db_inspector.statistics, min_node_join_rows)
+        time_node_pruning = time.time() - time_node_pruning
 
         # Create a constraint graph
         cg = ConstraintGraph()
@@ -181,6 +247,9 @@ def init(
                         "time_compute_compatible": time_compute_compatible,
                         "time_to_compute_indexed": time_to_compute_indexed,
                         "time_building_cg": time_building_cg,
+                        "time_node_pruning": time_node_pruning,
+                        "time_statistics": time_statistics,
+                        "time_occurrence_limits": time_occurrence_limits,
                     },
                     f,
                     indent=4,
@@ -193,6 +262,49 @@ def init(
         return None, None, []
 
 
+def prune_sparse_nodes(
+    jia_list: list[JoinableIndexedAttributes],
+    mapper: AttributeMapper,
+    statistics: StatisticsCatalog,
+    min_rows: int = 1,
+) -> list[JoinableIndexedAttributes]:
+    """
+    Drop the nodes whose join has fewer than ``min_rows`` rows.
+
+    The join of a node only depends on its two attributes and on whether both
+    are read from the same table occurrence, so the nodes are grouped by that
+    key and each group costs a single count, stopped at ``min_rows`` and cached
+    in the statistics catalog. A candidate rule containing an empty node has an
+    empty join and no prediction, so ``min_rows=1`` never drops a rule; larger
+    values also drop nodes too sparse to support a useful rule.
+
+    :param jia_list: The nodes of the constraint graph.
+    :param mapper: An instance of AttributeMapper for attribute mapping.
+    :param statistics: The catalog counting and caching the joins.
+    :param min_rows: Minimum number of rows of a kept node's join.
+    :return: The kept nodes, in their original order.
+    """
+    groups: dict[tuple, list[JoinableIndexedAttributes]] = defaultdict(list)
+    for jia in jia_list:
+        indexed_attr1, indexed_attr2 = jia
+        attr1 = mapper.indexed_attribute_to_attribute(indexed_attr1)
+        attr2 = mapper.indexed_attribute_to_attribute(indexed_attr2)
+        same_row = indexed_attr1.i == indexed_attr2.i and indexed_attr1.j == indexed_attr2.j
+        groups[(attr1.table, attr1.name, attr2.table, attr2.name, same_row)].append(jia)
+
+    dropped = set()
+    for key, nodes in tqdm(groups.items(), desc="Counting node joins", leave=False):
+        if statistics.join_row_count(*key, limit=min_rows) < min_rows:
+            dropped.update(nodes)
+
+    kept = [jia for jia in jia_list if jia not in dropped]
+    print(
+        f"Node pruning dropped {len(jia_list) - len(kept)} of {len(jia_list)} nodes "
+        f"({len(groups)} joins counted)"
+    )
+    return kept
+
+
 def dfs(
     graph: ConstraintGraph,
     start_node: JoinableIndexedAttributes,
@@ -206,6 +318,9 @@ def dfs(
     candidate_rule: CandidateRule = None,
     max_table: int = 3,
     max_vars: int = 4,
+    backtrack_func: Callable[[CandidateRule], None] = None,
+    start_index: int = 0,
+    start_callback: Callable[[int], None] = None,
 ) -> Iterator[CandidateRule]:
     """
     Perform a Depth-First Search (DFS) traversal with a path-based heuristic.
@@ -222,6 +337,9 @@ def dfs(
     :param candidate_rule: A list to track the current path of nodes being visited.
     :param max_table: Maximum number of tables allowed in a rule.
     :param max_vars: Maximum number of variables allowed in a rule.
+    :param backtrack_func: Optional function called with the path when the DFS leaves it.
+    :param start_index: Index of the first start node traversed (see graph_traversal.dfs).
+    :param start_callback: Optional function called with the index of each start node.
     :yield: Candidate rules found during traversal.
     """
     yield from dfs_traversal(
@@ -235,6 +353,9 @@ def dfs(
         max_table=max_table,
         max_vars=max_vars,
         next_node_test_func=next_node_test,
+        backtrack_func=backtrack_func,
+        start_index=start_index,
+        start_callback=start_callback,
     )
 
 
@@ -249,6 +370,9 @@ def bfs(
     mapper: AttributeMapper,
     max_table: int = 3,
     max_vars: int = 4,
+    start_index: int = 0,
+    start_callback: Callable[[int], None] = None,
+    memory_budget: MemoryBudget = None,
 ) -> Iterator[CandidateRule]:
     """
     Perform a Breadth-First Search (BFS) traversal.
@@ -263,6 +387,9 @@ def bfs(
     :param mapper: Attribute mapper for indexed attributes.
     :param max_table: Maximum number of tables allowed in a rule.
     :param max_vars: Maximum number of variables allowed in a rule.
+    :param start_index: Index of the first start node traversed (see graph_traversal.bfs).
+    :param start_callback: Optional function called with the index of each start node.
+    :param memory_budget: Optional memory budget the queue registers with.
     :yield: Candidate rules found during traversal.
     """
     yield from bfs_traversal(
@@ -274,6 +401,9 @@ def bfs(
         max_table=max_table,
         max_vars=max_vars,
         next_node_test_func=next_node_test,
+        start_index=start_index,
+        start_callback=start_callback,
+        memory_budget=memory_budget,
     )
 
 
@@ -289,6 +419,9 @@ def astar(
     max_table: int = 3,
     max_vars: int = 4,
     heuristic_func: Callable[[CandidateRule, AttributeMapper, AlchemyUtility], float] = None,
+    start_index: int = 0,
+    start_callback: Callable[[int], None] = None,
+    memory_budget: MemoryBudget = None,
 ) -> Iterator[CandidateRule]:
     """
     Perform an A-star search traversal.
@@ -304,6 +437,9 @@ def astar(
     :param max_table: Maximum number of tables allowed in a rule.
     :param max_vars: Maximum number of variables allowed in a rule.
     :param heuristic_func: Optional heuristic function for A-star.
+    :param start_index: Index of the first start node traversed (see graph_traversal.astar).
+    :param start_callback: Optional function called with the index of each start node.
+    :param memory_budget: Optional memory budget the priority queue registers with.
     :yield: Candidate rules found during traversal.
     """
     yield from astar_traversal(
@@ -316,6 +452,9 @@ def astar(
         max_vars=max_vars,
         next_node_test_func=next_node_test,
         heuristic_func=heuristic_func,
+        start_index=start_index,
+        start_callback=start_callback,
+        memory_budget=memory_budget,
     )
 
 
@@ -332,6 +471,10 @@ def traverse_graph(
     max_vars: int = 4,
     algorithm: str = 'dfs',
     heuristic_func: Callable[[CandidateRule, AttributeMapper, AlchemyUtility], float] = None,
+    backtrack_func: Callable[[CandidateRule], None] = None,
+    start_index: int = 0,
+    start_callback: Callable[[int], None] = None,
+    memory_budget: MemoryBudget = None,
 ) -> Iterator[CandidateRule]:
     """
     Generic graph traversal function that uses the specified algorithm.
@@ -345,22 +488,28 @@ def traverse_graph(
     :param max_vars: Maximum number of variables allowed in a rule.
     :param algorithm: Algorithm to use ('dfs', 'bfs', or 'astar').
     :param heuristic_func: Optional heuristic function for A-star.
+    :param backtrack_func: Optional function called with a path when DFS backtracks from it.
+    :param start_index: Without a start node, skip the start nodes before this index.
+    :param start_callback: Without a start node, called with the index of each start node
+                           before its traversal.
+    :param memory_budget: Optional memory budget the BFS and A-star frontiers register with,
+                          spilled to disk under memory pressure.
     :yield: Candidate rules found during traversal.
     """
     if algorithm.lower() in ['astar', 'a-star', 'a_star']:
         yield from astar(
             graph, start_node, pruning_prediction, db_inspector, mapper,
-            max_table, max_vars, heuristic_func
+            max_table, max_vars, heuristic_func, start_index, start_callback, memory_budget
         )
     elif algorithm.lower() == 'bfs':
         yield from bfs(
             graph, start_node, pruning_prediction, db_inspector, mapper,
-            max_table, max_vars
+            max_table, max_vars, start_index, start_callback, memory_budget
         )
     else:  # default to dfs
         yield from dfs(
             graph, start_node, pruning_prediction, db_inspector, mapper,
-            None, None, max_table, max_vars
+            None, None, max_table, max_vars, backtrack_func, start_index, start_callback
         )
 def prediction(
     path: CandidateRule,
@@ -369,6 +518,7 @@ def prediction(
     body: set[TableOccurrence] = None,
     head: set[TableOccurrence] = None,
     threshold: int = None,
+    plan: RulePlan = None,
 ) -> int:
     """
     Calculate the set of tuples that satisfy the tuple-generating dependency (TGD) R,
@@ -377,28 +527,17 @@ def prediction(
     :param path: A list of JoinableIndexedAttributes instances.
     :param mapper: An instance of AttributeMapper for attribute mapping.
     :param db_inspector: An instance of AlchemyUtility for database interaction.
+    :param plan: Optional RulePlan of ``path``, built if not given.
     :return: A set or list of tuples that satisfy the TGDs according to the disjoint semantics.
     """
-    join_conditions: list[tuple[str, int, str, str, int, str]] = []
+    if path is None:
+        return 0
+    plan = plan or RulePlan(path, mapper)
     if body is not None and head is not None:
-        x_chains = CandidateRuleChains(path).get_x_chains(body, head, mapper)
+        x_chains = plan.x_chains(body, head)
     else:
         x_chains = None
-    if path is None:
-        return 0
-    for indexed_attr1, indexed_attr2 in path:
-        attr1 = mapper.indexed_attribute_to_attribute(indexed_attr1)
-        attr2 = mapper.indexed_attribute_to_attribute(indexed_attr2)
-        join_conditions.append(
-            (
-                attr1.table,
-                indexed_attr1.j,
-                attr1.name,
-                attr2.table,
-                indexed_attr2.j,
-                attr2.name,
-            )
-        )
+    join_conditions = plan.join_conditions
     #logging.info("join_conditions",join_conditions)
     if threshold is not None:
         return bool(db_inspector.check_threshold(
@@ -407,6 +546,7 @@ def prediction(
             flag="x_prediction",
             disjoint_semantics=APPLY_DISJOINT,
             threshold=threshold,
+            materialize=True,
         ))
     if x_chains is not None:
         return db_inspector.get_join_row_count(
@@ -414,12 +554,58 @@ def prediction(
             count_over=x_chains,
             flag="x_prediction",
             disjoint_semantics=APPLY_DISJOINT,
+            materialize=True,
         )
     return db_inspector.get_join_row_count(
-        join_conditions, disjoint_semantics=APPLY_DISJOINT, flag="prediction"
+        join_conditions, disjoint_semantics=APPLY_DISJOINT, flag="prediction", materialize=True
     )
 
 
+def path_join_conditions(
+    path: CandidateRule,
+    mapper: AttributeMapper,
+) -> list[tuple[str, int, str, str, int, str]]:
+    """
+    Build the join conditions of a path, one per node and in path order, so the
+    conditions of a path extend those of its parent by exactly one condition.
+
+    :param path: A list of JoinableIndexedAttributes instances.
+    :param mapper: An instance of AttributeMapper for attribute mapping.
+    :return: The list of join conditions.
+    """
+    join_conditions: list[tuple[str, int, str, str, int, str]] = []
+    for indexed_attr1, indexed_attr2 in path:
+        attr1 = mapper.indexed_attribute_to_attribute(indexed_attr1)
+        attr2 = mapper.indexed_attribute_to_attribute(indexed_attr2)
+        join_conditions.append(
+            (
+                attr1.table,
+                indexed_attr1.j,
+                attr1.name,
+                attr2.table,
+                indexed_attr2.j,
+                attr2.name,
+            )
+        )
+    return join_conditions
+
+
+def release_path(
+    path: CandidateRule,
+    mapper: AttributeMapper,
+    db_inspector: AlchemyUtility,
+) -> None:
+    """
+    Release the materialized join of a path when the traversal backtracks from it.
+
+    :param path: A list of JoinableIndexedAttributes instances.
+    :param mapper: An instance of AttributeMapper for attribute mapping.
+    :param db_inspector: An instance of AlchemyUtility for database interaction.
+    """
+    if path:
+        db_inspector.release_materialization(path_join_conditions(path, mapper))
+
+
 def path_pruning(
     path: CandidateRule,
     mapper: AttributeMapper,
@@ -453,33 +639,52 @@ def split_pruning(
         head: set[TableOccurrence],
         db_inspector: AlchemyUtility,
         mapper: AttributeMapper,
+        min_score: float = None,
+        min_support: float = 0,
+        min_confidence: float = 0,
+        bounds: SplitBounds = None,
+        plan: RulePlan = None,
 ) -> bool:
     """
     This function checks if a given candidate rule should be pruned based on its support and confidence.
     Logs the instantiated TGD, support, and confidence.
 
+    With ``min_score`` (e.g. the current top-k threshold) the split is kept only if
+    mean(support, confidence) exceeds it. With ``min_support`` or ``min_confidence``
+    the split is kept only if the measure reaches it. The remaining queries are
+    skipped as soon as an upper bound rules the split out: neither measure exceeds
+    the prediction count nor 1 (see measure_upper_bound), and ``bounds`` bounds the
+    prediction count from table statistics before any query is issued.
+
     :param candidate_rule: A list of JoinableIndexedAttributes instances representing the candidate rule.
     :param body: A set of table occurrences representing the body of the candidate rule.
     :param head: A set of table occurrences representing the head of the candidate rule.
     :param db_inspector: An instance of AlchemyUtility for database interaction.
     :param mapper: An instance of AttributeMapper for attribute mapping.
+    :param bounds: Optional SplitBounds, which also counts the queries avoided.
+    :param plan: Optional RulePlan of the candidate rule, shared by its splits.
     :return: A boolean value indicating whether the candidate rule should be pruned.
     """
-    if len(body) == 0 and len(head) == 0:
-        return False, 0, 0  # invalid split, should not happen
-    if len(body) == 0 or len(head) == 0:
-        return False, 0, 0  # we prune empty body or head
-    pairs_count = Counter((attr.i, attr.j) for jia in candidate_rule for attr in jia)
+    if not valid_split(candidate_rule, body, head):
+        return False, 0, 0
+    plan = plan or RulePlan(candidate_rule, mapper)
 
-    table_indexed = defaultdict(list)
-    for i, j in head | body:  # Union of both frozensets
-        table_indexed[i].append(j)
-    for i in table_indexed:
-        if len(table_indexed[i]) > 1:
-            if pairs_count[(i, table_indexed[i][0])] == 1:
-                return False, 0, 0
-            #return False, 0, 0
+    threshold = SPLIT_PRUNING_MEAN_THRESHOLD
+    if min_score is not None:
+        threshold = max(threshold, min_score)
+
+    def avoid(queries: int):
+        if bounds is not None:
+            bounds.avoid(queries)
 
+    thresholds_set = min_score is not None or min_support or min_confidence
+    if bounds is not None and thresholds_set:
+        x_chains = plan.x_chains(body, head)
+        upper_bound = measure_upper_bound(bounds.prediction_upper_bound(plan.join_conditions, x_chains), x_chains)
+        if below_thresholds(upper_bound, upper_bound, threshold, min_support, min_confidence):
+            bounds.splits_pruned += 1
+            avoid(PREDICTION_QUERIES + SUPPORT_QUERIES + CONFIDENCE_QUERIES)
+            return False, 0, 0
 
     # for each table indexed , if the number of element is greater than 1, we prune if there is two tables with the same
 
@@ -490,19 +695,278 @@ def split_pruning(
     #body_tables=
     #if len(body_tables) < len(body) or len(head_tables) < len(head):
     #    return False, 0, 0
-    total_tuple_test = prediction(candidate_rule, mapper, db_inspector, body, head, threshold=0)
+    total_tuple_test = prediction(candidate_rule, mapper, db_inspector, body, head, threshold=0, plan=plan)
     if total_tuple_test is False:
         return False, 0, 0  # prune if the prediction is 0
 
-    total_tuples = prediction(candidate_rule, mapper, db_inspector, body, head)
+    total_tuples = prediction(candidate_rule, mapper, db_inspector, body, head, plan=plan)
+    upper_bound = measure_upper_bound(total_tuples, plan.x_chains(body, head))
+    if below_thresholds(upper_bound, upper_bound, threshold, min_support, min_confidence):
+        avoid(SUPPORT_QUERIES + CONFIDENCE_QUERIES)
+        return False, 0, 0
 
-    support = calculate_support(candidate_rule, body, head, db_inspector, mapper, total_tuples)
-    confidence = calculate_confidence(candidate_rule, body, head, db_inspector, mapper, total_tuples)
+    # Each side is counted only up to the count at which its measure can no longer
+    # reach the thresholds, given the other measure (bounded by upper_bound until
+    # it is known); a count below that limit is exact.
+    sides = [
+        ("support", body, min_support, calculate_support),
+        ("confidence", head, min_confidence, calculate_confidence),
+    ]
+    if bounds is not None and thresholds_set:
+        # Count the cheaper side first so that rejected splits stop early.
+        queries = plan.split_queries(body, head)
+        sides.sort(key=lambda side: bounds.estimated_cost(side[1], mapper, *queries[side[0]]))
+    measures = {"support": upper_bound, "confidence": upper_bound}
+    computed = {"support": 0, "confidence": 0}
+    for position, (name, side, minimum, calculate) in enumerate(sides):
+        other = measures["confidence" if name == "support" else "support"]
+        measures[name] = computed[name] = calculate(
+            candidate_rule, body, head, db_inspector, mapper, total_tuples,
+            count_limit=count_limit(total_tuples, max(minimum, 2 * threshold - other)),
+            plan=plan,
+        )
+        if position == 0 and below_thresholds(
+            measures["support"], measures["confidence"], threshold, min_support, min_confidence
+        ):
+            avoid(CONFIDENCE_QUERIES if name == "support" else SUPPORT_QUERIES)
+            return False, computed["support"], computed["confidence"]
+    support, confidence = computed["support"], computed["confidence"]
 
     if confidence == 0 and support == 0:
         return False, 0, 0
 
-    return mean([support, confidence]) > SPLIT_PRUNING_MEAN_THRESHOLD, support, confidence
+    return not below_thresholds(support, confidence, threshold, min_support, min_confidence), support, confidence
+
+
+class BudgetExceededSplit(NamedTuple):
+    """A split whose evaluation was interrupted by the query budget, and why ("time" or "steps")."""
+    candidate_rule: CandidateRule
+    body: set[TableOccurrence]
+    head: set[TableOccurrence]
+    reason: str
+
+
+def estimate_split(
+        candidate_rule: CandidateRule,
+        body: set[TableOccurrence],
+        head: set[TableOccurrence],
+        db_inspector: AlchemyUtility,
+        mapper: AttributeMapper,
+        sampler: SplitSampler,
+        plan: RulePlan = None,
+) -> Optional[SplitEstimate]:
+    """
+    Estimate support and confidence of a split from counts on a correlated hash sample.
+
+    :param candidate_rule: A list of JoinableIndexedAttributes instances representing the candidate rule.
+    :param body: A set of table occurrences representing the body of the candidate rule.
+    :param head: A set of table occurrences representing the head of the candidate rule.
+    :param db_inspector: An instance of AlchemyUtility for database interaction.
+    :param mapper: An instance of AttributeMapper for attribute mapping.
+    :param sampler: The sampling settings.
+    :param plan: Optional RulePlan of the candidate rule.
+    :return: The estimate, or None when the counts cannot be sampled.
+    """
+    plan = plan or RulePlan(candidate_rule, mapper)
+    counts = []
+    for conditions, x_chains in (
+        (plan.join_conditions, plan.x_chains(body, head)),
+        (list(set(plan.side_conditions(body))), plan.x_chains(body, head, select_body=True)),
+        (plan.side_conditions(head), plan.x_chains(body, head, select_head=True)),
+    ):
+        count = db_inspector.get_sampled_row_count(
+            conditions, sampler.buckets, count_over=x_chains, disjoint_semantics=APPLY_DISJOINT
+        )
+        if count is None:
+            return None
+        counts.append(count)
+    return sampler.estimate(*counts)
+
+
+def split_pruning_sampled(
+        candidate_rule: CandidateRule,
+        body: set[TableOccurrence],
+        head: set[TableOccurrence],
+        db_inspector: AlchemyUtility,
+        mapper: AttributeMapper,
+        sampler: SplitSampler,
+        min_score: float = None,
+        min_support: float = 0,
+        min_confidence: float = 0,
+        bounds: SplitBounds = None,
+        plan: RulePlan = None,
+) -> tuple[bool, float, float, bool]:
+    """
+    Approximate counterpart of split_pruning. The split is first evaluated on a
+    sample and accepted with the estimates when the lower ends of the intervals
+    pass the thresholds and the estimates are within the sampler tolerance. Any
+    other split, including one whose estimates miss the thresholds, is evaluated
+    exactly with split_pruning: estimates only skip exact counts, they never
+    reject a split.
+
+    :param candidate_rule: A list of JoinableIndexedAttributes instances representing the candidate rule.
+    :param body: A set of table occurrences representing the body of the candidate rule.
+    :param head: A set of table occurrences representing the head of the candidate rule.
+    :param db_inspector: An instance of AlchemyUtility for database interaction.
+    :param mapper: An instance of AttributeMapper for attribute mapping.
+    :param sampler: The sampling settings, which also count the decisions taken.
+    :return: A tuple (keep, support, confidence, exact), where ``exact`` is False
+             when support and confidence are estimates.
+    """
+    if not valid_split(candidate_rule, body, head):
+        return False, 0, 0, True
+    plan = plan or RulePlan(candidate_rule, mapper)
+    estimate = estimate_split(candidate_rule, body, head, db_inspector, mapper, sampler, plan=plan)
+    if estimate is not None:
+        threshold = SPLIT_PRUNING_MEAN_THRESHOLD
+        if min_score is not None:
+            threshold = max(threshold, min_score)
+        if (
+            not below_thresholds(
+                estimate.support_low, estimate.confidence_low, threshold, min_support, min_confidence
+            )
+            and estimate.relative_error <= sampler.tolerance
+        ):
+            sampler.accepted += 1
+            return True, estimate.support, estimate.confidence, False
+    sampler.verified += 1
+    return (
+        *split_pruning(
+            candidate_rule, body, head, db_inspector, mapper,
+            min_score=min_score, min_support=min_support, min_confidence=min_confidence,
+            bounds=bounds, plan=plan,
+        ),
+        True,
+    )
+
+
+def valid_split(
+        candidate_rule: CandidateRule,
+        body: set[TableOccurrence],
+        head: set[TableOccurrence],
+) -> bool:
+    """
+    Structural checks of a split done before any query: the body and the head must
+    be non-empty, and a table with several occurrences must not have an occurrence
+    that appears in a single join of the candidate rule.
+
+    :param candidate_rule: A list of JoinableIndexedAttributes instances representing the candidate rule.
+    :param body: A set of table occurrences representing the body of the candidate rule.
+    :param head: A set of table occurrences representing the head of the candidate rule.
+    :return: True if the split must be evaluated against the database.
+    """
+    if len(body) == 0 and len(head) == 0:
+        return False  # invalid split, should not happen
+    if len(body) == 0 or len(head) == 0:
+        return False  # we prune empty body or head
+    pairs_count = Counter((attr.i, attr.j) for jia in candidate_rule for attr in jia)
+
+    table_indexed = defaultdict(list)
+    for i, j in head | body:  # Union of both frozensets
+        table_indexed[i].append(j)
+    for i in table_indexed:
+        if len(table_indexed[i]) > 1:
+            if pairs_count[(i, table_indexed[i][0])] == 1:
+                return False
+    return True
+
+
+async def split_pruning_async(
+        candidate_rule: CandidateRule,
+        body: set[TableOccurrence],
+        head: set[TableOccurrence],
+        db_inspector: AlchemyUtility,
+        mapper: AttributeMapper,
+        min_support: float = 0,
+        min_confidence: float = 0,
+        bounds: SplitBounds = None,
+        plan: RulePlan = None,
+) -> tuple[bool, float, float]:
+    """
+    Asynchronous counterpart of split_pruning. The prediction, support and
+    confidence counts are sent concurrently over the inspector's async pool;
+    the emptiness checks of the synchronous version are implied by the counts,
+    so the result is the same. Only the statistics bound is checked before the
+    queries are sent, since they all run at once.
+
+    :param candidate_rule: A list of JoinableIndexedAttributes instances representing the candidate rule.
+    :param body: A set of table occurrences representing the body of the candidate rule.
+    :param head: A set of table occurrences representing the head of the candidate rule.
+    :param db_inspector: An AlchemyUtility with an open async pool (see open_async_pool).
+    :param mapper: An instance of AttributeMapper for attribute mapping.
+    :return: A tuple (keep, support, confidence).
+    """
+    if not valid_split(candidate_rule, body, head):
+        return False, 0, 0
+    plan = plan or RulePlan(candidate_rule, mapper)
+    if bounds is not None and (min_support or min_confidence):
+        x_chains = plan.x_chains(body, head)
+        upper_bound = measure_upper_bound(bounds.prediction_upper_bound(plan.join_conditions, x_chains), x_chains)
+        if below_thresholds(
+            upper_bound, upper_bound, SPLIT_PRUNING_MEAN_THRESHOLD, min_support, min_confidence
+        ):
+            bounds.splits_pruned += 1
+            bounds.avoid(PREDICTION_QUERIES + SUPPORT_QUERIES + CONFIDENCE_QUERIES)
+            return False, 0, 0
+    total_tuples, total_tuples_satisfying_body, total_tuples_satisfying_head = await asyncio.gather(
+        db_inspector.get_join_row_count_async(
+            plan.join_conditions,
+            count_over=plan.x_chains(body, head),
+            disjoint_semantics=APPLY_DISJOINT,
+        ),
+        db_inspector.get_join_row_count_async(
+            list(set(plan.side_conditions(body))),
+            count_over=plan.x_chains(body, head, select_body=True),
+            disjoint_semantics=APPLY_DISJOINT,
+        ),
+        db_inspector.get_join_row_count_async(
+            plan.side_conditions(head),
+            count_over=plan.x_chains(body, head, select_head=True),
+            disjoint_semantics=APPLY_DISJOINT,
+        ),
+    )
+    if not total_tuples:
+        return False, 0, 0  # prune if the prediction is 0
+
+    support = total_tuples / total_tuples_satisfying_body if total_tuples_satisfying_body else 0
+    confidence = total_tuples / total_tuples_satisfying_head if total_tuples_satisfying_head else 0
+
+    if confidence == 0 and support == 0:
+        return False, 0, 0
+
+    keep = not below_thresholds(
+        support, confidence, SPLIT_PRUNING_MEAN_THRESHOLD, min_support, min_confidence
+    )
+    return keep, support, confidence
+
+
+async def evaluate_splits_async(
+        candidate_rule: CandidateRule,
+        splits: list[tuple[set[TableOccurrence], set[TableOccurrence]]],
+        db_inspector: AlchemyUtility,
+        mapper: AttributeMapper,
+        min_support: float = 0,
+        min_confidence: float = 0,
+        bounds: SplitBounds = None,
+) -> list[tuple[set[TableOccurrence], set[TableOccurrence], bool, float, float]]:
+    """
+    Evaluate all splits of a candidate rule concurrently.
+
+    :param candidate_rule: The candidate rule.
+    :param splits: The (body, head) splits to evaluate.
+    :param db_inspector: An AlchemyUtility with an open async pool.
+    :param mapper: An instance of AttributeMapper for attribute mapping.
+    :return: A list of (body, head, keep, support, confidence), in the order of ``splits``.
+    """
+    plan = RulePlan(candidate_rule, mapper)
+    results = await asyncio.gather(*(
+        split_pruning_async(
+            candidate_rule, body, head, db_inspector, mapper,
+            min_support=min_support, min_confidence=min_confidence, bounds=bounds, plan=plan,
+        )
+        for body, head in splits
+    ))
+    return [(body, head, *result) for (body, head), result in zip(splits, results)]
 
 
 def powerset(iterable):
@@ -529,13 +993,17 @@ def extract_table_occurrences(
 def attr(
     table_occurrence: TableOccurrence,
     candidate_rule: CandidateRule,
+    plan: RulePlan = None,
 ) -> JoinableIndexedAttributes:
     """
     Extracts the attributes of a table occurrence from a candidate_rule.
     :param table_occurrence: Tuple representing a table occurrence (i, j).
     :param candidate_rule: List of JoinableIndexedAttributes representing the candidate rule.
+    :param plan: Optional RulePlan of the candidate rule, which already groups them.
     :return: The list of attributes of the table occurrence.
     """
+    if plan is not None:
+        return plan.occurrence_attributes(table_occurrence)
     cr_chains = CandidateRuleChains(candidate_rule).cr_chains
     cr_chains_table_occurrence = []
     for chain in cr_chains:
@@ -551,39 +1019,59 @@ def attr(
 
 def split_candidate_rule(
     candidate_rule: CandidateRule,
+    plan: RulePlan = None,
+    max_head_size: Optional[int] = 1,
 ) -> set[
     tuple[set[(int, int)], set[(int, int)]]
 ]:  # where (int, int) is a table occurrence
     """
     Split a path into a set of table occurrence pairs.
 
+    The heads are enumerated directly, up to ``max_head_size`` occurrences, instead
+    of going through the powerset of the occurrences. An occurrence whose attributes
+    equal those of an earlier occurrence of the same table cannot be in the body; the
+    occurrences are encoded as bits so that this check is a mask test per head.
+
     :param candidate_rule: A list of tuples of JoinableIndexedAttributes (representing the candidate_rule)
+    :param plan: Optional RulePlan of the candidate rule.
+    :param max_head_size: Maximum number of occurrences in the head (None for any
+                          size, which also yields the split with an empty body).
     :return: A set of table occurrence pairs
     """
-    table_occurrences = extract_table_occurrences(candidate_rule)
     if candidate_rule is None or len(candidate_rule) == 0:
         return False
+    occurrence_set = extract_table_occurrences(candidate_rule)
+    # Bits follow the iteration order of the occurrences and the sets are built as
+    # the powerset enumeration built them: valid_split looks at the first occurrence
+    # of a table in iteration order.
+    table_occurrences = list(occurrence_set)
+    # The attributes of each occurrence are computed once for all the splits.
+    signatures = [
+        tuple((a.i, a.j, a.k) for a in attr(table_occurrence, candidate_rule, plan))
+        for table_occurrence in table_occurrences
+    ]
+    body_excluded = 0
+    for bit, (i, j) in enumerate(table_occurrences):
+        if any(
+            i == ip and jp < j and signatures[bit] == signatures[bitp]
+            for bitp, (ip, jp) in enumerate(table_occurrences)
+        ):
+            body_excluded |= 1 << bit
+
+    n = len(table_occurrences)
+    all_bits = (1 << n) - 1
+    max_head_size = n if max_head_size is None else min(max_head_size, n)
     valid_splits = set()
-    for body in powerset(table_occurrences):
-        body = set(body)
-        head = table_occurrences - body
-        # Check the condition for all (i, j) in head
-        condition_met = True
-        if len(head) == 0:
-            condition_met = False
-        for ij in body:
-            if any(
-                ij[0] == ijp[0]
-                and ijp[1] < ij[1]
-                and attr(ij, candidate_rule) == attr(ijp, candidate_rule)
-                for ijp in table_occurrences
-            ):
-                condition_met = False
-                break
-            else:
-                condition_met = True
-        if condition_met:
-            valid_splits.add((frozenset(body), frozenset(head)))
+    for size in range(1, max_head_size + 1):
+        for head_bits in combinations(range(n), size):
+            head_mask = 0
+            for bit in head_bits:
+                head_mask |= 1 << bit
+            body_mask = all_bits & ~head_mask
+            if body_mask & body_excluded:
+                continue
+            body = {table_occurrences[bit] for bit in range(n) if body_mask >> bit & 1}
+            valid_splits.add((frozenset(body), frozenset(occurrence_set - body)))
     return valid_splits
 
 
@@ -591,6 +1079,7 @@ def instantiate_tgd(
     candidate_rule: CandidateRule,
     split: tuple[set[TableOccurrence], set[TableOccurrence]],
     mapper: AttributeMapper,
+    plan: RulePlan = None,
 ) -> str:
     """
     This function instantiates a tuple-generating dependency (TGD) from a candidate rule and a split.
@@ -603,19 +1092,74 @@ def instantiate_tgd(
     :param candidate_rule: A list of JoinableIndexedAttributes instances representing the candidate rule.
     :param split: A tuple containing two sets of table occurrences representing the body and head of the split.
     :param mapper: An instance of AttributeMapper for attribute mapping.
+    :param plan: Optional RulePlan of the candidate rule.
     :return: A string representing the instantiated TGD.
     """
+    plan = plan or RulePlan(candidate_rule, mapper)
     # Step 1: Determine the equivalence classes from the candidate rule
-    cr_chains = CandidateRuleChains(candidate_rule).cr_chains
+    cr_chains = plan.chains
     # Step 2: Assign variables to each equivalence class
     variable_assignment = assign_variables(cr_chains, split)
     # Step 3: Construct the predicates
-    psi, phi = construct_predicates(variable_assignment, candidate_rule, mapper, split)
+    psi, phi = construct_predicates(variable_assignment, candidate_rule, mapper, split, plan=plan)
     # Return the instantiated TGD as a string
     tgd_str = construct_tgd_string(psi, phi, variable_assignment, split[0], split[1])
     return tgd_str
 
 
+def build_tgd_rule(
+    candidate_rule: CandidateRule,
+    split: tuple[set[TableOccurrence], set[TableOccurrence]],
+    mapper: AttributeMapper,
+    support: float,
+    confidence: float,
+    exact: bool = True,
+    plan: RulePlan = None,
+) -> TGDRule:
+    """
+    Build the TGDRule of an accepted split directly from the candidate rule, rather
+    than parsing back the string of instantiate_tgd. Each atom gives one
+    Predicate(attribute, table occurrence, variable) per attribute, with the
+    variables of assign_variables; only the display string is rendered.
+
+    :param candidate_rule: A list of JoinableIndexedAttributes instances representing the candidate rule.
+    :param split: A tuple containing two sets of table occurrences representing the body and head of the split.
+    :param mapper: An instance of AttributeMapper for attribute mapping.
+    :param support: The support of the rule.
+    :param confidence: The confidence of the rule.
+    :param exact: False when support and confidence are estimated on a sample.
+    :param plan: Optional RulePlan of the candidate rule.
+    :return: The rule.
+    """
+    plan = plan or RulePlan(candidate_rule, mapper)
+    body, head = split
+    variable_assignment = assign_variables(plan.chains, split)
+    predicates = {True: [], False: []}
+    atoms = {True: [], False: []}
+    for table_occurrence, assignments in occurrence_assignments(
+        variable_assignment, candidate_rule, mapper, plan
+    ).items():
+        relation = f"{mapper.index_to_table_name[table_occurrence[0]]}_{table_occurrence[1]}"
+        in_body = table_occurrence in body
+        predicates[in_body].extend(
+            Predicate(attr_name, relation, variable) for attr_name, variable in assignments
+        )
+        atoms[in_body].append(
+            f"{relation}({', '.join(f'{attr_name}={variable}' for attr_name, variable in assignments)})"
+        )
+    display = construct_tgd_string(
+        " ∧ ".join(atoms[True]), " ∧ ".join(atoms[False]), variable_assignment, body, head
+    )
+    return TGDRule(
+        body=tuple(predicates[True]),
+        head=tuple(predicates[False]),
+        display=display,
+        accuracy=support,
+        confidence=confidence,
+        exact=exact,
+    )
+
+
 def construct_tgd_string(
     psi: str,
     phi: str,
@@ -717,11 +1261,42 @@ def assign_variables(
     return variables_assignment
 
 
+def occurrence_assignments(
+    variable_assignment: dict[IndexedAttribute, str],
+    candidate_rule: CandidateRule,
+    mapper: AttributeMapper,
+    plan: RulePlan = None,
+) -> dict[TableOccurrence, list[tuple[str, str]]]:
+    """
+    Group the (attribute name, variable) pairs of a candidate rule by table occurrence,
+    in the order in which they appear in the candidate rule, without duplicates.
+
+    :param variable_assignment: A dictionary mapping each IndexedAttribute to a variable name.
+    :param candidate_rule: A list of JoinableIndexedAttributes instances representing the candidate rule.
+    :param mapper: An instance of AttributeMapper for attribute mapping.
+    :param plan: Optional RulePlan of the candidate rule, providing the resolved attributes.
+    :return: The pairs of each table occurrence.
+    """
+    attr_by_table_occurrence = {}
+    for pair in candidate_rule:
+        for indexed_attr in pair:
+            if plan is not None:
+                attribute = plan.attributes[indexed_attr]
+            else:
+                attribute = mapper.indexed_attribute_to_attribute(indexed_attr)
+            assignment = (attribute.name, variable_assignment[indexed_attr])
+            assignments = attr_by_table_occurrence.setdefault((indexed_attr.i, indexed_attr.j), [])
+            if assignment not in assignments:
+                assignments.append(assignment)
+    return attr_by_table_occurrence
+
+
 def construct_predicates(
     variable_assignment: dict[IndexedAttribute, str],
     candidate_rule: CandidateRule,
     mapper: AttributeMapper,
     split: tuple[set[TableOccurrence], set[TableOccurrence]],
+    plan: RulePlan = None,
 ) -> tuple[str, str]:
     """
     This function constructs the predicates for the body and head of a candidate rule.
@@ -732,6 +1307,7 @@ def construct_predicates(
     :param candidate_rule: A list of JoinableIndexedAttributes instances representing the candidate rule.
     :param mapper: An instance of AttributeMapper for attribute mapping.
     :param split: A tuple containing two sets of table occurrences representing the body and head of the split.
+    :param plan: Optional RulePlan of the candidate rule, providing the resolved attributes.
     :return: A tuple containing two strings. The first string is the predicate for the body (psi),
              and the second string is the predicate for the head (phi).
     """
@@ -739,83 +1315,53 @@ def construct_predicates(
     body_predicates = []  # For \psi
     head_predicates = []  # For \phi
     body, head = split
-    # Group by table occurrences
-    attr_by_table_occurrence = {}
-    for pair in candidate_rule:
-        for indexed_attr in pair:
-            # Convert IndexedAttribute to Attribute for readable representation
-            attribute = mapper.indexed_attribute_to_attribute(indexed_attr)
-            attr_name = attribute.name
-            # Determine the variable assigned to this indexed attribute
-            variable = variable_assignment[indexed_attr]
-            if (
-                indexed_attr.i,
-                indexed_attr.j,
-            ) not in attr_by_table_occurrence:
-                attr_by_table_occurrence[(indexed_attr.i, indexed_attr.j)] = []
-            attr_str = f"{attr_name}={variable}"
-            if (
-                attr_str
-                not in attr_by_table_occurrence[(indexed_attr.i, indexed_attr.j)]
-            ):
-                attr_by_table_occurrence[(indexed_attr.i, indexed_attr.j)].append(
-                    attr_str
-                )
-    for (
-        table_occurrence,
-        attr_list,
-    ) in attr_by_table_occurrence.items():
+    for table_occurrence, assignments in occurrence_assignments(
+        variable_assignment, candidate_rule, mapper, plan
+    ).items():
         # Convert IndexedAttribute to Attribute for readable representation
         table = mapper.index_to_table_name[table_occurrence[0]]
-        attr_list = ", ".join(attr_list)
+        attr_list = ", ".join(f"{attr_name}={variable}" for attr_name, variable in assignments)
         predicate = f"{table}_{table_occurrence[1]}({attr_list})"
         # Append the variable-attribute pair to the appropriate predicate part
         if table_occurrence in body:
             body_predicates.append(predicate)
         else:
             head_predicates.append(predicate)
-
     # Combine predicate components into strings
     psi = " ∧ ".join(body_predicates)
     phi = " ∧ ".join(head_predicates)
     return psi, phi
 
 
-def calculate_support(
+def side_conditions(
     candidate_rule: CandidateRule,
-    body: set[TableOccurrence],
-    head: set[TableOccurrence],
-    db_inspector: AlchemyUtility,
+    side: set[TableOccurrence],
     mapper: AttributeMapper,
-    total_tuples: int = None,
-) -> float:
+    plan: RulePlan = None,
+) -> list[tuple[str, int, str, str, int, str]]:
     """
-    Calculate the support of a candidate rule.
-    :param candidate_rule: The candidate rule for which to calculate support.
-    :param body: The body part of the candidate rule for which to calculate support.
-    :param db_inspector: An instance of a class that provides database inspection functionalities.
+    Build the join conditions restricted to one side (body or head) of a split:
+    the conditions of the candidate rule touching the side, plus the conditions
+    linking attributes of the side that belong to the same chain.
+
+    :param candidate_rule: The candidate rule.
+    :param side: The table occurrences of the body or of the head.
     :param mapper: An instance of AttributeMapper for mapping indexed attributes to actual database attributes.
-    :return: The support value as a float.
+    :param plan: Optional RulePlan of the candidate rule, which caches the conditions per side.
+    :return: The list of join conditions.
     """
+    if plan is not None:
+        return plan.side_conditions(side)
     cr_chains = CandidateRuleChains(candidate_rule).cr_chains
-
-    x_chains = CandidateRuleChains(candidate_rule).get_x_chains(
-        body, head, mapper, select_body=True
-    )
-
-
-    #if total_tuples == 0:
-    #    return 0
-
-    support_condition: list[tuple[str, int, str, str, int, str]] = []
-    # First, add the constraints from the body
+    conditions: list[tuple[str, int, str, str, int, str]] = []
+    # First, add the constraints from the side
     for jia in candidate_rule:
         attr1, attr2 = jia
-        if (attr1.i, attr1.j) in body or (
+        if (attr1.i, attr1.j) in side or (
             attr2.i,
             attr2.j,
-        ) in body:
-            support_condition.append(
+        ) in side:
+            conditions.append(
                 (
                     mapper.indexed_attribute_to_attribute(attr2).table,
                     attr2.j,
@@ -834,10 +1380,10 @@ def calculate_support(
                         if (
                                 attr11 != attr22
                                 and attr22 not in jia
-                                and (attr11.i, attr11.j) in body
-                                and (attr22.i, attr22.j) in body
+                                and (attr11.i, attr11.j) in side
+                                and (attr22.i, attr22.j) in side
                         ):
-                            support_condition.append(
+                            conditions.append(
                                 (
                                     mapper.indexed_attribute_to_attribute(attr22).table,
                                     attr22.j,
@@ -847,15 +1393,55 @@ def calculate_support(
                                     mapper.indexed_attribute_to_attribute(attr11).name,
                                 )
                             )
-    support_condition = list(set(support_condition))
+    return conditions
+
+
+def calculate_support(
+    candidate_rule: CandidateRule,
+    body: set[TableOccurrence],
+    head: set[TableOccurrence],
+    db_inspector: AlchemyUtility,
+    mapper: AttributeMapper,
+    total_tuples: int = None,
+    count_limit: int = None,
+    plan: RulePlan = None,
+) -> float:
+    """
+    Calculate the support of a candidate rule.
+    :param candidate_rule: The candidate rule for which to calculate support.
+    :param body: The body part of the candidate rule for which to calculate support.
+    :param db_inspector: An instance of a class that provides database inspection functionalities.
+    :param mapper: An instance of AttributeMapper for mapping indexed attributes to actual database attributes.
+    :param count_limit: Optional bound on the body count: counting stops there, and 0 is
+                        returned when it is reached (the support is then at most
+                        total_tuples / count_limit).
+    :param plan: Optional RulePlan of the candidate rule.
+    :return: The support value as a float.
+    """
+    plan = plan or RulePlan(candidate_rule, mapper)
+    x_chains = plan.x_chains(body, head, select_body=True)
+
+
+    #if total_tuples == 0:
+    #    return 0
+
+    support_condition = list(set(plan.side_conditions(body)))
     is_body_tuples_emtpy = db_inspector.check_threshold(
         support_condition, count_over=x_chains, flag="support", disjoint_semantics=APPLY_DISJOINT, threshold=0
     )
     if not  bool(is_body_tuples_emtpy):
         return 0
-    total_tuples_satisfying_body = db_inspector.get_join_row_count(
-        support_condition, count_over=x_chains, flag="support", disjoint_semantics=APPLY_DISJOINT
-    )
+    if count_limit is not None:
+        total_tuples_satisfying_body = db_inspector.count_up_to(
+            support_condition, count_limit, count_over=x_chains, flag="support",
+            disjoint_semantics=APPLY_DISJOINT,
+        )
+        if total_tuples_satisfying_body >= count_limit:
+            return 0
+    else:
+        total_tuples_satisfying_body = db_inspector.get_join_row_count(
+            support_condition, count_over=x_chains, flag="support", disjoint_semantics=APPLY_DISJOINT
+        )
     if total_tuples_satisfying_body == 0 :
         return 0
     support = total_tuples / total_tuples_satisfying_body
@@ -873,7 +1459,8 @@ def calculate_confidence(
     db_inspector: AlchemyUtility,
     mapper: AttributeMapper,
     total_tuples: int = None,
-
+    count_limit: int = None,
+    plan: RulePlan = None,
 ) -> float:
     """
     Calculate the confidence of a candidate rule.
@@ -882,63 +1469,35 @@ def calculate_confidence(
     :param head: The head part of the candidate rule for which to calculate confidence.
     :param db_inspector: An instance of a class that provides database inspection functionalities.
     :param mapper: An instance of AttributeMapper for mapping indexed attributes to actual database attributes.
+    :param count_limit: Optional bound on the head count: counting stops there, and 0 is
+                        returned when it is reached (the confidence is then at most
+                        total_tuples / count_limit).
+    :param plan: Optional RulePlan of the candidate rule.
     :return: The confidence value as a float.
     """
+    plan = plan or RulePlan(candidate_rule, mapper)
     # total_tuples = prediction(candidate_rule, mapper, db_inspector, body, head)
-    x_chains = CandidateRuleChains(candidate_rule).get_x_chains(
-        body, head, mapper, select_head=True
-    )
-    cr_chains = CandidateRuleChains(candidate_rule).cr_chains
-
+    x_chains = plan.x_chains(body, head, select_head=True)
     #confidence_conditions: list[tuple[str, int, str, str, int, str]] = []
     # add constraints in head
-    head_conditions = []
-    for jia in candidate_rule:
-        attr1, attr2 = jia
-        if (attr1.i, attr1.j) in head or (
-            attr2.i,
-            attr2.j,
-        ) in head:
-            head_conditions.append(
-                (
-                    mapper.indexed_attribute_to_attribute(attr2).table,
-                    attr2.j,
-                    mapper.indexed_attribute_to_attribute(attr2).name,
-                    mapper.indexed_attribute_to_attribute(attr1).table,
-                    attr1.j,
-                    mapper.indexed_attribute_to_attribute(attr1).name,
-                )
-            )
-    for jia in candidate_rule:
-        for attr11 in jia:
-            for chain in cr_chains:
-                if attr11 in chain:
-                    for attr22 in chain:
-                        if (
-                                attr11 != attr22
-                                and attr22 not in jia
-                                and (attr11.i, attr11.j) in head
-                                and (attr22.i, attr22.j) in head
-                        ):
-                            head_conditions.append(
-                                (
-                                    mapper.indexed_attribute_to_attribute(attr22).table,
-                                    attr22.j,
-                                    mapper.indexed_attribute_to_attribute(attr22).name,
-                                    mapper.indexed_attribute_to_attribute(attr11).table,
-                                    attr11.j,
-                                    mapper.indexed_attribute_to_attribute(attr11).name,
-                                )
-                            )
+    head_conditions = plan.side_conditions(head)
     is_body_tuples_emtpy = db_inspector.check_threshold(
         head_conditions, count_over=x_chains, flag="head", disjoint_semantics=APPLY_DISJOINT, threshold=0
     )
     if not  bool(is_body_tuples_emtpy):
         return 0
 
-    total_tuples_satisfying_head = db_inspector.get_join_row_count(
-        head_conditions, count_over=x_chains, flag="head", disjoint_semantics=APPLY_DISJOINT
-    )
+    if count_limit is not None:
+        total_tuples_satisfying_head = db_inspector.count_up_to(
+            head_conditions, count_limit, count_over=x_chains, flag="head",
+            disjoint_semantics=APPLY_DISJOINT,
+        )
+        if total_tuples_satisfying_head >= count_limit:
+            return 0
+    else:
+        total_tuples_satisfying_head = db_inspector.get_join_row_count(
+            head_conditions, count_over=x_chains, flag="head", disjoint_semantics=APPLY_DISJOINT
+        )
     if total_tuples_satisfying_head == 0:
         return 0
     confidence = total_tuples / total_tuples_satisfying_head
@@ -1095,7 +1654,6 @@ import re
 from utils.rules import Predicate, TGDRule
 
 import re
-import random
 def str_to_predicate(relation_str):
     relation_pattern = r"\s*(\w+)\((.*?)\)\s*"
     relation_match = re.match(relation_pattern, relation_str)
@@ -1103,7 +1661,6 @@ def str_to_predicate(relation_str):
         relation, assignments_str = relation_match.groups()
         assignments = assignments_str.split(", ")
         predicates = []
-        random_int = str(random.randint(0, 10000))
         for assignment in assignments:
             var, idx = assignment.split("=")
             relation_id = relation.split("_")[-1].lower()
@@ -1111,7 +1668,8 @@ def str_to_predicate(relation_str):
             relation_name = "".join(relation.split("_")[:-1]).lower()
             relation_clean = f"{relation_name}{relation_sep}{var}".lower()
             relation_table = "_".join(relation.split("_")[:-1]).lower()
-            variable = f"t{relation_table}{random_int}"
+            # One tuple variable per atom, named after its table occurrence.
+            variable = f"t{relation_table}{relation_id}"
 
             predicates.append(
                 Predicate(
@@ -0,0 +1,72 @@
+"""
+Top-k rule selection for MATILDA.
+
+Keeps the k best rules by score in a min-heap. Once the heap is full, its
+smallest score is the acceptance threshold a new rule must exceed, which the
+discovery loop feeds back into split pruning to skip hopeless candidates.
+"""
+
+import heapq
+from typing import Any, Optional
+
+
+class TopKRules:
+    """
+    Min-heap of the k best rules by score.
+
+    A rule enters only if its score is strictly greater than the current
+    threshold, so among rules with equal scores the first discovered ones are
+    kept and the selection does not depend on how much was pruned.
+
+    :param k: Number of rules to keep.
+    """
+
+    def __init__(self, k: int):
+        if k < 1:
+            raise ValueError("top_k must be at least 1")
+        self.k = k
+        self._heap: list[tuple[float, int, Any]] = []
+        self._pushed = 0
+
+    @property
+    def threshold(self) -> Optional[float]:
+        """Score a rule must exceed to enter, or None while the heap is not full."""
+        if len(self._heap) < self.k:
+            return None
+        return self._heap[0][0]
+
+    def push(self, score: float, rule: Any) -> bool:
+        """
+        Offer a rule; return True if it was kept.
+
+        :param score: The score of the rule.
+        :param rule: The rule.
+        """
+        # Later rules get smaller tie keys, so on equal scores the most recent
+        # rule is at the top of the heap and is the one evicted.
+        self._pushed += 1
+        entry = (score, -self._pushed, rule)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+        if score <= self._heap[0][0]:
+            return False
+        heapq.heapreplace(self._heap, entry)
+        return True
+
+    def rules(self) -> list[Any]:
+        """Return the kept rules, best first (ties in discovery order)."""
+        return [rule for _, _, rule in sorted(self._heap, key=lambda entry: (-entry[0], -entry[1]))]
+
+    def state(self) -> tuple[list[tuple[float, int, Any]], int]:
+        """Snapshot of the heap, restored by ``restore`` (e.g. from a checkpoint)."""
+        return list(self._heap), self._pushed
+
+    def restore(self, state: tuple[list[tuple[float, int, Any]], int]):
+        """Replace the kept rules by a snapshot taken with ``state``."""
+        heap, self._pushed = state
+        self._heap = list(heap)
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._heap)
@@ -1,3 +1,8 @@
+import json
+import logging
+import os
+import time
+from statistics import mean
 from typing import Generator, Optional
 
 from algorithms.base_algorithm import BaseAlgorithm
@@ -10,9 +15,28 @@ from algorithms.MATILDA.tgd_discovery import (
     path_pruning,
     split_candidate_rule,
     split_pruning,
-    instantiate_tgd,
+    split_pruning_sampled,
+    build_tgd_rule,
+    release_path,
+    evaluate_splits_async,
+    BudgetExceededSplit,
 )
-from utils.rules import Rule, TGDRuleFactory
+from algorithms.MATILDA.constraint_graph import ConstraintGraph
+from algorithms.MATILDA.checkpoint import DEFAULT_CHECKPOINT_INTERVAL, DiscoveryCheckpoint
+from algorithms.MATILDA.deadline import DiscoveryDeadline
+from algorithms.MATILDA.evaluation_pipeline import EvaluationPipeline
+from algorithms.MATILDA.rule_plan import RulePlan
+from algorithms.MATILDA.sampling import SplitSampler
+from algorithms.MATILDA.search_space import SearchSpaceEstimator, recommend_limits
+from algorithms.MATILDA.split_bounds import SplitBounds
+from algorithms.MATILDA.subsumption import SubsumptionIndex
+from algorithms.MATILDA.top_k import TopKRules
+from database.alchemy_utility import QueryBudgetExceeded
+from utils.memory_budget import MemoryBudget, SpillableList
+from utils.rules import Rule
+
+# Budget multiplier for exact retries of splits that exceeded the query budget.
+QUERY_BUDGET_RETRY_FACTOR = 10
 
 
 class MATILDA(BaseAlgorithm):
@@ -29,6 +53,18 @@ class MATILDA(BaseAlgorithm):
         """
         self.db_inspector = database
         self.settings = settings or {}
+        self.split_bounds = None
+        self.sampler = None
+        self.budget_exceeded: list[BudgetExceededSplit] = []
+        self.index_report = None
+        self.result_cache_enabled = False
+        self.cost_model_enabled = False
+        self.deadline: Optional[DiscoveryDeadline] = None
+        self.discovery_summary: Optional[dict] = None
+        self.rules_found = 0
+        self.checkpoint: Optional[DiscoveryCheckpoint] = None
+        self.memory_budget: Optional[MemoryBudget] = None
+        self.subsumption_index: Optional[SubsumptionIndex] = None
 
     def discover_rules(self, **kwargs) -> Generator[Rule, None, None]:
         """
@@ -39,6 +75,106 @@ class MATILDA(BaseAlgorithm):
             - max_table (int): Maximum number of tables involved in a rule.
             - max_vars (int): Maximum number of variables in a rule.
             - traversal_algorithm (str): Algorithm to use for graph traversal ('dfs', 'bfs', 'astar').
+            - astar_heuristic (str): Heuristic of the A-star traversal ('naive', 'table_size',
+              'join_selectivity', 'query_cost' or 'hybrid', see heuristics.path_search); the default
+              prefers shorter rules.
+            - collect_statistics (bool): Profile all tables at init (row counts, distinct
+              values, NULL fractions, most frequent values, histograms) for the join size
+              estimates of the heuristics and the frequency-based bounds (default False).
+              The profile is saved in results_dir and reused while the database is unchanged.
+            - max_head_size (int): Maximum number of table occurrences in the head of a
+              rule (default 1). Larger heads are an opt-in: their number grows
+              combinatorially with the size of the candidates.
+            - min_node_join_rows (int): Drop the constraint graph nodes whose two-attribute
+              join has fewer rows before the traversal (default 0, i.e. no pruning; 1 drops
+              the empty joins only, which never loses a rule).
+            - auto_occurrence_limits (bool): Give fewer occurrences to the columns whose
+              extra occurrences only add near cross products or duplicate rows: one to
+              columns with at most two distinct values, two to unique columns and to the
+              columns of tables that cannot join themselves (default False). The limits
+              and the size of the constraint graph without and with them are printed and
+              saved in results_dir.
+            - occurrence_limits (dict): Number of occurrences of tables ({table: n}) or
+              columns ({table: {column: n}}), over the derived ones.
+            - incremental_materialization (bool): Reuse the materialized join of a path when
+              evaluating its extensions (SQLite only, default False).
+            - materialization_row_budget (int): Maximum number of rows kept in materialized joins.
+            - async_evaluation (bool): Evaluate the splits of each candidate concurrently over
+              an async connection pool while the traversal keeps generating candidates.
+              Cannot be combined with top_k, sampling_rate or the query budgets, whose
+              checks run on the sequential path only.
+            - async_pool_size (int): Number of read-only async connections.
+            - parallel_partitions (int): Count the joins involving large tables as this many
+              hash partitions in a process pool, summing the partial counts (SQLite
+              database files only).
+            - parallel_min_rows (int): Row count from which a table is large (default 1000000).
+            - index_advisor (bool): Record the columns read by the queries of the first
+              candidates, then create the composite indexes serving the most frequent
+              access paths and run ANALYZE. The report is kept in ``index_report``.
+            - index_advisor_warmup (int): Number of candidates recorded before the indexes
+              are created (default 20).
+            - index_advisor_max_indexes (int): Maximum number of indexes created (default 8).
+            - result_cache (bool): Reuse the query results of previous runs on the same
+              database from a persistent cache (SQLite database files only), and store
+              the results of this run in it. Purged with ``cli.py clean --cache``.
+            - result_cache_path (str): The cache file (default .cache/query_results.sqlite).
+            - result_cache_max_entries (int): Maximum number of cached results (default 1000000).
+            - cost_model (bool): Learn the latency of the count queries from their shapes
+              (SQLite database files only), saved across runs on the same database. Once
+              trained, it orders the sides of each split and, with top_k, the splits of
+              each candidate and the budget retries cheapest first; the 'query_cost'
+              astar_heuristic uses it too.
+            - cost_model_path (str): The model file (default .cache/cost_models.json).
+            - pipeline_queue_size (int): Maximum number of candidates in flight.
+            - top_k (int): Only return the k best rules by mean(support, confidence), best
+              first. The score of the k-th best rule found so far is used to skip queries
+              for splits and candidates that cannot beat it.
+            - min_support (float): Minimum support of a returned rule (default 0).
+            - min_confidence (float): Minimum confidence of a returned rule (default 0).
+              With a threshold set, splits whose statistics-based upper bounds cannot
+              reach it are skipped before any query; the number of queries avoided
+              is reported at the end of the run.
+            - sampling_rate (float): Evaluate splits first on a hash sample of this fraction
+              of the projected tuples; splits whose estimated intervals clear the
+              thresholds are accepted on the estimates, every other split is evaluated
+              exactly. Rules accepted on estimates have ``exact=False``.
+            - sampling_tolerance (float): Largest relative error of estimates accepted
+              without exact verification (default 0.1).
+            - sampling_confidence (float): Coverage of the estimated intervals (default 0.95).
+            - query_time_budget (float): Interrupt any single query running longer than this
+              many seconds (SQLite only). The split is skipped and recorded in
+              ``budget_exceeded`` with the reason.
+            - query_step_budget (int): Same, for a number of SQLite virtual machine instructions.
+            - query_budget_retry (str): Retry the splits that exceeded the budget after the
+              traversal, either "sampled" (on a sample, under the same budget) or "exact"
+              (with a budget QUERY_BUDGET_RETRY_FACTOR times larger). Splits that exceed
+              the budget again are dropped.
+            - timeout (float): Wall-clock budget of the whole run in seconds. Once spent,
+              the running query is interrupted (SQLite only), the rest of the traversal
+              is cut, and the rules found so far are returned.
+            - max_queries (int): Same, for a budget of executed count and threshold queries.
+              With either budget, ``discovery_summary`` holds the stop reason and the
+              number of unexplored paths; it is also written to results_dir.
+            - checkpoint_interval (float): Snapshot the traversal cursor and the results
+              every this many seconds, and when the run stops (timeout, error, signal),
+              so that ``resume`` continues it. Not used with async_evaluation.
+            - checkpoint_path (str): The checkpoint file (default
+              results_dir/checkpoint_<database>.pkl.gz).
+            - resume (bool): Continue from the checkpoint of a previous run with the same
+              settings and database, with the same final results as an uninterrupted run
+              (checkpoints every DEFAULT_CHECKPOINT_INTERVAL seconds without an interval).
+            - memory_budget (int or MemoryBudget): Memory budget of the run in bytes, or a
+              budget shared with the caller. The loaded table data, the result cache buffer,
+              the statement cache, the materialized joins, the checkpoint rule buffer and
+              the BFS and A-star frontiers register with it; once it is exceeded between two
+              candidates, they are evicted or spilled to disk in this order, so the run
+              slows down instead of running out of memory. Not used with async_evaluation.
+            - spill_dir (str): Directory of the spill files (default: the system temporary directory).
+            - subsumption_pruning (bool): Index the accepted rules of support 1 by head and
+              body, and skip without any query the splits with the same head whose body
+              holds the body of an indexed rule: they are implied by it and cannot score
+              higher (default False). The number of splits skipped is reported at the end
+              of the run. Not used with async_evaluation.
         :return: A generator yielding discovered TGDRules.
         """
         nb_occurrence = kwargs.get("nb_occurrence", self.settings.get("nb_occurrence", 3))
@@ -52,52 +188,704 @@ class MATILDA(BaseAlgorithm):
             self.settings.get("traversal_algorithm", "dfs")
         ).lower()
         
+        min_node_join_rows = kwargs.get(
+            "min_node_join_rows", self.settings.get("min_node_join_rows", 0)
+        )
+        auto_occurrence_limits = kwargs.get(
+            "auto_occurrence_limits", self.settings.get("auto_occurrence_limits", False)
+        )
+        occurrence_limits = kwargs.get(
+            "occurrence_limits", self.settings.get("occurrence_limits", None)
+        )
+        max_head_size = kwargs.get("max_head_size", self.settings.get("max_head_size", 1))
+        astar_heuristic = kwargs.get("astar_heuristic", self.settings.get("astar_heuristic", None))
+        collect_statistics = kwargs.get(
+            "collect_statistics", self.settings.get("collect_statistics", False)
+        )
+        if not isinstance(max_head_size, int) or max_head_size < 1:
+            raise ValueError(f"max_head_size must be a positive integer: {max_head_size}")
+        incremental_materialization = kwargs.get(
+            "incremental_materialization",
+            self.settings.get("incremental_materialization", False)
+        )
+        materialization_row_budget = kwargs.get(
+            "materialization_row_budget",
+            self.settings.get("materialization_row_budget", 500000)
+        )
+        async_evaluation = kwargs.get(
+            "async_evaluation", self.settings.get("async_evaluation", False)
+        )
+        async_pool_size = kwargs.get("async_pool_size", self.settings.get("async_pool_size", 4))
+        pipeline_queue_size = kwargs.get(
+            "pipeline_queue_size", self.settings.get("pipeline_queue_size", 16)
+        )
+        parallel_partitions = kwargs.get(
+            "parallel_partitions", self.settings.get("parallel_partitions", None)
+        )
+        parallel_min_rows = kwargs.get(
+            "parallel_min_rows", self.settings.get("parallel_min_rows", 1000000)
+        )
+        index_advisor = kwargs.get("index_advisor", self.settings.get("index_advisor", False))
+        index_advisor_warmup = kwargs.get(
+            "index_advisor_warmup", self.settings.get("index_advisor_warmup", 20)
+        )
+        index_advisor_max_indexes = kwargs.get(
+            "index_advisor_max_indexes", self.settings.get("index_advisor_max_indexes", 8)
+        )
+        result_cache = kwargs.get("result_cache", self.settings.get("result_cache", False))
+        result_cache_path = kwargs.get(
+            "result_cache_path", self.settings.get("result_cache_path", None)
+        )
+        result_cache_max_entries = kwargs.get(
+            "result_cache_max_entries", self.settings.get("result_cache_max_entries", 1000000)
+        )
+        cost_model = kwargs.get("cost_model", self.settings.get("cost_model", False))
+        cost_model_path = kwargs.get("cost_model_path", self.settings.get("cost_model_path", None))
+        top_k = kwargs.get("top_k", self.settings.get("top_k", None))
+        min_support = kwargs.get("min_support", self.settings.get("min_support", 0))
+        min_confidence = kwargs.get("min_confidence", self.settings.get("min_confidence", 0))
+        sampling_rate = kwargs.get("sampling_rate", self.settings.get("sampling_rate", None))
+        sampling_tolerance = kwargs.get(
+            "sampling_tolerance", self.settings.get("sampling_tolerance", 0.1)
+        )
+        sampling_confidence = kwargs.get(
+            "sampling_confidence", self.settings.get("sampling_confidence", 0.95)
+        )
+        query_time_budget = kwargs.get(
+            "query_time_budget", self.settings.get("query_time_budget", None)
+        )
+        query_step_budget = kwargs.get(
+            "query_step_budget", self.settings.get("query_step_budget", None)
+        )
+        query_budget_retry = kwargs.get(
+            "query_budget_retry", self.settings.get("query_budget_retry", None)
+        )
+        if query_budget_retry not in (None, "sampled", "exact"):
+            raise ValueError(f"Unknown query_budget_retry: {query_budget_retry}")
+        timeout = kwargs.get("timeout", self.settings.get("timeout", None))
+        max_queries = kwargs.get("max_queries", self.settings.get("max_queries", None))
+        checkpoint_interval = kwargs.get(
+            "checkpoint_interval", self.settings.get("checkpoint_interval", None)
+        )
+        checkpoint_path = kwargs.get("checkpoint_path", self.settings.get("checkpoint_path", None))
+        resume = kwargs.get("resume", self.settings.get("resume", False))
+        memory_budget = kwargs.get("memory_budget", self.settings.get("memory_budget", None))
+        spill_dir = kwargs.get("spill_dir", self.settings.get("spill_dir", None))
+        subsumption_pruning = kwargs.get(
+            "subsumption_pruning", self.settings.get("subsumption_pruning", False)
+        )
+        if async_evaluation:
+            unsupported = [
+                name
+                for name, value in (
+                    ("top_k", top_k),
+                    ("sampling_rate", sampling_rate),
+                    ("query_time_budget", query_time_budget),
+                    ("query_step_budget", query_step_budget),
+                    ("query_budget_retry", query_budget_retry),
+                )
+                if value is not None
+            ]
+            if unsupported:
+                raise ValueError(f"async_evaluation cannot be combined with {', '.join(unsupported)}")
+        started = time.monotonic()
+
+        self.memory_budget = None
+        if memory_budget is not None:
+            if async_evaluation:
+                logging.warning("The memory budget is not used with async_evaluation; running without it.")
+            else:
+                self.memory_budget = (
+                    memory_budget
+                    if isinstance(memory_budget, MemoryBudget)
+                    else MemoryBudget(memory_budget, spill_dir=spill_dir)
+                )
+                self.db_inspector.enable_memory_budget(self.memory_budget)
+
+        # The budgets cover the whole run, initialization included.
+        self.deadline = None
+        self.discovery_summary = None
+        self.rules_found = 0
+        if timeout is not None or max_queries is not None:
+            self.deadline = DiscoveryDeadline(timeout, max_queries, self.db_inspector.executed_queries)
+
         # Log the selected traversal algorithm
         print(f"Using {traversal_algorithm.upper()} for graph traversal")
         
         # create a results folder if it does not exist
         if results_path:
-            import os
             os.makedirs(results_path, exist_ok=True)
 
         cg, mapper, jia_list = init(
             self.db_inspector,
             max_nb_occurrence=nb_occurrence,
-            results_path=results_path
+            results_path=results_path,
+            min_node_join_rows=min_node_join_rows,
+            collect_statistics=collect_statistics,
+            auto_occurrence_limits=auto_occurrence_limits,
+            occurrence_limits=occurrence_limits,
         )
 
         if not jia_list:
+            self._report_deadline(results_path)
+            return
+
+        pruning = path_pruning
+        if self.deadline is not None:
+            pruning = self.deadline.pruning(path_pruning)
+            if self.deadline.deadline is not None:
+                self.db_inspector.set_run_deadline(self.deadline.deadline)
+
+        self.result_cache_enabled = bool(result_cache) and self.db_inspector.enable_result_cache(
+            result_cache_path, result_cache_max_entries
+        )
+        if result_cache and not self.result_cache_enabled:
+            logging.warning("The result cache needs a SQLite database file; running without it.")
+        if parallel_partitions is not None:
+            self.db_inspector.enable_partitioned_counting(parallel_partitions, parallel_min_rows)
+
+        self.cost_model_enabled = bool(cost_model) and self.db_inspector.enable_cost_model(cost_model_path)
+        if cost_model and not self.cost_model_enabled:
+            logging.warning("The cost model needs a SQLite database file; running without it.")
+
+        statistics = getattr(self.db_inspector, "statistics", None)
+        self.split_bounds = (
+            SplitBounds(
+                statistics,
+                join_frequencies=collect_statistics,
+                query_cost=self.db_inspector.estimate_query_cost if self.cost_model_enabled else None,
+            )
+            if statistics is not None
+            else None
+        )
+        heuristic_func = None
+        if astar_heuristic:
+            # Imported here: heuristics.path_search imports the algorithms package.
+            from heuristics.path_search import create_heuristic
+            heuristic_func = create_heuristic(self.db_inspector, mapper, astar_heuristic)
+
+        self.checkpoint = None
+        if checkpoint_interval is not None or resume:
+            if async_evaluation:
+                logging.warning("Checkpoints are not taken with async_evaluation; running without them.")
+            else:
+                self.checkpoint = DiscoveryCheckpoint(
+                    checkpoint_path or os.path.join(
+                        results_path or ".", f"checkpoint_{self.db_inspector.base_name}.pkl.gz"
+                    ),
+                    checkpoint_interval if checkpoint_interval is not None else DEFAULT_CHECKPOINT_INTERVAL,
+                    dict(
+                        database=self.db_inspector.fingerprint() or self.db_inspector.base_name,
+                        nb_occurrence=nb_occurrence,
+                        max_table=max_table,
+                        max_vars=max_vars,
+                        traversal_algorithm=traversal_algorithm,
+                        astar_heuristic=astar_heuristic,
+                        min_node_join_rows=min_node_join_rows,
+                        auto_occurrence_limits=auto_occurrence_limits,
+                        occurrence_limits=occurrence_limits,
+                        max_head_size=max_head_size,
+                        top_k=top_k,
+                        min_support=min_support,
+                        min_confidence=min_confidence,
+                        sampling_rate=sampling_rate,
+                        sampling_tolerance=sampling_tolerance,
+                        sampling_confidence=sampling_confidence,
+                        query_time_budget=query_time_budget,
+                        query_step_budget=query_step_budget,
+                        query_budget_retry=query_budget_retry,
+                        subsumption_pruning=subsumption_pruning,
+                    ),
+                )
+
+        if async_evaluation:
+            if subsumption_pruning:
+                logging.warning("Subsumption pruning is not used with async_evaluation; running without it.")
+            yield from self._discover_rules_async(
+                cg, mapper, max_table, max_vars, traversal_algorithm,
+                async_pool_size, pipeline_queue_size, min_support, min_confidence, max_head_size,
+                pruning,
+            )
+            self._report_split_bounds()
+            self._report_result_cache()
+            self._report_cost_model()
+            self._report_deadline(results_path)
             return
 
-        # Use the generic traverse_graph function with the selected algorithm
-        for candidate_rule in traverse_graph(
-            cg,
-            None,
-            path_pruning,
+        top_rules = TopKRules(top_k) if top_k is not None else None
+        subsumption = self.subsumption_index = SubsumptionIndex() if subsumption_pruning else None
+        if sampling_rate is not None:
+            self.sampler = SplitSampler(sampling_rate, sampling_tolerance, sampling_confidence)
+
+        self.budget_exceeded = []
+        if query_time_budget is not None or query_step_budget is not None:
+            self.db_inspector.set_query_budget(query_time_budget, query_step_budget)
+
+        checkpoint = self.checkpoint
+        restored = checkpoint.restore() if checkpoint is not None and resume else None
+        if restored is not None:
+            self.rules_found = restored["rules_found"]
+            self.budget_exceeded = list(restored["budget_exceeded"])
+            if top_rules is not None:
+                top_rules.restore(restored["top_k"])
+            if subsumption is not None:
+                subsumption.restore(restored["subsumption"] or [])
+            print(
+                f"Resuming from {checkpoint.path} at start node {checkpoint.start_index} "
+                f"with {self.rules_found} rules"
+            )
+            if top_rules is None:
+                # Yielded again so that the results of the run are complete.
+                yield from checkpoint.rules
+        elif resume:
+            print("No checkpoint to resume, starting from scratch")
+        if checkpoint is not None and self.memory_budget is not None:
+            checkpoint.rules = SpillableList(checkpoint.rules, self.memory_budget.spill_dir)
+            self.memory_budget.register(
+                "rule_buffer", checkpoint.rules.memory_usage, checkpoint.rules.release_memory
+            )
+        completed = restored is not None and restored["completed"]
+
+        def mark_checkpoint(evaluated: bool = False):
+            # Only states between two fully evaluated candidates are resumable.
+            if not self._deadline_expired():
+                checkpoint.mark(
+                    self.budget_exceeded, self.rules_found,
+                    top_rules.state() if top_rules is not None else None,
+                    evaluated=evaluated,
+                    subsumption=subsumption.records if subsumption is not None else None,
+                )
+
+        def start_callback(index: int):
+            checkpoint.start_node(index)
+            mark_checkpoint()
+
+        backtrack_func = None
+        if incremental_materialization:
+            self.db_inspector.enable_incremental_materialization(materialization_row_budget)
+            backtrack_func = lambda path: release_path(path, mapper, self.db_inspector)
+
+        self.index_report = None
+        warmup_candidates = index_advisor_warmup if index_advisor else None
+        if index_advisor:
+            self.db_inspector.enable_index_advisor()
+
+        try:
+            # Use the generic traverse_graph function with the selected algorithm
+            # (a completed run is only replayed from its checkpoint)
+            candidates = () if completed else traverse_graph(
+                cg,
+                None,
+                pruning,
+                self.db_inspector,
+                mapper,
+                max_table=max_table,
+                max_vars=max_vars,
+                algorithm=traversal_algorithm,
+                heuristic_func=heuristic_func,
+                backtrack_func=backtrack_func,
+                start_index=checkpoint.start_index if checkpoint is not None else 0,
+                start_callback=start_callback if checkpoint is not None else None,
+                memory_budget=self.memory_budget,
+            )
+            for candidate_rule in candidates:
+                if not candidate_rule:
+                    continue
+                if self.memory_budget is not None:
+                    self.memory_budget.check()
+                if checkpoint is not None and checkpoint.skip():
+                    continue
+                if warmup_candidates is not None:
+                    warmup_candidates -= 1
+                    if warmup_candidates < 0:
+                        self._apply_index_advice(index_advisor_max_indexes)
+                        warmup_candidates = None
+
+                min_score = None
+                plan = RulePlan(candidate_rule, mapper)
+                splits = split_candidate_rule(candidate_rule, plan, max_head_size)
+                if top_rules is not None and self.split_bounds is not None:
+                    # Cheap splits first raise the top-k threshold early for the costly ones.
+                    splits = self.split_bounds.order_splits(plan, splits)
+                for body, head in splits:
+                    if not body or not head or len(head) > max_head_size:
+                        continue
+                    if self._deadline_expired():
+                        break
+                    if subsumption is not None and subsumption.subsumed(candidate_rule, body, head):
+                        continue
+
+                    if top_rules is not None:
+                        min_score = top_rules.threshold
+                    thresholds = dict(
+                        min_score=min_score,
+                        min_support=min_support,
+                        min_confidence=min_confidence,
+                        bounds=self.split_bounds,
+                    )
+                    try:
+                        res, support, confidence, exact = self._evaluate_split(
+                            candidate_rule, body, head, mapper, self.sampler, plan=plan, **thresholds
+                        )
+                    except QueryBudgetExceeded as error:
+                        if error.reason != "deadline":
+                            self._record_budget_exceeded(candidate_rule, body, head, error)
+                        continue
+
+                    if not res:
+                        continue
+
+                    if subsumption is not None:
+                        subsumption.add(candidate_rule, body, head, support, exact)
+                    rule = build_tgd_rule(
+                        candidate_rule, (body, head), mapper, support, confidence, exact=exact, plan=plan
+                    )
+                    self.rules_found += 1
+                    if top_rules is None:
+                        if checkpoint is not None:
+                            checkpoint.rules.append(rule)
+                        yield rule
+                    else:
+                        top_rules.push(mean([support, confidence]), rule)
+                if checkpoint is not None:
+                    mark_checkpoint(evaluated=True)
+
+            if checkpoint is not None:
+                # Past the last start node: a resumed run only retries the budget splits.
+                checkpoint.start_node(len(cg.nodes))
+                mark_checkpoint()
+
+            if (
+                query_budget_retry is not None and self.budget_exceeded
+                and not self._deadline_expired() and not completed
+            ):
+                for rule in self._retry_budget_exceeded(
+                    mapper, query_budget_retry, query_time_budget, query_step_budget,
+                    top_rules, min_support, min_confidence,
+                ):
+                    self.rules_found += 1
+                    if top_rules is None:
+                        if checkpoint is not None:
+                            checkpoint.rules.append(rule)
+                        yield rule
+                    else:
+                        top_rules.push(mean([rule.accuracy, rule.confidence]), rule)
+        except BaseException:
+            # Interrupted (error, signal, generator closed): keep the last consistent state.
+            if checkpoint is not None:
+                checkpoint.save()
+            raise
+        if checkpoint is not None:
+            mark_checkpoint()
+            checkpoint.save(completed=not self._deadline_expired())
+
+        if warmup_candidates is not None:
+            # Fewer candidates than the warm-up: index for the next runs.
+            self._apply_index_advice(index_advisor_max_indexes)
+        self._report_split_bounds()
+        self._report_result_cache()
+        self._report_cost_model()
+        self._report_deadline(results_path)
+        if checkpoint is not None:
+            print(checkpoint.summary(time.monotonic() - started))
+        if self.memory_budget is not None:
+            print(self.memory_budget.summary())
+        if self.sampler is not None:
+            print(self.sampler.summary())
+        if self.budget_exceeded:
+            print(f"{len(self.budget_exceeded)} splits exceeded the query budget")
+        if subsumption is not None:
+            print(
+                f"Subsumption skipped {subsumption.splits_skipped} splits "
+                f"({len(subsumption)} rules indexed)"
+            )
+        if top_rules is not None:
+            yield from top_rules.rules()
+
+    def plan_discovery(self, **kwargs) -> dict:
+        """
+        Forecast a discovery run without running it: after init, the traversal tree
+        is sampled with random probes and one split of each probed candidate is
+        evaluated (see SearchSpaceEstimator), which gives the expected number of
+        candidates, splits, queries and rules, the wall time and the peak frontier
+        of each traversal algorithm. The plan is printed and saved in results_dir.
+
+        :param kwargs: The settings of discover_rules (nb_occurrence, max_table, max_vars,
+            traversal_algorithm, max_head_size, min_node_join_rows, collect_statistics,
+            auto_occurrence_limits, occurrence_limits, min_support, min_confidence, timeout), and:
+            - plan_probes (int): Number of random probes (default 100).
+            - plan_seed (int): Seed of the probes (default 0).
+            With a timeout, the plan also recommends the largest max_table and max_vars
+            whose forecast wall time under the traversal algorithm fits in it.
+        :return: The estimate under the given limits, with ``recommended`` when a
+                 timeout is set (None if no limits fit).
+        """
+        settings = {**self.settings, **kwargs}
+        max_table = settings.get("max_table", 3)
+        max_vars = settings.get("max_vars", 6)
+        max_head_size = settings.get("max_head_size", 1)
+        traversal_algorithm = settings.get("traversal_algorithm", "dfs").lower()
+        results_path = settings.get("results_dir", None)
+        collect_statistics = settings.get("collect_statistics", False)
+        min_support = settings.get("min_support", 0)
+        min_confidence = settings.get("min_confidence", 0)
+        timeout = settings.get("timeout", None)
+        if traversal_algorithm in ("a-star", "a_star"):
+            traversal_algorithm = "astar"
+        if results_path:
+            os.makedirs(results_path, exist_ok=True)
+
+        cg, mapper, jia_list = init(
             self.db_inspector,
+            max_nb_occurrence=settings.get("nb_occurrence", 3),
+            results_path=results_path,
+            min_node_join_rows=settings.get("min_node_join_rows", 0),
+            collect_statistics=collect_statistics,
+            auto_occurrence_limits=settings.get("auto_occurrence_limits", False),
+            occurrence_limits=settings.get("occurrence_limits", None),
+        )
+        statistics = getattr(self.db_inspector, "statistics", None)
+        bounds = (
+            SplitBounds(statistics, join_frequencies=collect_statistics)
+            if statistics is not None
+            else None
+        )
+
+        def evaluate_split(candidate_rule, body, head, plan) -> bool:
+            try:
+                return split_pruning(
+                    candidate_rule, body, head, self.db_inspector, mapper, plan=plan,
+                    min_support=min_support, min_confidence=min_confidence, bounds=bounds,
+                )[0]
+            except QueryBudgetExceeded:
+                return False
+
+        estimator = SearchSpaceEstimator(
+            cg if jia_list else ConstraintGraph(),
             mapper,
-            max_table=max_table,
-            max_vars=max_vars,
-            algorithm=traversal_algorithm,
-        ):
-            if not candidate_rule:
-                continue
-
-            splits = split_candidate_rule(candidate_rule)
-            for body, head in splits:
-                if not body or not head or len(head) != 1:
+            evaluate_split,
+            self.db_inspector.executed_queries,
+            max_head_size=max_head_size,
+            probes=settings.get("plan_probes", 100),
+            seed=settings.get("plan_seed", 0),
+        )
+        started = time.monotonic()
+        planned = estimator.estimate(max_table, max_vars)
+        if timeout is not None:
+            planned["recommended"] = recommend_limits(
+                estimator.estimate, max_table, max_vars, timeout, traversal_algorithm
+            )
+        planned["planning_seconds"] = round(time.monotonic() - started, 3)
+        planned["traversal_algorithm"] = traversal_algorithm
+
+        for algorithm, forecast in planned["forecasts"].items():
+            print(
+                f"{algorithm.upper()}: ~{forecast['candidates']:.0f} candidates "
+                f"(±{forecast['candidates_relative_error']:.0%}), {forecast['splits']:.0f} splits, "
+                f"{forecast['queries']:.0f} queries, {forecast['rules']:.0f} rules, "
+                f"{forecast['seconds']:.1f}s, peak frontier {forecast['peak_frontier_paths']:.0f} paths "
+                f"({forecast['peak_memory_bytes'] / 2 ** 20:.1f} MiB)"
+            )
+        if timeout is not None:
+            recommended = planned["recommended"]
+            print(
+                f"Recommended limits for {timeout}s: max_table={recommended['max_table']}, "
+                f"max_vars={recommended['max_vars']}"
+                if recommended is not None
+                else f"No limits fit in {timeout}s"
+            )
+        if results_path:
+            with open(f"{results_path}/plan_{self.db_inspector.base_name}.json", "w") as f:
+                json.dump(planned, f, indent=4)
+        return planned
+
+    def _apply_index_advice(self, max_indexes: int):
+        self.index_report = self.db_inspector.apply_index_advice(max_indexes)
+        if self.checkpoint is not None:
+            # The new indexes change the database file, not the results.
+            self.checkpoint.settings["database"] = (
+                self.db_inspector.fingerprint() or self.db_inspector.base_name
+            )
+        speedup = self.index_report["mean_speedup"]
+        print(
+            f"Index advisor created {len(self.index_report['indexes'])} indexes in "
+            f"{self.index_report['build_time']:.2f}s"
+            + (f", mean speedup x{speedup:.2f} on the hottest queries" if speedup else "")
+        )
+
+    def _evaluate_split(self, candidate_rule, body, head, mapper, sampler, plan=None, **thresholds):
+        """Evaluate a split, on a sample first when a sampler is given; returns (keep, support, confidence, exact)."""
+        if sampler is not None:
+            return split_pruning_sampled(
+                candidate_rule, body, head, self.db_inspector, mapper, sampler, plan=plan, **thresholds
+            )
+        return (
+            *split_pruning(candidate_rule, body, head, self.db_inspector, mapper, plan=plan, **thresholds),
+            True,
+        )
+
+    def _record_budget_exceeded(self, candidate_rule, body, head, error: QueryBudgetExceeded):
+        logging.warning(
+            f"Query budget exceeded ({error.reason}) after {error.elapsed:.2f}s for split "
+            f"{sorted(body)} => {sorted(head)} of candidate {candidate_rule}"
+        )
+        self.budget_exceeded.append(BudgetExceededSplit(list(candidate_rule), body, head, error.reason))
+
+    def _retry_budget_exceeded(
+        self,
+        mapper,
+        retry: str,
+        query_time_budget: Optional[float],
+        query_step_budget: Optional[int],
+        top_rules: Optional[TopKRules],
+        min_support: float,
+        min_confidence: float,
+    ) -> Generator[Rule, None, None]:
+        """
+        Evaluate again the splits that exceeded the query budget, on a sample or
+        exactly with a larger budget, and yield the accepted rules. Splits that
+        exceed the budget again stay in ``budget_exceeded``.
+        """
+        pending, self.budget_exceeded = self.budget_exceeded, []
+        sampler = None
+        if retry == "sampled":
+            sampler = self.sampler or SplitSampler(0.1)
+        else:
+            self.db_inspector.set_query_budget(
+                query_time_budget * QUERY_BUDGET_RETRY_FACTOR if query_time_budget is not None else None,
+                query_step_budget * QUERY_BUDGET_RETRY_FACTOR if query_step_budget is not None else None,
+            )
+        if self.split_bounds is not None and self.split_bounds.query_cost is not None:
+            # Cheapest first, so that a later deadline drops the costly ones.
+            costs = [
+                self.split_bounds.split_cost(RulePlan(split.candidate_rule, mapper), split.body, split.head)
+                for split in pending
+            ]
+            if pending and None not in costs:
+                pending = [split for _, split in sorted(zip(costs, pending), key=lambda pair: pair[0])]
+        try:
+            for position, (candidate_rule, body, head, _) in enumerate(pending):
+                if self._deadline_expired():
+                    # Left for a later run, with the splits that exceeded the budget again.
+                    self.budget_exceeded.extend(pending[position:])
+                    break
+                try:
+                    res, support, confidence, exact = self._evaluate_split(
+                        candidate_rule, body, head, mapper, sampler,
+                        min_score=top_rules.threshold if top_rules is not None else None,
+                        min_support=min_support,
+                        min_confidence=min_confidence,
+                        bounds=self.split_bounds,
+                    )
+                except QueryBudgetExceeded as error:
+                    if error.reason == "deadline":
+                        self.budget_exceeded.append(pending[position])
+                    else:
+                        self._record_budget_exceeded(candidate_rule, body, head, error)
                     continue
+                finally:
+                    release_path(candidate_rule, mapper, self.db_inspector)
+                if res:
+                    yield build_tgd_rule(candidate_rule, (body, head), mapper, support, confidence, exact=exact)
+        finally:
+            self.db_inspector.set_query_budget(query_time_budget, query_step_budget)
 
-                res, support, confidence = split_pruning(
-                    candidate_rule, body, head, self.db_inspector, mapper
-                )
+    def _report_split_bounds(self):
+        """Report how many queries the statistics and threshold bounds avoided."""
+        if self.split_bounds is None:
+            return
+        print(
+            f"Bounds avoided {self.split_bounds.queries_avoided} queries "
+            f"({self.split_bounds.splits_pruned} splits pruned before any query)"
+        )
 
+    def _report_result_cache(self):
+        """Write the new results to the persistent cache and report its hit rate."""
+        if self.result_cache_enabled:
+            print(self.db_inspector.flush_result_cache())
+
+    def _deadline_expired(self) -> bool:
+        return self.deadline is not None and self.deadline.expired()
+
+    def _report_deadline(self, results_path: Optional[str]):
+        """
+        Summarize a run under a timeout or query budget: why it stopped and how
+        many paths were left unexplored, in ``discovery_summary`` and results_path.
+        """
+        if self.deadline is None:
+            return
+        if self.deadline.deadline is not None:
+            self.db_inspector.set_run_deadline(None)
+        self.discovery_summary = self.deadline.summary(self.rules_found)
+        if self.deadline.reason is not None:
+            print(
+                f"Discovery stopped early ({self.deadline.reason}) with {self.rules_found} rules; "
+                f"{self.deadline.unexplored_paths} paths left unexplored"
+            )
+        if results_path:
+            with open(f"{results_path}/discovery_summary_{self.db_inspector.base_name}.json", "w") as f:
+                json.dump(self.discovery_summary, f, indent=4)
+
+    def _report_cost_model(self):
+        """Save the cost model for the next runs and report how much it has learned."""
+        if self.cost_model_enabled:
+            print(self.db_inspector.save_cost_model())
+
+    def _discover_rules_async(
+        self,
+        cg,
+        mapper,
+        max_table: int,
+        max_vars: int,
+        traversal_algorithm: str,
+        async_pool_size: int,
+        pipeline_queue_size: int,
+        min_support: float = 0,
+        min_confidence: float = 0,
+        max_head_size: int = 1,
+        pruning=path_pruning,
+    ) -> Generator[Rule, None, None]:
+        """
+        Pipelined variant of discover_rules: the splits of each candidate are
+        evaluated concurrently on an async connection pool while the traversal
+        runs ahead. Rules are yielded in the same order as the sequential path.
+        """
+        async def evaluate(candidate_rule):
+            if self._deadline_expired():
+                return []
+            splits = [
+                (body, head)
+                for body, head in split_candidate_rule(candidate_rule, max_head_size=max_head_size)
+                if body and head and len(head) <= max_head_size
+            ]
+            return await evaluate_splits_async(
+                candidate_rule, splits, self.db_inspector, mapper,
+                min_support=min_support, min_confidence=min_confidence, bounds=self.split_bounds,
+            )
+
+        pipeline = EvaluationPipeline(
+            evaluate,
+            queue_size=pipeline_queue_size,
+            on_start=lambda: self.db_inspector.open_async_pool(async_pool_size),
+            on_stop=self.db_inspector.close_async_pool,
+        )
+        candidates = (
+            candidate_rule
+            for candidate_rule in traverse_graph(
+                cg,
+                None,
+                pruning,
+                self.db_inspector,
+                mapper,
+                max_table=max_table,
+                max_vars=max_vars,
+                algorithm=traversal_algorithm,
+            )
+            if candidate_rule
+        )
+        for candidate_rule, evaluations in pipeline.run(candidates):
+            for body, head, res, support, confidence in evaluations:
                 if not res:
-                    debug = True
-                    if debug:
-                        print("removed")
-                        a = instantiate_tgd(candidate_rule, (body, head), mapper)
                     continue
-
-                tgd = instantiate_tgd(candidate_rule, (body, head), mapper)
-                yield TGDRuleFactory.str_to_tgd(tgd, support, confidence)
+                self.rules_found += 1
+                yield build_tgd_rule(candidate_rule, (body, head), mapper, support, confidence)
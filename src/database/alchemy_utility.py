@@ -1,9 +1,11 @@
+import asyncio
 import csv
 import hashlib
 import logging
 import os
 import time
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
 import sys
 sys.path.append("../../")
 sys.path.append("../")
@@ -14,6 +16,7 @@ from sqlalchemy import (
     alias,
     and_,
     create_engine,
+    event,
     func,
     select,
     text
@@ -24,11 +27,17 @@ from sqlalchemy.orm import sessionmaker
 from tqdm import tqdm
 
 from src.utils.log_setup import setup_loggers
-from src.database.database_connection_manager import DatabaseConnectionManager
+from src.database.database_connection_manager import (
+    DatabaseConnectionManager,
+    PRAGMA_PROFILES,
+    apply_pragma_profile,
+)
 from src.database.index_manager import IndexManager
 from src.database.data_exporter import DataExporter
 from src.database.triple_converter import TripleConverter
-from src.database.query_utility import QueryUtility
+from src.database.query_utility import QueryBudgetExceeded, QueryUtility
+from src.database.statistics_catalog import StatisticsCatalog
+from src.utils.memory_budget import MemoryBudget, approximate_size
 import colorama   # Added colorama
 colorama.init(autoreset=True)
 
@@ -69,6 +78,8 @@ class AlchemyUtility:
         create_csv: bool = True,
         create_tsv: bool = True,
         get_data: bool = True,
+        pragma_profile: str = "default",
+        pool_size: int = None,
     ):
         setup_loggers()
         self.logger_query_time = logging.getLogger("query_time")
@@ -86,7 +97,7 @@ class AlchemyUtility:
         else:
             self.base_name = str(url).split("//")[-1].split(":")[0]
 
-        self.db_manager = DatabaseConnectionManager(db_url)
+        self.db_manager = DatabaseConnectionManager(db_url, pragma_profile=pragma_profile, pool_size=pool_size)
         self.index_manager = IndexManager(self.db_manager.conn, self.db_manager.metadata)
         self.data_exporter = DataExporter(
             db_path=self.database_path,
@@ -107,6 +118,7 @@ class AlchemyUtility:
             logger_query_time=self.logger_query_time,
             logger_query_results=self.logger_query_results
         )
+        self.statistics = StatisticsCatalog(self.query_utility)
 
         # Export CSV
         if create_csv:
@@ -122,8 +134,10 @@ class AlchemyUtility:
             self.data_exporter.export_triples_to_tsv(triples)
             self.database_path_tsv = os.path.join(self.database_path,self.base_name, "tsv")
         # Load data if needed
+        self._tables_data: Optional[Dict[str, Dict[str, Any]]] = None
+        self._tables_data_bytes = 0
         if get_data:
-            self.tables_data = self._extract_table_data()
+            self._tables_data = self._extract_table_data()
     def _setup_logging_handlers(self):
         formatter = ColorFormatter('%(asctime)s - %(levelname)s - %(message)s')
 
@@ -139,12 +153,10 @@ class AlchemyUtility:
         self.logger_query_results.addHandler(handler_results)
         self.logger_query_results.setLevel(logging.DEBUG)
     def _setup_sqlite(self, create_index: bool):
-        """Configure SQLite PRAGMAs and optionally create indexes."""
-        self.db_manager.conn.execute(text("PRAGMA temp_store = MEMORY;"))
-        max_cache_size = self.get_cache_size()
-        self.db_manager.conn.execute(text(f"PRAGMA cache_size = {max_cache_size};"))
-        self.db_manager.conn.execute(text("PRAGMA read_uncommitted = 1;"))
-        self.db_manager.conn.execute(text("PRAGMA synchronous = OFF;"))
+        """
+        Optionally create indexes. SQLite PRAGMAs are applied to every pooled
+        connection by the DatabaseConnectionManager PRAGMA profile.
+        """
         # Commit or rollback any pending transaction before creating indexes
         self.db_manager.conn.commit()
         if create_index:
@@ -164,17 +176,43 @@ class AlchemyUtility:
         cache_size_pages = cache_size_kb // 1.024
         return int(cache_size_pages)
 
+    @property
+    def tables_data(self) -> Dict[str, Dict[str, Any]]:
+        """The rows of all tables, extracted again if released under memory pressure."""
+        if self._tables_data is None:
+            self._tables_data = self._extract_table_data()
+        return self._tables_data
+
     def _extract_table_data(self) -> Dict[str, Dict[str, Any]]:
         """Extract data from all tables."""
         data = {}
+        self._tables_data_bytes = 0
         for table_name in sorted(self.db_manager.metadata.tables.keys()):
             table = self.db_manager.metadata.tables.get(table_name)
             if table is not None:
                 columns = [col.name for col in table.columns]
                 rows = self._select_query(table_name, columns)
                 data[table_name] = {"columns": columns, "rows": rows}
+                if rows:
+                    self._tables_data_bytes += len(rows) * approximate_size(tuple(rows[0]), 1)
         return data
 
+    def enable_memory_budget(self, budget: MemoryBudget):
+        """
+        Register the loaded table data (released first: it is extracted again on
+        access) and the caches of the query layer with a memory budget.
+        """
+        budget.register("tables_data", self._loaded_tables_data_bytes, self._release_tables_data)
+        self.query_utility.enable_memory_budget(budget)
+
+    def _loaded_tables_data_bytes(self) -> int:
+        return self._tables_data_bytes if self._tables_data is not None else 0
+
+    def _release_tables_data(self, target: int) -> int:
+        freed = self._loaded_tables_data_bytes()
+        self._tables_data = None
+        return freed
+
     def _select_query(self, table_name: str, attributes: List[str]) -> List[Tuple]:
         table_obj = self.db_manager.metadata.tables.get(table_name)
         if table_obj is None:
@@ -200,18 +238,195 @@ class AlchemyUtility:
         count_over: List[List[Tuple[str, int, str]]] = None,
         threshold: int = 1,
         flag: str="",
+        materialize: bool = False,
     ) -> int:
         return self.query_utility.check_threshold(
-            join_conditions, disjoint_semantics, distinct, count_over, threshold,flag
+            join_conditions, disjoint_semantics, distinct, count_over, threshold,flag,
+            materialize=materialize,
         )
     def get_join_row_count(self,
         join_conditions: List[Tuple[str, int, str, str, int, str]],
         disjoint_semantics: bool = False,
         distinct: bool = False,
         count_over: List[List[Tuple[str, int, str]]] = None,
-       flag: str=""
+       flag: str="",
+        materialize: bool = False,
+        limit: int = None,
+    ) -> int:
+        return self.query_utility.get_join_row_count(
+            join_conditions,disjoint_semantics,distinct,count_over, materialize=materialize, limit=limit
+        )
+
+    def count_up_to(self,
+        join_conditions: List[Tuple[str, int, str, str, int, str]],
+        n: int,
+        disjoint_semantics: bool = False,
+        distinct: bool = False,
+        count_over: List[List[Tuple[str, int, str]]] = None,
+        flag: str="",
+        materialize: bool = False,
+    ) -> int:
+        """Return min(count, n), reading at most n rows or projected tuples of the join."""
+        return self.query_utility.count_up_to(
+            join_conditions, n, disjoint_semantics, distinct, count_over, materialize=materialize
+        )
+
+    def get_sampled_row_count(self,
+        join_conditions: List[Tuple[str, int, str, str, int, str]],
+        sample_buckets: int,
+        disjoint_semantics: bool = False,
+        distinct: bool = False,
+        count_over: List[List[Tuple[str, int, str]]] = None,
+        flag: str="",
+    ) -> int:
+        return self.query_utility.get_sampled_row_count(
+            join_conditions, sample_buckets, disjoint_semantics, distinct, count_over
+        )
+
+    def set_query_budget(self, seconds: float = None, steps: int = None):
+        """Interrupt single queries over a time or SQLite instruction budget (see QueryUtility)."""
+        self.query_utility.set_query_budget(seconds, steps)
+
+    def set_run_deadline(self, deadline: float = None):
+        """Interrupt the queries still running at a time.monotonic() deadline (see QueryUtility)."""
+        self.query_utility.set_run_deadline(deadline)
+
+    def executed_queries(self) -> int:
+        """Number of statements executed against the database so far (cached results excluded)."""
+        return self.query_utility.queries_executed
+
+    def fingerprint(self) -> Optional[str]:
+        """Fingerprint of the SQLite database file, changed by any write to it, or None."""
+        return self.query_utility.fingerprint()
+
+    def collect_statistics(self, path: str = None) -> bool:
+        """
+        Profile every table into the statistics catalog. With ``path``, statistics
+        saved there for the same database file are reused, and new ones are saved.
+        Returns True if the statistics were loaded from ``path``.
+        """
+        fingerprint = self.query_utility.fingerprint()
+        if path is not None and self.statistics.load(path, fingerprint):
+            return True
+        self.statistics.collect(self.get_table_names())
+        if path is not None:
+            self.statistics.save(path, fingerprint)
+        return False
+
+    def enable_partitioned_counting(self, partitions: int, min_rows: int = 1000000):
+        """Split the counts of joins over tables of at least min_rows rows into parallel partitions."""
+        self.query_utility.enable_partitioned_counting(partitions, min_rows, self.statistics.row_count)
+
+    def enable_result_cache(self, path=None, max_entries: int = 1000000) -> bool:
+        """Cache query results on disk across runs (see QueryUtility.enable_result_cache)."""
+        if path is None:
+            return self.query_utility.enable_result_cache(max_entries=max_entries)
+        return self.query_utility.enable_result_cache(path, max_entries)
+
+    def flush_result_cache(self) -> str:
+        """Write the buffered results to the result cache and return its hit summary."""
+        cache = self.query_utility.result_cache
+        if cache is None:
+            return "Result cache disabled"
+        cache.flush()
+        return cache.summary()
+
+    def enable_cost_model(self, path=None) -> bool:
+        """Learn the latency of the count queries across runs (see QueryUtility.enable_cost_model)."""
+        if path is None:
+            return self.query_utility.enable_cost_model(row_count=self.statistics.row_count)
+        return self.query_utility.enable_cost_model(path, self.statistics.row_count)
+
+    def save_cost_model(self) -> str:
+        """Store the cost model for the next runs and return a summary of it."""
+        model = self.query_utility.cost_model
+        if model is None:
+            return "Cost model disabled"
+        self.query_utility.save_cost_model()
+        return f"Cost model: {model.latency.observations} query latencies observed"
+
+    def estimate_query_cost(self,
+                            join_conditions: List[Tuple[str, int, str, str, int, str]],
+                            count_over: List[List[Tuple[str, int, str]]] = None) -> Optional[float]:
+        """Predicted latency in seconds of a count query, or None while no cost model is trained."""
+        return self.query_utility.estimate_query_cost(join_conditions, count_over)
+
+    def enable_index_advisor(self):
+        """Record the join and projection columns of the queries from now on (see IndexAdvisor)."""
+        self.query_utility.enable_index_advisor()
+
+    def apply_index_advice(self, max_indexes: int = 8, benchmark_queries: int = 5) -> Dict[str, Any]:
+        """
+        Create the composite indexes recommended by the index advisor for the
+        workload recorded so far, in one transaction followed by ANALYZE, and time
+        the hottest recorded count queries before and after.
+
+        :return: A report with the created indexes, the build time and the mean speedup.
+        """
+        advisor = self.query_utility.index_advisor
+        if advisor is None:
+            raise ValueError("The index advisor is not enabled.")
+        indexes = advisor.recommend(max_indexes, self.index_manager.existing_indexes())
+        statements = advisor.hottest_statements(benchmark_queries)
+        before = self.query_utility.time_statements(statements)
+        build_time = self.index_manager.create_covering_indexes(indexes) if indexes else 0.0
+        after = self.query_utility.time_statements(statements)
+        speedups = [old / new for old, new in zip(before, after) if new > 0]
+        report = {
+            "indexes": [f"{table}({', '.join(columns)})" for table, columns in indexes],
+            "build_time": build_time,
+            "queries_timed": len(statements),
+            "mean_speedup": sum(speedups) / len(speedups) if speedups else None,
+        }
+        self.logger_query_time.info(f"Index advisor: {report}")
+        return report
+
+    def enable_incremental_materialization(self, row_budget: int = 500000):
+        """Reuse the materialized join of a traversal path when evaluating its extensions."""
+        self.query_utility.enable_incremental_materialization(row_budget)
+
+    def release_materialization(self, join_conditions: List[Tuple[str, int, str, str, int, str]]):
+        self.query_utility.release_materialization(join_conditions)
+
+    async def open_async_pool(self, pool_size: int = 4):
+        """
+        Open a bounded pool of read-only async connections for concurrent counts.
+        For SQLite the database file is opened read-only through aiosqlite.
+        Must be called from the event loop that will run the queries.
+        """
+        url = make_url(self.db_url)
+        if url.drivername == "sqlite":
+            url = url.set(
+                drivername="sqlite+aiosqlite",
+                database=f"file:{quote(url.database)}",
+                query={"mode": "ro", "uri": "true"},
+            )
+        # Kept apart from async_engine, the read-write engine of ``async with``.
+        self.async_pool_engine = create_async_engine(url, pool_size=pool_size, max_overflow=0)
+        if url.drivername.startswith("sqlite"):
+            event.listen(
+                self.async_pool_engine.sync_engine,
+                "connect",
+                lambda dbapi_connection, record: apply_pragma_profile(dbapi_connection, PRAGMA_PROFILES["read_only"]),
+            )
+        self._async_slots = asyncio.Semaphore(pool_size)
+
+    async def close_async_pool(self):
+        await self.async_pool_engine.dispose()
+        self.async_pool_engine = None
+
+    async def get_join_row_count_async(self,
+        join_conditions: List[Tuple[str, int, str, str, int, str]],
+        disjoint_semantics: bool = False,
+        distinct: bool = False,
+        count_over: List[List[Tuple[str, int, str]]] = None,
+        flag: str="",
     ) -> int:
-        return self.query_utility.get_join_row_count(join_conditions,disjoint_semantics,distinct,count_over)
+        async with self._async_slots:
+            return await self.query_utility.get_join_row_count_async(
+                self.async_pool_engine, join_conditions, disjoint_semantics, distinct, count_over
+            )
+
     def get_table_names(self) -> List[str]:
         return self.query_utility._get_table_names()
     def get_attribute_names(self, table_name: str) -> List[str]:
@@ -228,21 +443,8 @@ class AlchemyUtility:
         :param attribute_name: The name of the attribute/column.
         :return: List of values for the attribute.
         """
-        from sqlalchemy import select
-        
-        table = self.query_utility.metadata.tables.get(table_name)
-        if table is None:
-            return []
-        
-        column = table.columns.get(attribute_name)
-        if column is None:
-            return []
-        
-        query = select(column)
         try:
-            with self.db_manager.engine.connect() as conn:
-                result = conn.execute(query)
-                return [row[0] for row in result.fetchall()]
+            return self.query_utility.get_column_values(table_name, attribute_name)
         except Exception as e:
             self.logger_query_time.error(f"Error fetching values for {table_name}.{attribute_name}: {e}")
             return []
@@ -271,6 +473,7 @@ class AlchemyUtility:
         return False
     def close(self):
         """Close database connection."""
+        self.query_utility.close()
         self.db_manager.close()
 
     def __enter__(self):
@@ -0,0 +1,157 @@
+import json
+import math
+import os
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+# Shared by all runs and processes unless another path is given; one model per database file.
+DEFAULT_COST_MODEL_PATH = Path(__file__).resolve().parents[2] / ".cache" / "cost_models.json"
+
+# Observations needed before the predictions are used.
+MIN_OBSERVATIONS = 20
+
+# Weight kept by the past observations at each new one, so that the model follows
+# changes of the database (new indexes, more rows) over a few thousand queries.
+FORGETTING_FACTOR = 0.999
+
+# Ridge regularization of the least squares fit.
+RIDGE = 1e-3
+
+# Latencies are fitted on a log scale, offset so that instant queries stay finite.
+LATENCY_OFFSET = 1e-5
+
+# Kinds of count statements observed; sampled and partitioned counts are not.
+OBSERVED_KINDS = ("count", "bounded_count", "threshold")
+
+
+class OnlineRegression:
+    """
+    Least squares regression updated one observation at a time: it keeps the
+    sufficient statistics X'X and X'y, with exponential forgetting, and solves
+    the (ridge) normal equations when a prediction is needed.
+    """
+
+    def __init__(self, dimension: int):
+        self.xtx = np.zeros((dimension, dimension))
+        self.xty = np.zeros(dimension)
+        self.observations = 0
+        self._weights: Optional[np.ndarray] = None
+
+    def update(self, x: np.ndarray, y: float):
+        self.xtx = FORGETTING_FACTOR * self.xtx + np.outer(x, x)
+        self.xty = FORGETTING_FACTOR * self.xty + y * x
+        self.observations += 1
+        self._weights = None
+
+    def predict(self, x: np.ndarray) -> Optional[float]:
+        """Predicted value, or None while there are fewer than MIN_OBSERVATIONS."""
+        if self.observations < MIN_OBSERVATIONS:
+            return None
+        if self._weights is None:
+            regularization = RIDGE * np.eye(len(self.xty))
+            self._weights = np.linalg.solve(self.xtx + regularization, self.xty)
+        return float(self._weights @ x)
+
+    def to_json(self) -> dict:
+        return {"xtx": self.xtx.tolist(), "xty": self.xty.tolist(), "observations": self.observations}
+
+    def load_json(self, data: dict) -> bool:
+        xtx = np.array(data["xtx"], dtype=float)
+        if xtx.shape != self.xtx.shape:
+            # Written with another feature set.
+            return False
+        self.xtx = xtx
+        self.xty = np.array(data["xty"], dtype=float)
+        self.observations = data["observations"]
+        self._weights = None
+        return True
+
+
+class CostModel:
+    """
+    Learned cost of the count queries of QueryUtility.
+
+    Each executed query is described by the shape of its join (number of table
+    occurrences and conditions, the sizes of the joined tables, the projected
+    classes and whether the count is bounded) and its observed latency and row
+    count are fitted online by two log-scale linear regressions. The model is
+    saved per database file and keeps learning over the following runs.
+
+    :param row_count: Returns the number of rows of a table (see StatisticsCatalog).
+    """
+
+    def __init__(self, row_count: Callable[[str], int]):
+        self.row_count = row_count
+        self.latency = OnlineRegression(len(self.features(("count", (), False, None, False))))
+        self.rows = OnlineRegression(len(self.latency.xty))
+
+    def features(self, plan_key: Tuple) -> np.ndarray:
+        """
+        Feature vector of a query given its canonical plan key (kind, sorted join
+        conditions, disjoint semantics, projection; see QueryUtility).
+        """
+        kind, conditions, _, projection, _ = plan_key
+        occurrences = set()
+        for table1, occurrence1, _, table2, occurrence2, _ in conditions:
+            occurrences.add((table1, occurrence1))
+            occurrences.add((table2, occurrence2))
+        sizes = [math.log1p(self.row_count(table)) for table, _ in occurrences]
+        return np.array([
+            1.0,
+            sum(sizes),
+            max(sizes, default=0.0),
+            len(occurrences),
+            len(conditions),
+            len(projection or ()),
+            1.0 if kind != "count" else 0.0,
+        ])
+
+    def observe(self, plan_key: Tuple, seconds: float, rows):
+        """Record the latency of an executed query, and its row count if it was a full count."""
+        if plan_key[0] not in OBSERVED_KINDS:
+            return
+        x = self.features(plan_key)
+        self.latency.update(x, math.log(seconds + LATENCY_OFFSET))
+        if plan_key[0] == "count" and rows is not None:
+            self.rows.update(x, math.log1p(rows))
+
+    @property
+    def trained(self) -> bool:
+        return self.latency.observations >= MIN_OBSERVATIONS
+
+    def predict_latency(self, plan_key: Tuple) -> Optional[float]:
+        """Predicted latency of a query in seconds, or None while the model is not trained."""
+        estimate = self.latency.predict(self.features(plan_key))
+        return None if estimate is None else max(math.exp(estimate) - LATENCY_OFFSET, 0.0)
+
+    def predict_rows(self, plan_key: Tuple) -> Optional[float]:
+        """Predicted result of a count query, or None while the model is not trained."""
+        estimate = self.rows.predict(self.features(plan_key))
+        return None if estimate is None else max(math.expm1(estimate), 0.0)
+
+    def save(self, path, database: str):
+        """Store the model of a database file in ``path``, next to the models of other databases."""
+        models = _read_models(path)
+        models[os.path.realpath(database)] = {"latency": self.latency.to_json(), "rows": self.rows.to_json()}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(models, f)
+
+    def load(self, path, database: str) -> bool:
+        """Load the model saved for a database file; return False if there is none."""
+        model = _read_models(path).get(os.path.realpath(database))
+        if model is None:
+            return False
+        return self.latency.load_json(model["latency"]) and self.rows.load_json(model["rows"])
+
+
+def _read_models(path) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
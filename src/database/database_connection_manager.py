@@ -3,7 +3,7 @@ import hashlib
 import logging
 import os
 import time
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import psutil
 from sqlalchemy import (
@@ -11,31 +11,115 @@ from sqlalchemy import (
     alias,
     and_,
     create_engine,
+    event,
     func,
     select,
     text
 )
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
 import colorama   # Ajout de colorama
 colorama.init(autoreset=True)
 
 
+# Named PRAGMA profiles applied to every pooled SQLite connection.
+# "auto" values are resolved at connect time from the machine (see _resolve_pragma).
+PRAGMA_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Previous behaviour of AlchemyUtility._setup_sqlite, now on all connections.
+    "default": {
+        "cache_size": "auto",
+        "temp_store": "MEMORY",
+        "synchronous": "OFF",
+        "read_uncommitted": 1,
+    },
+    # Large page cache, memory-mapped reads and helper threads for sorting.
+    "fast_read": {
+        "cache_size": "auto",
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "synchronous": "OFF",
+        "read_uncommitted": 1,
+        "threads": "auto",
+    },
+    # fast_read without synchronous = OFF, for connections that do not write to the
+    # database (benchmarks, workers). No query_only: temporary tables (materialized
+    # paths) and the index advisor still need to write.
+    "read_only": {
+        "cache_size": "auto",
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "read_uncommitted": 1,
+        "threads": "auto",
+    },
+    # Small cache and on-disk temporary tables for memory-constrained nodes.
+    "low_memory": {
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": "FILE",
+        "synchronous": "OFF",
+    },
+    # Leave SQLite defaults untouched.
+    "none": {},
+}
+
+
+def _resolve_pragma(name: str, value: Any) -> Any:
+    if value != "auto":
+        return value
+    if name == "cache_size":
+        # 10% of total memory, expressed in pages as in AlchemyUtility.get_cache_size.
+        total_memory = psutil.virtual_memory().total
+        return int(((total_memory * 0.1) // 1024) // 1.024)
+    if name == "threads":
+        return min(os.cpu_count() or 1, 8)
+    raise ValueError(f"No automatic value for PRAGMA {name}")
+
+
+def apply_pragma_profile(dbapi_connection, profile: Dict[str, Any]) -> None:
+    """Execute the PRAGMAs of a profile on a raw DB-API connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in profile.items():
+            cursor.execute(f"PRAGMA {name} = {_resolve_pragma(name, value)};")
+    finally:
+        cursor.close()
+
 
 class DatabaseConnectionManager:
     """
     Manages the database connection, engine, and metadata reflection.
+
+    For SQLite, the PRAGMAs of ``pragma_profile`` are applied through the pool
+    ``connect`` event, so every pooled connection (not only ``self.conn``) runs
+    with the same settings, and connections are reused across queries.
     """
 
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, pragma_profile: str = "default", pool_size: Optional[int] = None):
         self.db_url = db_url
-        self.engine = create_engine(db_url)
+        self.pragma_profile = pragma_profile
+        engine_kwargs = {}
+        self.is_sqlite = make_url(db_url).drivername.startswith("sqlite")
+        if pool_size is not None:
+            engine_kwargs["pool_size"] = pool_size
+        self.engine = create_engine(db_url, **engine_kwargs)
+        if self.is_sqlite:
+            if pragma_profile not in PRAGMA_PROFILES:
+                raise ValueError(
+                    f"Unknown PRAGMA profile: {pragma_profile}. "
+                    f"Available profiles: {', '.join(PRAGMA_PROFILES)}"
+                )
+        if self.is_sqlite and isinstance(self.engine, Engine):
+            event.listen(self.engine, "connect", self._on_connect)
         self.metadata = MetaData()
         self.metadata.reflect(bind=self.engine)
         self.conn = self.engine.connect()
 
+    def _on_connect(self, dbapi_connection, connection_record):
+        apply_pragma_profile(dbapi_connection, PRAGMA_PROFILES[self.pragma_profile])
+
     def close(self):
         if self.conn:
             self.conn.close()
             self.engine.dispose()
             self.conn = None
             self.engine = None
-
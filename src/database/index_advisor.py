@@ -0,0 +1,95 @@
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Widest composite index recommended: the join column plus the other columns
+# read from the same table occurrence.
+MAX_INDEX_COLUMNS = 4
+
+
+class IndexAdvisor:
+    """
+    Records the access paths of the count queries issued by QueryUtility and
+    recommends the composite indexes that serve the most frequent ones.
+
+    A table occurrence is reached through each of its join columns; an index
+    leading with that column and followed by the other columns the query reads
+    from the occurrence (join and projected columns) both drives the lookup and
+    covers the read, so SQLite never visits the table rows.
+    """
+
+    def __init__(self):
+        self.access_paths: Counter = Counter()
+        self.plan_counts: Counter = Counter()
+        self.statements: Dict[Tuple, object] = {}
+
+    def record(
+        self,
+        plan_key: Tuple,
+        join_conditions: List[Tuple[str, int, str, str, int, str]],
+        count_over: Optional[List[List[Tuple[str, int, str]]]] = None,
+        statement=None,
+    ):
+        """
+        Record one execution of a query.
+
+        :param plan_key: The canonical plan key of the query.
+        :param join_conditions: Its join conditions.
+        :param count_over: Its projected x-classes (the first attribute of each is read).
+        :param statement: The compiled statement, kept for benchmarking when given.
+        """
+        self.plan_counts[plan_key] += 1
+        if statement is not None:
+            self.statements.setdefault(plan_key, statement)
+
+        join_columns: Dict[Tuple[str, int], List[str]] = {}
+        read_columns: Dict[Tuple[str, int], List[str]] = {}
+        for table1, occurrence1, column1, table2, occurrence2, column2 in join_conditions:
+            for occurrence, column in (((table1, occurrence1), column1), ((table2, occurrence2), column2)):
+                join_columns.setdefault(occurrence, [])
+                read_columns.setdefault(occurrence, [])
+                if column not in join_columns[occurrence]:
+                    join_columns[occurrence].append(column)
+                if column not in read_columns[occurrence]:
+                    read_columns[occurrence].append(column)
+        for x_class in count_over or []:
+            if x_class:
+                table, occurrence, column = x_class[0]
+                columns = read_columns.setdefault((table, occurrence), [])
+                if column not in columns:
+                    columns.append(column)
+
+        for occurrence, columns in join_columns.items():
+            for column in columns:
+                others = sorted(set(read_columns[occurrence]) - {column})
+                self.access_paths[(occurrence[0], (column, *others)[:MAX_INDEX_COLUMNS])] += 1
+
+    def recommend(
+        self,
+        max_indexes: int,
+        existing: Optional[Dict[str, List[Tuple[str, ...]]]] = None,
+    ) -> List[Tuple[str, Tuple[str, ...]]]:
+        """
+        Return up to ``max_indexes`` (table, columns) indexes for the most frequent
+        access paths, skipping paths already served by an index whose leading
+        columns match.
+
+        :param existing: The column lists of the indexes of each table.
+        """
+        chosen: Dict[str, List[Tuple[str, ...]]] = {
+            table: list(indexes) for table, indexes in (existing or {}).items()
+        }
+        recommended = []
+        for (table, columns), _ in self.access_paths.most_common():
+            if len(recommended) >= max_indexes:
+                break
+            if any(index[:len(columns)] == columns for index in chosen.get(table, [])):
+                continue
+            chosen.setdefault(table, []).append(columns)
+            recommended.append((table, columns))
+        return recommended
+
+    def hottest_statements(self, n: int) -> list:
+        """The recorded statements of the ``n`` most executed plans."""
+        return [
+            self.statements[key] for key, _ in self.plan_counts.most_common() if key in self.statements
+        ][:n]
@@ -12,6 +12,7 @@ from sqlalchemy import (
     and_,
     create_engine,
     func,
+    inspect,
     select,
     text
 )
@@ -23,6 +24,11 @@ colorama.init(autoreset=True)
 
 
 
+def _quote_identifier(name: str) -> str:
+    """Quote a table, column or index name for DDL (SQL standard double quotes)."""
+    return '"' + name.replace('"', '""') + '"'
+
+
 class IndexManager:
     """
     Manages index creation (especially for SQLite).
@@ -55,3 +61,31 @@ class IndexManager:
                 )
                 self.conn.commit()
 
+
+    def existing_indexes(self) -> Dict[str, List[Tuple[str, ...]]]:
+        """Return the column lists of the indexes of each table."""
+        inspector = inspect(self.conn)
+        return {
+            table: [tuple(index["column_names"]) for index in inspector.get_indexes(table)]
+            for table in self.metadata.tables
+        }
+
+    def create_covering_indexes(self, indexes: List[Tuple[str, Tuple[str, ...]]]) -> float:
+        """
+        Create composite indexes in a single transaction, then run ANALYZE so the
+        SQLite planner has statistics (sqlite_stat1) for them.
+
+        :param indexes: (table, columns) pairs, the columns in index order.
+        :return: The build time in seconds.
+        """
+        start = time.time()
+        for table, columns in indexes:
+            index_name = _quote_identifier(f"idx_{table}_{'_'.join(columns)}")
+            column_list = ", ".join(_quote_identifier(column) for column in columns)
+            self.conn.execute(
+                text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {_quote_identifier(table)} ({column_list});")
+            )
+        self.conn.commit()
+        self.conn.execute(text("ANALYZE;"))
+        self.conn.commit()
+        return time.time() - start
@@ -1,20 +1,36 @@
 import csv
 import hashlib
 import logging
+import multiprocessing
 import os
+import sqlite3
+import threading
 import time
-from typing import Any, Dict, List, Tuple
+import zlib
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
 
 import psutil
 from sqlalchemy import (
     MetaData,
     alias,
     and_,
+    bindparam,
     create_engine,
     func,
+    literal,
     select,
     text
 )
+from sqlalchemy.engine.interfaces import Dialect
+
+from database.cost_model import DEFAULT_COST_MODEL_PATH, CostModel
+from database.index_advisor import IndexAdvisor
+from database.result_cache import DEFAULT_CACHE_PATH, ResultCache, database_fingerprint
+from utils.memory_budget import MemoryBudget
 
 #from utils.log_setup import setup_loggers
 import colorama   # Ajout de colorama
@@ -36,10 +52,112 @@ class ColorFormatter(logging.Formatter):
         return super().format(record)
 
 
+# Sampled counts keep the rows whose projected tuple hashes to one of the first
+# ``sample_buckets`` of SAMPLE_BUCKETS buckets. The hash only depends on the
+# tuple, so each distinct tuple is sampled independently of the others, and a
+# tuple projected by several counts is kept or dropped by all of them.
+SAMPLE_BUCKETS = 1024
+
+
+def _sample_bucket(*values) -> Optional[int]:
+    if any(value is None for value in values):
+        return None
+    return zlib.crc32("\x1f".join(str(value) for value in values).encode("utf-8")) % SAMPLE_BUCKETS
+
+
+# Number of SQLite virtual machine instructions between two budget checks.
+PROGRESS_HANDLER_STEPS = 1000
+
+# Estimated bytes of a statement cache entry (key, SQL text and parameters) and of
+# a value of a materialized join, for the memory budget.
+STATEMENT_CACHE_ENTRY_BYTES = 2048
+MATERIALIZED_VALUE_BYTES = 16
+
+
+def _count_partition(database: str, sql: str, bound) -> int:
+    """Run a partitioned count on a read-only connection of its own (process pool worker)."""
+    connection = sqlite3.connect(f"file:{quote(database)}?mode=ro", uri=True)
+    try:
+        connection.create_function("matilda_sample_bucket", -1, _sample_bucket, deterministic=True)
+        row = connection.execute(sql, bound).fetchone()
+        return row[0] if row and row[0] is not None else 0
+    finally:
+        connection.close()
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised when a query is interrupted by the per-query budget.
+
+    ``reason`` is "time" when the time budget ran out, "steps" when the
+    budget of SQLite virtual machine instructions did and "deadline" when the
+    deadline of the whole run (see set_run_deadline) passed.
+    """
+
+    def __init__(self, reason: str, sql: str, elapsed: float):
+        super().__init__(f"Query budget exceeded ({reason}) after {elapsed:.2f}s")
+        self.reason = reason
+        self.sql = sql
+        self.elapsed = elapsed
+
+
+class CompiledStatement(NamedTuple):
+    """
+    Parameterized SQL text of a count or threshold query, ready for execution.
+
+    ``param_names`` gives the order of the positional parameters when the dialect
+    uses a positional paramstyle (SQLite), and is None for named paramstyles.
+    ``defaults`` holds the values of parameters the compiler added itself
+    (e.g. the OFFSET that SQLite emits with a parameterized LIMIT).
+    """
+    sql: str
+    param_names: Optional[Tuple[str, ...]]
+    defaults: Optional[Dict[str, Any]] = None
+
+
+class Materialization(NamedTuple):
+    """
+    Temporary table holding the rows of the join of a traversal path.
+
+    Each column of an aliased table occurrence is stored as ``<alias>__<column>``.
+    """
+    table: str
+    aliases: frozenset
+    rows: int
+    columns: int = 0
+
 
 class QueryUtility:
     """
     Handles complex queries, including threshold checks and join row counts.
+
+    Count and threshold statements are compiled once per canonical join-plan shape
+    and kept in a statement cache; on SQLite they are executed through a persistent
+    raw DB-API cursor instead of a new SQLAlchemy connection per query.
+
+    Distinct-projection counts over acyclic join shapes are evaluated bottom-up
+    over a join tree (see _construct_acyclic_count_query) instead of as one flat
+    multi-way join; cyclic shapes keep the flat plan.
+
+    With incremental materialization enabled, the join of a traversal path is kept
+    in a temporary table and the join of a path extended by one condition is built
+    from it with a single extra join step. Materializations are evicted in LRU order
+    once ``materialization_row_budget`` rows are held, and released explicitly when
+    the traversal backtracks. A join larger than the budget on its own is detected
+    with a LIMIT-bounded probe and never built.
+
+    With a query budget set (see set_query_budget), SQLite queries are interrupted
+    through the connection progress handler once they run out of time or virtual
+    machine instructions, and raise QueryBudgetExceeded.
+
+    With partitioned counting enabled (see enable_partitioned_counting), the counts
+    of joins over large tables are split into P disjoint partitions on the hash of
+    their first projected attribute (or first join column), counted in a process
+    pool over read-only connections to the database file, and summed.
+
+    With a memory budget (see enable_memory_budget), the buffered results of the
+    result cache are flushed, and compiled statements and materializations are
+    evicted in LRU order under memory pressure.
     """
 
     def __init__(self, engine, metadata: MetaData, logger_query_time, logger_query_results):
@@ -48,6 +166,53 @@ class QueryUtility:
         self.logger_query_time = logger_query_time
         self.logger_query_results = logger_query_results
 
+        # Least recently used first, for the memory budget.
+        self._statement_cache: "OrderedDict[Tuple, CompiledStatement]" = OrderedDict()
+        self._table_columns: Dict[str, frozenset] = {}
+        self._raw_connection = None
+        self._raw_cursor = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Guards the statement cache and the counters, which the async pipeline
+        # uses from its own thread.
+        self._lock = threading.RLock()
+
+        self.semijoin_reduction = True
+        self.incremental = False
+        self.materialization_row_budget = 0
+        self._materializations: "OrderedDict[Tuple, Materialization]" = OrderedDict()
+        self._not_materializable: set = set()
+        self._materialized_rows = 0
+        self._materialized_values = 0
+        self._materialization_counter = 0
+        self.materialization_hits = 0
+        self.materialization_builds = 0
+
+        self.query_time_budget: Optional[float] = None
+        self.query_step_budget: Optional[int] = None
+        self._budget_deadline: Optional[float] = None
+        self._budget_deadline_reason = "time"
+        self.run_deadline: Optional[float] = None
+        self.queries_executed = 0
+        self._budget_steps = 0
+        self._budget_reason: Optional[str] = None
+        self._progress_interval = PROGRESS_HANDLER_STEPS
+
+        self.partitions = 1
+        self.partition_min_rows = 0
+        self._partition_row_count: Optional[Callable[[str], int]] = None
+        self._partition_pool: Optional[ProcessPoolExecutor] = None
+        # Partitioning decision of each set of joined tables.
+        self._partition_decisions: Dict[frozenset, bool] = {}
+        self.partitioned_counts = 0
+
+        self.index_advisor: Optional[IndexAdvisor] = None
+        self.result_cache: Optional[ResultCache] = None
+        self.cost_model: Optional[CostModel] = None
+        self.cost_model_path = DEFAULT_COST_MODEL_PATH
+        # Plan key of each compiled statement, for the cost model observations.
+        self._statement_plan_keys: Dict[str, Tuple] = {}
+
         self._setup_logging_handlers()  # Setup logging handlers
     def _setup_logging_handlers(self):
         formatter = ColorFormatter('%(asctime)s - %(levelname)s - %(message)s')
@@ -70,23 +235,31 @@ class QueryUtility:
         distinct: bool = False,
         count_over: List[List[Tuple[str, int, str]]] = None,
         threshold: int = 1,
-        flag:str="threshold"
+        flag:str="threshold",
+        materialize: bool = False,
     ) -> int:
         """
         Check if the count of resulting rows from the given join exceeds a threshold.
+        ``materialize`` marks ``join_conditions`` as a traversal path in order,
+        which may be evaluated incrementally.
         """
-        query, primary_key_conditions, join_base = self._construct_threshold_query(
-            join_conditions, disjoint_semantics, distinct, count_over, threshold
-        )
+        if materialize and self.incremental and not disjoint_semantics:
+            materialization = self._materialize_path(join_conditions)
+            if materialization is not None:
+                return int(materialization.rows > threshold)
 
-        if query is None :
+        statement = self._get_compiled_statement(
+            "threshold", join_conditions, disjoint_semantics, distinct, count_over
+        )
+        if statement is None:
             return 0
 
         start = time.time()
         try:
-            with self.engine.connect() as conn:
-                result = conn.execute(query).scalar()
-                result = bool(result)
+            result = self._execute_scalar(statement, {"threshold": threshold, "limit": threshold + 1})
+            result = bool(result)
+        except QueryBudgetExceeded:
+            raise
         except Exception as e:
             self.logger_query_time.error(f"Error executing threshold query: {e}")
             return 0
@@ -94,10 +267,10 @@ class QueryUtility:
 
         execution_time = end - start
         self.logger_query_time.info(
-            f"Execution Time: {execution_time:.4f} seconds for Threshold Query: {str(query)}"
+            f"Execution Time: {execution_time:.4f} seconds for Threshold Query: {statement.sql}"
         )
         self.logger_query_results.info(
-            f"Threshold Query: {str(query)}; Result: {result}; Execution Time: {execution_time:.4f}"
+            f"Threshold Query: {statement.sql}; Result: {result}; Execution Time: {execution_time:.4f}"
         )
 
         return int(result) if result is not None else 0
@@ -108,18 +281,49 @@ class QueryUtility:
         disjoint_semantics: bool = False,
         distinct: bool = False,
         count_over: List[List[Tuple[str, int, str]]] = None,
+        materialize: bool = False,
+        limit: int = None,
     ) -> int:
-        query, primary_key_conditions, join_base = self._construct_count_query(
-            join_conditions, disjoint_semantics, distinct, count_over
-        )
+        """
+        Count the rows of the join, or the distinct values of the ``count_over``
+        projection. With ``limit``, counting stops at ``limit``: the result is
+        min(count, limit).
+        """
+        if materialize and self.incremental and not disjoint_semantics:
+            # Materialized counts are cached under the signature of the plain count.
+            signature = None
+            if self.result_cache is not None:
+                statement = self._get_compiled_statement(
+                    "count", join_conditions, disjoint_semantics, distinct, count_over, track=False
+                )
+                signature = self._signature(statement, {}) if statement is not None else None
+            result = self.result_cache.get(signature) if signature is not None else None
+            if result is None:
+                result = self._count_materialized(join_conditions, count_over)
+                if result is not None and signature is not None:
+                    self.result_cache.put(signature, result)
+            if result is not None:
+                return min(result, limit) if limit is not None else result
 
-        if query is None:
+        if limit is None and self._should_partition(join_conditions):
+            result = self.get_partitioned_row_count(
+                join_conditions, self.partitions, disjoint_semantics, distinct, count_over
+            )
+            if result is not None:
+                return result
+
+        bounded = limit is not None
+        statement = self._get_compiled_statement(
+            "bounded_count" if bounded else "count", join_conditions, disjoint_semantics, distinct, count_over
+        )
+        if statement is None:
             return 0
 
         start = time.time()
         try:
-            with self.engine.connect() as conn:
-                result_sqlite = conn.execute(query).scalar()
+            result_sqlite = self._execute_scalar(statement, {"limit": limit} if bounded else {})
+        except QueryBudgetExceeded:
+            raise
         except Exception as e:
             self.logger_query_time.error(f"Error executing query: {e}")
             return 0
@@ -127,14 +331,920 @@ class QueryUtility:
 
         execution_time_sqlite = end - start
         self.logger_query_time.info(
-            f"Execution Time: {execution_time_sqlite:.4f} seconds for Query: {str(query)}"
+            f"Execution Time: {execution_time_sqlite:.4f} seconds for Query: {statement.sql}"
         )
         self.logger_query_results.info(
-            f"Query: {str(query)}; Result: {result_sqlite}"
+            f"Query: {statement.sql}; Result: {result_sqlite}"
         )
 
         return result_sqlite if result_sqlite is not None else 0
 
+    def count_up_to(
+        self,
+        join_conditions: List[Tuple[str, int, str, str, int, str]],
+        n: int,
+        disjoint_semantics: bool = False,
+        distinct: bool = False,
+        count_over: List[List[Tuple[str, int, str]]] = None,
+        materialize: bool = False,
+    ) -> int:
+        """
+        Return min(count, n) for the count of get_join_row_count. The query reads
+        the join through a ``LIMIT n`` subquery, so it stops after ``n`` rows or
+        distinct projected tuples; a result below ``n`` is the exact count.
+        """
+        return self.get_join_row_count(
+            join_conditions, disjoint_semantics, distinct, count_over,
+            materialize=materialize, limit=n,
+        )
+
+    def get_sampled_row_count(
+        self,
+        join_conditions: List[Tuple[str, int, str, str, int, str]],
+        sample_buckets: int,
+        disjoint_semantics: bool = False,
+        distinct: bool = False,
+        count_over: List[List[Tuple[str, int, str]]] = None,
+    ) -> Optional[int]:
+        """
+        Count the distinct ``count_over`` projection on a hash sample of its tuples
+        (a fraction sample_buckets / SAMPLE_BUCKETS of them).
+        Returns None when sampling is not available (no projection, or not SQLite).
+        """
+        if not count_over or not self._uses_raw_sqlite():
+            return None
+        statement = self._get_compiled_statement(
+            "sampled_count", join_conditions, disjoint_semantics, distinct, count_over
+        )
+        if statement is None:
+            return 0
+
+        start = time.time()
+        try:
+            result = self._execute_scalar(statement, {"sample_buckets": sample_buckets})
+        except QueryBudgetExceeded:
+            raise
+        except Exception as e:
+            self.logger_query_time.error(f"Error executing sampled query: {e}")
+            return None
+        self.logger_query_time.info(
+            f"Execution Time: {time.time() - start:.4f} seconds for Sampled Query: {statement.sql}"
+        )
+        return result if result is not None else 0
+
+    def get_partitioned_row_count(
+        self,
+        join_conditions: List[Tuple[str, int, str, str, int, str]],
+        partitions: int,
+        disjoint_semantics: bool = False,
+        distinct: bool = False,
+        count_over: List[List[Tuple[str, int, str]]] = None,
+    ) -> Optional[int]:
+        """
+        Same count as get_join_row_count, computed as the sum of ``partitions``
+        disjoint partial counts run in parallel. Rows are partitioned on the hash of
+        the first projected attribute, so a distinct projected tuple falls in exactly
+        one partition and the partial distinct counts add up; plain row counts are
+        partitioned on the first join column. Returns None when partitioning is not
+        available (not SQLite, or an in-memory database). Partial counts are not
+        subject to the query budget.
+        """
+        database = self._database_file()
+        if database is None:
+            return None
+        statement = self._get_compiled_statement(
+            "partitioned_count", join_conditions, disjoint_semantics, distinct, count_over
+        )
+        if statement is None:
+            return 0
+
+        signature = None
+        if self.result_cache is not None:
+            signature = self._signature(statement, {"partitions": partitions})
+            cached = self.result_cache.get(signature)
+            if cached is not None:
+                return cached
+
+        if self._partition_pool is None:
+            # Spawned workers do not inherit the open connections and locks of this process.
+            self._partition_pool = ProcessPoolExecutor(
+                max_workers=partitions, mp_context=multiprocessing.get_context("spawn")
+            )
+        start = time.time()
+        self._count_executed(partitions)
+        try:
+            futures = [
+                self._partition_pool.submit(
+                    _count_partition, database, statement.sql,
+                    self._bind(statement, {"partitions": partitions, "partition": partition}),
+                )
+                for partition in range(partitions)
+            ]
+            result = sum(future.result() for future in futures)
+        except Exception as e:
+            self.logger_query_time.error(f"Error executing partitioned query: {e}")
+            return None
+        self.partitioned_counts += 1
+        if signature is not None:
+            self.result_cache.put(signature, result)
+        self.logger_query_time.info(
+            f"Execution Time: {time.time() - start:.4f} seconds for Partitioned Query "
+            f"({partitions} partitions): {statement.sql}"
+        )
+        return result
+
+    async def get_join_row_count_async(
+        self,
+        async_engine,
+        join_conditions: List[Tuple[str, int, str, str, int, str]],
+        disjoint_semantics: bool = False,
+        distinct: bool = False,
+        count_over: List[List[Tuple[str, int, str]]] = None,
+    ) -> int:
+        """
+        Same as get_join_row_count, executed on a connection of ``async_engine``.
+        Statements come from the same statement cache as the synchronous path.
+        """
+        statement = self._get_compiled_statement(
+            "count", join_conditions, disjoint_semantics, distinct, count_over
+        )
+        if statement is None:
+            return 0
+
+        start = time.time()
+        try:
+            self._count_executed()
+            async with async_engine.connect() as conn:
+                result = (await conn.exec_driver_sql(statement.sql, ())).scalar()
+        except Exception as e:
+            self.logger_query_time.error(f"Error executing query: {e}")
+            return 0
+        self.logger_query_time.info(
+            f"Execution Time: {time.time() - start:.4f} seconds for Async Query: {statement.sql}"
+        )
+        return result if result is not None else 0
+
+    def get_column_values(self, table_name: str, attribute_name: str) -> List:
+        """
+        Return all values of a column, reusing the persistent connection.
+        Unknown tables or columns yield an empty list.
+        """
+        table = self.metadata.tables.get(table_name)
+        if table is None:
+            return []
+        column = table.columns.get(attribute_name)
+        if column is None:
+            return []
+        key = ("values", table_name, attribute_name)
+        statement = self._get_cached_statement(key, lambda: select(column))
+        self._count_executed()
+        if self._uses_raw_sqlite():
+            rows = self._get_raw_cursor().execute(statement.sql).fetchall()
+        else:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(statement.sql)).fetchall()
+        return [row[0] for row in rows]
+
+    def get_table_row_count(self, table_name: str) -> int:
+        """Return the number of rows of a table (0 for an unknown table)."""
+        table = self.metadata.tables.get(table_name)
+        if table is None:
+            return 0
+        key = ("row_count", table_name)
+        statement = self._get_cached_statement(key, lambda: select(func.count()).select_from(table))
+        return self._execute_scalar(statement, {}) or 0
+
+    def get_column_distinct_count(self, table_name: str, attribute_name: str) -> int:
+        """
+        Return the number of distinct values of a column, NULL counted as one value
+        as in the DISTINCT projections of the count queries (0 if unknown).
+        """
+        table = self.metadata.tables.get(table_name)
+        if table is None:
+            return 0
+        column = table.columns.get(attribute_name)
+        if column is None:
+            return 0
+        key = ("distinct_count", table_name, attribute_name)
+
+        def build():
+            values = select(column).distinct().subquery()
+            return select(func.count()).select_from(values)
+
+        return self._execute_scalar(self._get_cached_statement(key, build), {}) or 0
+
+    def get_table_profile(self, table_name: str) -> Tuple[int, Dict[str, Tuple[int, int]]]:
+        """
+        Return the number of rows of a table and, for each column, its number of
+        distinct non-NULL values and of NULL values, in a single scan.
+        Unknown tables yield (0, {}).
+        """
+        table = self.metadata.tables.get(table_name)
+        if table is None:
+            return 0, {}
+        columns = list(table.columns)
+        key = ("profile", table_name)
+
+        def build():
+            aggregates = [func.count()]
+            for column in columns:
+                aggregates.append(func.count(column.distinct()))
+                aggregates.append(func.count() - func.count(column))
+            return select(*aggregates).select_from(table)
+
+        rows = self._fetch_rows(self._get_cached_statement(key, build), {})
+        if not rows:
+            return 0, {}
+        row = rows[0]
+        return row[0] or 0, {
+            column.name: (row[1 + 2 * i] or 0, row[2 + 2 * i] or 0) for i, column in enumerate(columns)
+        }
+
+    def get_most_common_values(self, table_name: str, attribute_name: str, k: int) -> List[Tuple[Any, int]]:
+        """Return the ``k`` most frequent non-NULL values of a column with their counts."""
+        table = self.metadata.tables.get(table_name)
+        column = table.columns.get(attribute_name) if table is not None else None
+        if column is None:
+            return []
+        key = ("most_common", table_name, attribute_name)
+
+        def build():
+            frequency = func.count().label("frequency")
+            return (
+                select(column, frequency)
+                .where(column.isnot(None))
+                .group_by(column)
+                .order_by(frequency.desc(), column)
+                .limit(bindparam("k"))
+            )
+
+        statement = self._get_cached_statement(key, build)
+        return [(value, count) for value, count in self._fetch_rows(statement, {"k": k})]
+
+    def get_histogram_bounds(self, table_name: str, attribute_name: str, buckets: int) -> List[Any]:
+        """
+        Return the bounds of an equi-depth histogram of the non-NULL values of a
+        column: the smallest value, then the largest value of each of the
+        ``buckets`` buckets, which hold about as many rows each.
+        """
+        table = self.metadata.tables.get(table_name)
+        column = table.columns.get(attribute_name) if table is not None else None
+        if column is None:
+            return []
+        key = ("histogram", table_name, attribute_name)
+
+        def build():
+            ranked = (
+                select(column.label("value"), func.ntile(bindparam("buckets")).over(order_by=column).label("bucket"))
+                .where(column.isnot(None))
+                .subquery()
+            )
+            return (
+                select(func.min(ranked.c.value), func.max(ranked.c.value))
+                .group_by(ranked.c.bucket)
+                .order_by(ranked.c.bucket)
+            )
+
+        rows = self._fetch_rows(self._get_cached_statement(key, build), {"buckets": buckets})
+        return [rows[0][0]] + [row[1] for row in rows] if rows else []
+
+    def fingerprint(self) -> Optional[str]:
+        """Fingerprint of the SQLite database file (see result_cache), or None."""
+        database = self._database_file()
+        return database_fingerprint(database) if database is not None else None
+
+    def _fetch_rows(self, statement: CompiledStatement, params: Dict[str, Any]) -> List[Tuple]:
+        self._count_executed()
+        if self._uses_raw_sqlite():
+            return self._get_raw_cursor().execute(statement.sql, self._bind(statement, params)).fetchall()
+        if statement.defaults:
+            params = {**statement.defaults, **params}
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(text(statement.sql), params).fetchall()]
+
+    def set_query_budget(self, seconds: Optional[float] = None, steps: Optional[int] = None):
+        """
+        Interrupt any single query running longer than ``seconds`` or executing more
+        than ``steps`` SQLite virtual machine instructions (a proxy for the rows it
+        reads); the interrupted query raises QueryBudgetExceeded. None disables a
+        budget. Only enforced on SQLite.
+        """
+        self.query_time_budget = seconds
+        self.query_step_budget = steps
+        if self._raw_connection is not None:
+            self._install_progress_handler()
+
+    def set_run_deadline(self, deadline: Optional[float] = None):
+        """
+        Interrupt any query still running at ``deadline`` (a time.monotonic() value),
+        with QueryBudgetExceeded("deadline"). None removes it. Only enforced on SQLite.
+        """
+        self.run_deadline = deadline
+        if self._raw_connection is not None:
+            self._install_progress_handler()
+
+    def enable_partitioned_counting(
+        self,
+        partitions: int,
+        min_rows: int = 1000000,
+        row_count: Optional[Callable[[str], int]] = None,
+    ):
+        """
+        Count the joins involving a table of at least ``min_rows`` rows over
+        ``partitions`` parallel partitions (see get_partitioned_row_count).
+        ``row_count`` gives table cardinalities (defaults to get_table_row_count);
+        fewer than 2 partitions disables partitioning.
+        """
+        self.partitions = partitions
+        self.partition_min_rows = min_rows
+        self._partition_row_count = row_count or self.get_table_row_count
+        self._partition_decisions.clear()
+        if self._partition_pool is not None:
+            self._partition_pool.shutdown()
+            self._partition_pool = None
+
+    def enable_result_cache(self, path=DEFAULT_CACHE_PATH, max_entries: int = 1000000) -> bool:
+        """
+        Keep the results of count and threshold queries in a persistent cache shared
+        across runs and processes (see ResultCache). Only SQLite database files
+        can be fingerprinted; returns False when the cache is not available.
+        """
+        database = self._database_file()
+        if database is None:
+            return False
+        if self.result_cache is not None:
+            self.result_cache.close()
+        self.result_cache = ResultCache(database_fingerprint(database), path, max_entries)
+        return True
+
+    def enable_cost_model(
+        self, path=DEFAULT_COST_MODEL_PATH, row_count: Optional[Callable[[str], int]] = None
+    ) -> bool:
+        """
+        Learn the latency of count and threshold queries from their executions (see
+        CostModel), starting from the model saved in ``path`` for this database.
+        Only SQLite database files are timed; returns False when the model is not available.
+        """
+        database = self._database_file()
+        if database is None:
+            return False
+        self.cost_model = CostModel(row_count or self.get_table_row_count)
+        self.cost_model_path = path
+        self.cost_model.load(path, database)
+        return True
+
+    def save_cost_model(self):
+        """Store the cost model for the next runs on this database."""
+        if self.cost_model is not None:
+            self.cost_model.save(self.cost_model_path, self._database_file())
+
+    def estimate_query_cost(
+        self,
+        join_conditions: List[Tuple[str, int, str, str, int, str]],
+        count_over: List[List[Tuple[str, int, str]]] = None,
+        kind: str = "count",
+    ) -> Optional[float]:
+        """Predicted latency in seconds of a query, or None without a trained cost model."""
+        if self.cost_model is None or not self.cost_model.trained:
+            return None
+        return self.cost_model.predict_latency(
+            self._canonical_plan_key(kind, join_conditions, False, count_over)
+        )
+
+    def enable_index_advisor(self) -> IndexAdvisor:
+        """Record the access paths of every count and threshold query from now on."""
+        if self.index_advisor is None:
+            self.index_advisor = IndexAdvisor()
+        return self.index_advisor
+
+    def time_statements(self, statements: List[CompiledStatement]) -> List[float]:
+        """Execution time in seconds of each statement (which must need no parameters)."""
+        timings = []
+        for statement in statements:
+            start = time.perf_counter()
+            self._execute_scalar(statement, {}, use_cache=False)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    def enable_incremental_materialization(self, row_budget: int = 500000):
+        """
+        Evaluate path joins incrementally from the materialized join of their parent path.
+        Only available on SQLite; other backends keep running each join from scratch.
+        """
+        self.incremental = self._uses_raw_sqlite()
+        self.materialization_row_budget = row_budget
+
+    def release_materialization(self, join_conditions: List[Tuple[str, int, str, str, int, str]]):
+        """Drop the materialized join of a path once the traversal has left it."""
+        key = tuple(tuple(condition) for condition in join_conditions)
+        self._not_materializable.discard(key)
+        if key in self._materializations:
+            self._drop_materialization(key)
+
+    def enable_memory_budget(self, budget: MemoryBudget):
+        """
+        Register the result cache buffer, the statement cache and the materializations
+        with a memory budget, in this order (cheapest to rebuild first).
+        """
+        budget.register("result_cache", self._result_cache_bytes, self._flush_result_cache)
+        budget.register("statement_cache", self._statement_cache_bytes, self._evict_statements)
+        budget.register("materializations", self._materialization_bytes, self._evict_materializations)
+
+    def _result_cache_bytes(self) -> int:
+        return self.result_cache.memory_usage() if self.result_cache is not None else 0
+
+    def _flush_result_cache(self, target: int) -> int:
+        freed = self._result_cache_bytes()
+        if self.result_cache is not None:
+            self.result_cache.flush()
+        return freed
+
+    def _statement_cache_bytes(self) -> int:
+        return len(self._statement_cache) * STATEMENT_CACHE_ENTRY_BYTES
+
+    def _evict_statements(self, target: int) -> int:
+        """Evict the least recently used compiled statements; they are compiled again when needed."""
+        with self._lock:
+            count = min(len(self._statement_cache), -(-target // STATEMENT_CACHE_ENTRY_BYTES))
+            for _ in range(count):
+                _, statement = self._statement_cache.popitem(last=False)
+                if statement is not None:
+                    self._statement_plan_keys.pop(statement.sql, None)
+        return count * STATEMENT_CACHE_ENTRY_BYTES
+
+    def _materialization_bytes(self) -> int:
+        return self._materialized_values * MATERIALIZED_VALUE_BYTES
+
+    def _evict_materializations(self, target: int) -> int:
+        """Drop the least recently used materializations; paths are joined from scratch again."""
+        freed = 0
+        while self._materializations and freed < target:
+            key = next(iter(self._materializations))
+            materialization = self._materializations[key]
+            freed += materialization.rows * materialization.columns * MATERIALIZED_VALUE_BYTES
+            self._drop_materialization(key)
+        return freed
+
+    def close(self):
+        """Release the persistent raw connection, if one was opened."""
+        for key in list(self._materializations):
+            self._drop_materialization(key)
+        self._not_materializable.clear()
+        if self._raw_cursor is not None:
+            self._raw_cursor.close()
+            self._raw_cursor = None
+        if self._raw_connection is not None:
+            self._raw_connection.close()
+            self._raw_connection = None
+        if self._partition_pool is not None:
+            self._partition_pool.shutdown()
+            self._partition_pool = None
+        if self.result_cache is not None:
+            self.result_cache.close()
+            self.result_cache = None
+
+    # Incremental materialization of traversal paths.
+
+    def _count_materialized(
+        self,
+        join_conditions: List[Tuple[str, int, str, str, int, str]],
+        count_over: List[List[Tuple[str, int, str]]] = None,
+    ) -> Optional[int]:
+        materialization = self._materialize_path(join_conditions)
+        if materialization is None:
+            return None
+        if not count_over:
+            return materialization.rows
+
+        quote = self.engine.dialect.identifier_preparer.quote
+        projection = []
+        for x_class in count_over:
+            if not x_class:
+                continue
+            table_name, occurrence, attribute_name = x_class[0]
+            alias_key = f"{table_name}_{occurrence}"
+            if alias_key not in materialization.aliases or attribute_name not in self._get_table_columns(table_name):
+                return None
+            projection.append(quote(f"{alias_key}__{attribute_name}"))
+        sql = (
+            f"SELECT count(*) FROM (SELECT DISTINCT {', '.join(projection)} "
+            f"FROM {quote(materialization.table)})"
+        )
+        start = time.time()
+        cursor = self._get_raw_cursor()
+        self._count_executed()
+        with self._query_budget(sql):
+            result = cursor.execute(sql).fetchone()[0]
+        self.logger_query_time.info(
+            f"Execution Time: {time.time() - start:.4f} seconds for Materialized Query: {sql}"
+        )
+        return result
+
+    def _materialize_path(
+        self, join_conditions: List[Tuple[str, int, str, str, int, str]]
+    ) -> Optional[Materialization]:
+        """
+        Return the materialized join of a path, building it from the longest
+        materialized prefix. Returns None when the path cannot be evaluated this way
+        (unknown tables, disconnected joins, over budget), so the caller falls back
+        to the regular query, which gives the same counts.
+        """
+        key = tuple(tuple(condition) for condition in join_conditions)
+        if not key or key in self._not_materializable:
+            return None
+        if key in self._materializations:
+            self._materializations.move_to_end(key)
+            self.materialization_hits += 1
+            return self._materializations[key]
+
+        parent = None
+        remaining = key
+        for length in range(len(key) - 1, 0, -1):
+            if key[:length] in self._materializations:
+                parent = self._materializations[key[:length]]
+                self._materializations.move_to_end(key[:length])
+                remaining = key[length:]
+                break
+
+        try:
+            materialization = self._build_materialization(parent, remaining)
+        except QueryBudgetExceeded:
+            self._not_materializable.add(key)
+            raise
+        except Exception as e:
+            self.logger_query_time.debug(f"Could not materialize join path: {e}")
+            materialization = None
+        if materialization is None:
+            self._not_materializable.add(key)
+            return None
+
+        self.materialization_builds += 1
+        self._materializations[key] = materialization
+        self._materialized_rows += materialization.rows
+        self._materialized_values += materialization.rows * materialization.columns
+        while self._materialized_rows > self.materialization_row_budget and len(self._materializations) > 1:
+            oldest = next(iter(self._materializations))
+            self._drop_materialization(oldest)
+        if self._materialized_rows > self.materialization_row_budget:
+            self._drop_materialization(key)
+            self._not_materializable.add(key)
+            return None
+        return materialization
+
+    def _build_materialization(
+        self,
+        parent: Optional[Materialization],
+        conditions: Tuple[Tuple[str, int, str, str, int, str], ...],
+    ) -> Optional[Materialization]:
+        quote = self.engine.dialect.identifier_preparer.quote
+        steps = []
+        for condition in conditions:
+            if condition[0] not in self.metadata.tables or condition[3] not in self.metadata.tables:
+                return None
+            resolved = self._resolve_condition_columns(condition)
+            if resolved is not None:
+                steps.append(resolved)
+        if not steps:
+            return None
+
+        alias_tables = {}
+        for table_name, occurrence, _, other_table, other_occurrence, _ in conditions:
+            alias_tables[f"{table_name}_{occurrence}"] = table_name
+            alias_tables[f"{other_table}_{other_occurrence}"] = other_table
+
+        present = set(parent.aliases) if parent is not None else set()
+        select_list = []
+        if parent is not None:
+            from_clause = f"{quote(parent.table)} AS parent"
+            select_list.append("parent.*")
+        else:
+            first_alias = steps[0][0]
+            present.add(first_alias)
+            from_clause = f"{quote(alias_tables[first_alias])} AS {quote(first_alias)}"
+
+        def column_ref(alias_key, column):
+            if parent is not None and alias_key in parent.aliases:
+                return f"parent.{quote(f'{alias_key}__{column}')}"
+            return f"{quote(alias_key)}.{quote(column)}"
+
+        # Same join semantics as _construct_join: a step that does not touch the
+        # aliases joined so far is retried later, and the path is not materialized
+        # if some step never connects.
+        where_clauses = []
+        pending = steps
+        while pending:
+            deferred = []
+            for alias_key1, column1, alias_key2, column2 in pending:
+                equality = f"{column_ref(alias_key1, column1)} = {column_ref(alias_key2, column2)}"
+                if alias_key1 in present and alias_key2 in present:
+                    where_clauses.append(equality)
+                elif alias_key1 in present or alias_key2 in present:
+                    new_alias = alias_key2 if alias_key1 in present else alias_key1
+                    present.add(new_alias)
+                    from_clause += (
+                        f" JOIN {quote(alias_tables[new_alias])} AS {quote(new_alias)} ON {equality}"
+                    )
+                else:
+                    deferred.append((alias_key1, column1, alias_key2, column2))
+            if len(deferred) == len(pending):
+                return None
+            pending = deferred
+
+        new_aliases = sorted(present - (set(parent.aliases) if parent is not None else set()))
+        for alias_key in new_aliases:
+            for column in sorted(self._get_table_columns(alias_tables[alias_key])):
+                select_list.append(f"{quote(alias_key)}.{quote(column)} AS {quote(f'{alias_key}__{column}')}")
+
+        join_sql = f"FROM {from_clause}"
+        if where_clauses:
+            join_sql += f" WHERE {' AND '.join(where_clauses)}"
+
+        # An oversized join is given up after budget + 1 rows instead of being built in full.
+        cursor = self._get_raw_cursor()
+        probe = (
+            f"SELECT count(*) FROM (SELECT 1 {join_sql} LIMIT {int(self.materialization_row_budget) + 1})"
+        )
+        self._count_executed()
+        with self._query_budget(probe):
+            if cursor.execute(probe).fetchone()[0] > self.materialization_row_budget:
+                return None
+
+        self._materialization_counter += 1
+        table_name = f"matilda_path_{self._materialization_counter}"
+        sql = f"CREATE TEMP TABLE {quote(table_name)} AS SELECT {', '.join(select_list)} {join_sql}"
+
+        start = time.time()
+        self._count_executed(2)
+        with self._query_budget(sql):
+            cursor.execute(sql)
+        rows = cursor.execute(f"SELECT count(*) FROM {quote(table_name)}").fetchone()[0]
+        self.logger_query_time.info(
+            f"Execution Time: {time.time() - start:.4f} seconds for Materialization: {sql}"
+        )
+        columns = len(select_list) - 1 + parent.columns if parent is not None else len(select_list)
+        return Materialization(table_name, frozenset(present), rows, columns)
+
+    def _drop_materialization(self, key: Tuple):
+        materialization = self._materializations.pop(key)
+        self._materialized_rows -= materialization.rows
+        self._materialized_values -= materialization.rows * materialization.columns
+        quote = self.engine.dialect.identifier_preparer.quote
+        try:
+            self._get_raw_cursor().execute(f"DROP TABLE IF EXISTS temp.{quote(materialization.table)}")
+        except Exception as e:
+            self.logger_query_time.error(f"Error dropping materialized path: {e}")
+
+    # Statement cache and raw execution.
+
+    @staticmethod
+    def _canonical_plan_key(
+        kind: str,
+        join_conditions: List[Tuple[str, int, str, str, int, str]],
+        disjoint_semantics: bool,
+        count_over: List[List[Tuple[str, int, str]]] = None,
+        distinct: bool = False,
+    ) -> Tuple:
+        """
+        Build the cache key of a query: the same join written in a different order,
+        with its equalities written either way round or with repeated conditions
+        maps to the same key.
+        Only the first attribute of each ``count_over`` class is projected.
+        """
+        conditions = set()
+        for condition in join_conditions:
+            left, right = tuple(condition[:3]), tuple(condition[3:])
+            conditions.add(left + right if left <= right else right + left)
+        projection = None
+        if count_over:
+            projection = tuple(tuple(x_class[0]) for x_class in count_over if x_class)
+        return kind, tuple(sorted(conditions)), bool(disjoint_semantics), projection, bool(distinct)
+
+    def _get_cached_statement(self, key: Tuple, build) -> CompiledStatement:
+        """
+        Compiled statement cached under ``key``, compiling the query returned by
+        ``build`` on a miss. Used by the statistics queries, which are not counted
+        in the cache statistics.
+        """
+        with self._lock:
+            if key in self._statement_cache:
+                self._statement_cache.move_to_end(key)
+            else:
+                self._statement_cache[key] = self._compile(build())
+            return self._statement_cache[key]
+
+    def _get_compiled_statement(
+        self,
+        kind: str,
+        join_conditions,
+        disjoint_semantics,
+        distinct,
+        count_over,
+        track: bool = True,
+    ) -> Optional[CompiledStatement]:
+        """
+        Compiled statement of a query, from the statement cache when possible. With
+        ``track`` False the lookup is neither counted in the cache statistics nor
+        recorded by the index advisor, for statements that are not executed (e.g.
+        only used to name a result cache entry).
+        """
+        key = self._canonical_plan_key(kind, join_conditions, disjoint_semantics, count_over, distinct)
+        with self._lock:
+            if key in self._statement_cache:
+                if track:
+                    self.cache_hits += 1
+                self._statement_cache.move_to_end(key)
+                statement = self._statement_cache[key]
+            else:
+                if track:
+                    self.cache_misses += 1
+                statement = self._build_statement(key, kind, disjoint_semantics, distinct, count_over)
+                self._statement_cache[key] = statement
+                if statement is not None:
+                    self._statement_plan_keys[statement.sql] = key
+            if track and self.index_advisor is not None:
+                # Parameterless count statements are kept to benchmark the indexes.
+                self.index_advisor.record(
+                    key, join_conditions, count_over, statement if kind == "count" else None
+                )
+        return statement
+
+    def _build_statement(self, key, kind, disjoint_semantics, distinct, count_over) -> Optional[CompiledStatement]:
+
+        canonical_conditions = list(key[1])
+        if kind == "threshold":
+            query, _, _ = self._construct_threshold_query(
+                canonical_conditions, disjoint_semantics, distinct, count_over, bindparam("threshold")
+            )
+        elif kind == "sampled_count":
+            # Flat plan: SQLite filters the sampled occurrence while scanning it.
+            query, _, _ = self._construct_count_query(
+                canonical_conditions, disjoint_semantics, distinct, count_over,
+                bucket_filter=lambda columns: func.matilda_sample_bucket(*columns) < bindparam("sample_buckets"),
+            )
+        elif kind == "partitioned_count":
+            query, _, _ = self._construct_count_query(
+                canonical_conditions, disjoint_semantics, distinct, count_over,
+                bucket_filter=lambda columns: (
+                    func.coalesce(func.matilda_sample_bucket(columns[0]), 0) % bindparam("partitions")
+                    == bindparam("partition")
+                ),
+            )
+        else:
+            limit = bindparam("limit") if kind == "bounded_count" else None
+            query = None
+            if self.semijoin_reduction and count_over and not disjoint_semantics:
+                query = self._construct_acyclic_count_query(canonical_conditions, count_over, limit)
+            if query is None:
+                query, _, _ = self._construct_count_query(
+                    canonical_conditions, disjoint_semantics, distinct, count_over, limit
+                )
+        return self._compile(query) if query is not None else None
+
+    def _compile(self, query) -> CompiledStatement:
+        dialect = getattr(self.engine, "dialect", None)
+        if isinstance(dialect, Dialect):
+            compiled = query.compile(dialect=dialect)
+        else:
+            compiled = query.compile()
+        param_names = tuple(compiled.positiontup) if compiled.positiontup is not None else None
+        defaults = {name: value for name, value in compiled.params.items() if value is not None}
+        return CompiledStatement(compiled.string, param_names, defaults or None)
+
+    def _should_partition(self, join_conditions: List[Tuple[str, int, str, str, int, str]]) -> bool:
+        if self.partitions < 2 or not self._uses_raw_sqlite():
+            return False
+        tables = frozenset(condition[0] for condition in join_conditions) | {
+            condition[3] for condition in join_conditions
+        }
+        if tables not in self._partition_decisions:
+            self._partition_decisions[tables] = any(
+                self._partition_row_count(table) >= self.partition_min_rows for table in tables
+            )
+        return self._partition_decisions[tables]
+
+    def _database_file(self) -> Optional[str]:
+        """Path of the SQLite database file, or None for in-memory or non-SQLite databases."""
+        if not self._uses_raw_sqlite():
+            return None
+        database = self.engine.url.database
+        if not database or database == ":memory:" or database.startswith("file:"):
+            return None
+        return os.path.abspath(database)
+
+    def _install_progress_handler(self):
+        budgeted = (
+            self.query_time_budget is not None
+            or self.query_step_budget is not None
+            or self.run_deadline is not None
+        )
+        # Small step budgets are checked at their own granularity.
+        self._progress_interval = max(1, min(PROGRESS_HANDLER_STEPS, self.query_step_budget or PROGRESS_HANDLER_STEPS))
+        self._raw_connection.driver_connection.set_progress_handler(
+            self._on_progress if budgeted else None, self._progress_interval
+        )
+
+    def _on_progress(self) -> int:
+        # A non-zero return value makes SQLite interrupt the running statement.
+        if self._budget_deadline is None:
+            return 0
+        self._budget_steps += self._progress_interval
+        if self.query_step_budget is not None and self._budget_steps > self.query_step_budget:
+            self._budget_reason = "steps"
+            return 1
+        if time.monotonic() > self._budget_deadline:
+            self._budget_reason = self._budget_deadline_reason
+            return 1
+        return 0
+
+    @contextmanager
+    def _query_budget(self, sql: str):
+        """Run a raw SQLite statement under the query budget."""
+        if self.query_time_budget is None and self.query_step_budget is None and self.run_deadline is None:
+            yield
+            return
+        start = time.monotonic()
+        budget = self.query_time_budget
+        self._budget_deadline = start + budget if budget is not None else float("inf")
+        self._budget_deadline_reason = "time"
+        if self.run_deadline is not None and self.run_deadline < self._budget_deadline:
+            self._budget_deadline = self.run_deadline
+            self._budget_deadline_reason = "deadline"
+        self._budget_steps = 0
+        self._budget_reason = None
+        try:
+            yield
+        except Exception as e:
+            if self._budget_reason is None:
+                raise
+            self.logger_query_time.warning(
+                f"Query interrupted ({self._budget_reason} budget) after "
+                f"{time.monotonic() - start:.2f} seconds: {sql}"
+            )
+            raise QueryBudgetExceeded(self._budget_reason, sql, time.monotonic() - start) from e
+        finally:
+            self._budget_deadline = None
+
+    def _uses_raw_sqlite(self) -> bool:
+        dialect = getattr(self.engine, "dialect", None)
+        return isinstance(dialect, Dialect) and dialect.name == "sqlite"
+
+    def _get_raw_cursor(self):
+        if self._raw_cursor is None:
+            self._raw_connection = self.engine.raw_connection()
+            self._raw_connection.driver_connection.create_function(
+                "matilda_sample_bucket", -1, _sample_bucket, deterministic=True
+            )
+            self._install_progress_handler()
+            self._raw_cursor = self._raw_connection.cursor()
+        return self._raw_cursor
+
+    @staticmethod
+    def _bind(statement: CompiledStatement, params: Dict[str, Any]):
+        """Parameters of a raw DB-API execution of ``statement``."""
+        if statement.defaults:
+            params = {**statement.defaults, **params}
+        if statement.param_names is not None:
+            return tuple(params[name] for name in statement.param_names)
+        return params
+
+    @staticmethod
+    def _signature(statement: CompiledStatement, params: Dict[str, Any]) -> str:
+        """Result cache signature of a statement execution: its SQL text and parameters."""
+        return f"{statement.sql}\x00{sorted(params.items())!r}"
+
+    def _count_executed(self, statements: int = 1):
+        """Count statements sent to the database, from any thread (see executed_queries)."""
+        with self._lock:
+            self.queries_executed += statements
+
+    def _execute_scalar(self, statement: CompiledStatement, params: Dict[str, Any], use_cache: bool = True):
+        signature = None
+        if use_cache and self.result_cache is not None:
+            signature = self._signature(statement, params)
+            cached = self.result_cache.get(signature)
+            if cached is not None:
+                return cached
+        self._count_executed()
+        if self._uses_raw_sqlite():
+            bound = self._bind(statement, params)
+            cursor = self._get_raw_cursor()
+            start = time.perf_counter()
+            with self._query_budget(statement.sql):
+                row = cursor.execute(statement.sql, bound).fetchone()
+            result = row[0] if row else None
+            if self.cost_model is not None and statement.sql in self._statement_plan_keys:
+                self.cost_model.observe(
+                    self._statement_plan_keys[statement.sql], time.perf_counter() - start, result
+                )
+        else:
+            if statement.defaults:
+                params = {**statement.defaults, **params}
+            with self.engine.connect() as conn:
+                result = conn.execute(text(statement.sql), params).scalar()
+        if signature is not None and result is not None:
+            self.result_cache.put(signature, result)
+        return result
+
     # Below methods are similar to the original code but reorganized for clarity.
 
     def _construct_threshold_query(
@@ -151,9 +1261,12 @@ class QueryUtility:
         )
         if join_base is None :
             return None, None, None
-        query = select((func.count() > threshold).label("count_exceeds_threshold")).select_from(join_base)
+        # Only threshold + 1 rows are needed to decide, hence the LIMIT subquery.
+        rows = select(literal(1)).select_from(join_base)
         if primary_key_conditions:
-            query = query.where(and_(*primary_key_conditions))
+            rows = rows.where(and_(*primary_key_conditions))
+        rows = rows.limit(bindparam("limit")).subquery()
+        query = select((func.count() > threshold).label("count_exceeds_threshold")).select_from(rows)
         return query, primary_key_conditions, join_base
 
     def _construct_count_query(
@@ -161,11 +1274,13 @@ class QueryUtility:
         join_conditions,
         disjoint_semantics,
         distinct,
-        count_over
+        count_over,
+        limit=None,
+        bucket_filter=None,
     ):
         # Construct the query and return it along with conditions
         query, primary_key_conditions, join_base = self._construct_query_base(
-            join_conditions, disjoint_semantics, distinct, count_over
+            join_conditions, disjoint_semantics, distinct, count_over, limit, bucket_filter
         )
         return query, primary_key_conditions, join_base
 
@@ -174,8 +1289,15 @@ class QueryUtility:
         join_conditions,
         disjoint_semantics,
         distinct,
-        count_over
+        count_over,
+        limit=None,
+        bucket_filter=None,
     ):
+        """
+        Build the flat count query of a join. ``bucket_filter`` maps a list of
+        columns to a condition on the hash bucket of their values; it is applied to
+        the projected attributes, or to the first join column without a projection.
+        """
         condition_groups = self._organize_join_conditions(join_conditions)
         try:
             join_bases, aliases, used_aliases, table_occurrences = (
@@ -195,9 +1317,129 @@ class QueryUtility:
         else:
             primary_key_conditions = where_constraints
 
-        query = self._construct_select_query(join_base, distinct, primary_key_conditions, count_over, aliases)
+        if bucket_filter is not None:
+            projected = [x_class[0] for x_class in count_over or [] if x_class]
+            columns = []
+            for table_name, occurrence, attribute_name in projected or [join_conditions[0][:3]]:
+                alias_key = f"{table_name}_{occurrence}"
+                if alias_key not in aliases:
+                    raise ValueError(f"Alias {alias_key} not found in aliases")
+                columns.append(aliases[alias_key].columns[attribute_name])
+            primary_key_conditions = primary_key_conditions + [bucket_filter(columns)]
+
+        query = self._construct_select_query(
+            join_base, distinct, primary_key_conditions, count_over, aliases, limit
+        )
         return query, primary_key_conditions, join_base
 
+    def _construct_acyclic_count_query(
+        self,
+        join_conditions: List[Tuple[str, int, str, str, int, str]],
+        count_over: List[List[Tuple[str, int, str]]],
+        limit=None,
+    ):
+        """
+        Build the distinct-projection count of an acyclic join with semi-join reduction.
+
+        When the table occurrences and the conditions between them form a tree, each
+        subtree is reduced bottom-up to the distinct values of its join keys towards
+        its parent and of the projected attributes it holds, so intermediate results
+        stay bounded by the input and output sizes instead of growing with the full
+        join. Returns None for cyclic or disconnected shapes, or when a projected
+        attribute is not part of the join, so the caller keeps the flat plan.
+        """
+        alias_tables: Dict[str, str] = {}
+        edges: Dict[frozenset, List[Tuple[str, str, str, str]]] = defaultdict(list)
+        filters: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        for condition in join_conditions:
+            table_name1, occurrence1, _, table_name2, occurrence2, _ = condition
+            if table_name1 not in self.metadata.tables or table_name2 not in self.metadata.tables:
+                return None
+            resolved = self._resolve_condition_columns(condition)
+            if resolved is None:
+                continue
+            alias_key1, column1, alias_key2, column2 = resolved
+            alias_tables[f"{table_name1}_{occurrence1}"] = table_name1
+            alias_tables[f"{table_name2}_{occurrence2}"] = table_name2
+            if alias_key1 == alias_key2:
+                filters[alias_key1].append((column1, column2))
+            else:
+                edges[frozenset((alias_key1, alias_key2))].append(resolved)
+        if not alias_tables or len(edges) != len(alias_tables) - 1:
+            return None
+
+        projection: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+        for index, x_class in enumerate(x_class for x_class in count_over if x_class):
+            table_name, occurrence, attribute_name = x_class[0]
+            alias_key = f"{table_name}_{occurrence}"
+            if alias_key not in alias_tables or attribute_name not in self._get_table_columns(table_name):
+                return None
+            projection[alias_key].append((index, attribute_name))
+        if not projection:
+            return None
+
+        # Root the join tree at a projected occurrence; |edges| == |nodes| - 1,
+        # so the alias graph is a tree exactly when it is connected.
+        neighbours: Dict[str, List[str]] = defaultdict(list)
+        for pair in edges:
+            alias_key1, alias_key2 = sorted(pair)
+            neighbours[alias_key1].append(alias_key2)
+            neighbours[alias_key2].append(alias_key1)
+        root = next(iter(projection))
+        parents = {root: None}
+        order = []
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for neighbour in sorted(neighbours[node]):
+                if neighbour not in parents:
+                    parents[neighbour] = node
+                    queue.append(neighbour)
+        if len(order) != len(alias_tables):
+            return None
+
+        reduced = {}
+        for node in reversed(order):
+            node_alias = alias(self.metadata.tables[alias_tables[node]], name=node)
+            columns = []
+            key_pairs = []
+            if parents[node] is not None:
+                for alias_key1, column1, alias_key2, column2 in edges[frozenset((node, parents[node]))]:
+                    node_column, parent_column = (column1, column2) if alias_key1 == node else (column2, column1)
+                    columns.append(node_alias.columns[node_column].label(f"k{len(key_pairs)}"))
+                    key_pairs.append((node_column, parent_column))
+            for index, attribute_name in projection.get(node, []):
+                columns.append(node_alias.columns[attribute_name].label(f"p{index}"))
+
+            join_base = node_alias
+            for child in (n for n in order if parents.get(n) == node):
+                child_cte, child_keys, child_outputs = reduced[child]
+                join_base = join_base.join(
+                    child_cte,
+                    and_(*[
+                        node_alias.columns[parent_column] == child_cte.columns[f"k{j}"]
+                        for j, (_, parent_column) in enumerate(child_keys)
+                    ]),
+                )
+                columns.extend(child_cte.columns[f"p{index}"] for index in child_outputs)
+
+            query = select(*columns).distinct().select_from(join_base)
+            if filters.get(node):
+                query = query.where(and_(*[
+                    node_alias.columns[column1] == node_alias.columns[column2]
+                    for column1, column2 in filters[node]
+                ]))
+            outputs = [index for index, _ in projection.get(node, [])]
+            for child in (n for n in order if parents.get(n) == node):
+                outputs.extend(reduced[child][2])
+            if node == root:
+                if limit is not None:
+                    query = query.limit(limit)
+                return select(func.count()).select_from(query.subquery())
+            reduced[node] = (query.cte(name=f"reduced_{node}"), key_pairs, outputs)
+        return None
+
     def _organize_join_conditions(self, join_conditions: List[Tuple[str, int, str, str, int, str]]):
         condition_groups = {}
         for condition in join_conditions:
@@ -239,14 +1481,11 @@ class QueryUtility:
                 alias2 = self._get_or_create_alias(aliases, table_name2, occurrence2)
 
                 partial_join_conditions = []
-                for (tn1, o1, attr1, tn2, o2, attr2) in group:
-                    columns_alias1 = [str(el).split(".")[1] for el in alias1.columns._all_columns]
-                    columns_alias2 = [str(el).split(".")[1] for el in alias2.columns._all_columns]
-
-                    if attr1 in columns_alias1 and attr2 in columns_alias2:
-                        partial_join_conditions.append(alias1.columns[attr1] == alias2.columns[attr2])
-                    elif attr2 in columns_alias1 and attr1 in columns_alias2:
-                        partial_join_conditions.append(alias1.columns[attr2] == alias2.columns[attr1])
+                for condition in group:
+                    resolved = self._resolve_condition_columns(condition)
+                    if resolved is not None:
+                        _, column1, _, column2 = resolved
+                        partial_join_conditions.append(alias1.columns[column1] == alias2.columns[column2])
 
                 if partial_join_conditions:
                     join_condition = and_(*partial_join_conditions)
@@ -263,10 +1502,11 @@ class QueryUtility:
                     continue
                 alias1 = self._get_or_create_alias(aliases, table_name1, occurrence1)
                 partial_join_conditions = []
-                for (tn1, o1, attr1, tn2, o2, attr2) in group:
-                    columns_alias1 = [str(el).split(".")[1] for el in alias1.columns._all_columns]
-                    if attr1 in columns_alias1 and attr2 in columns_alias1:
-                        partial_join_conditions.append(alias1.columns[attr1] == alias1.columns[attr2])
+                for condition in group:
+                    resolved = self._resolve_condition_columns(condition)
+                    if resolved is not None:
+                        _, column1, _, column2 = resolved
+                        partial_join_conditions.append(alias1.columns[column1] == alias1.columns[column2])
                 if partial_join_conditions:
                     join_condition = and_(*partial_join_conditions)
                     join_bases.append((f"{table_name1}_{occurrence1}", None, join_condition))
@@ -274,6 +1514,40 @@ class QueryUtility:
 
         return join_bases, aliases, used_aliases, table_occurrences
 
+    def _resolve_condition_columns(
+        self, condition: Tuple[str, int, str, str, int, str]
+    ) -> Optional[Tuple[str, str, str, str]]:
+        """
+        Pair the attributes of a join condition with its aliases, as
+        (alias_key1, column1, alias_key2, column2) where alias_key1 is the smaller
+        (table, occurrence). The condition is first oriented smaller occurrence
+        first, as in _canonical_plan_key, so each attribute stays with its own
+        occurrence whichever way the condition is written. Returns None when the
+        columns do not exist.
+        """
+        if (condition[3], condition[4]) < (condition[0], condition[1]):
+            condition = condition[3:] + condition[:3]
+        table_name1, occurrence1, attribute_name1, table_name2, occurrence2, attribute_name2 = condition
+        sorted_key = sorted({(table_name1, occurrence1), (table_name2, occurrence2)})
+        first_table, first_occurrence = sorted_key[0]
+        last_table, last_occurrence = sorted_key[-1]
+        columns1 = self._get_table_columns(first_table)
+        columns2 = self._get_table_columns(last_table)
+        alias_key1 = f"{first_table}_{first_occurrence}"
+        alias_key2 = f"{last_table}_{last_occurrence}"
+        if attribute_name1 in columns1 and attribute_name2 in columns2:
+            return alias_key1, attribute_name1, alias_key2, attribute_name2
+        if len(sorted_key) == 2 and attribute_name2 in columns1 and attribute_name1 in columns2:
+            return alias_key1, attribute_name2, alias_key2, attribute_name1
+        return None
+
+    def _get_table_columns(self, table_name: str) -> frozenset:
+        if table_name not in self._table_columns:
+            self._table_columns[table_name] = frozenset(
+                col.name for col in self.metadata.tables[table_name].columns
+            )
+        return self._table_columns[table_name]
+
     def _get_or_create_alias(self, aliases: Dict[str, Any], table_name: str, occurrence: int):
         alias_key = f"{table_name}_{occurrence}"
         if table_name not in self.metadata.tables:
@@ -292,17 +1566,28 @@ class QueryUtility:
         first_base_key = join_bases[0][0]
         used_aliases_in_join.add(first_base_key)
         join_base = aliases[first_base_key].selectable
-        for alias_key1, alias_key2, join_condition in join_bases:
-            if alias_key2 is None:
-                where_constraints.append(join_condition)
-            elif alias_key1 in used_aliases_in_join and alias_key2 not in used_aliases_in_join:
-                used_aliases_in_join.add(alias_key2)
-                join_base = join_base.join(aliases[alias_key2], join_condition)
-            elif alias_key2 in used_aliases_in_join and alias_key1 not in used_aliases_in_join:
-                used_aliases_in_join.add(alias_key1)
-                join_base = join_base.join(aliases[alias_key1], join_condition)
-            elif alias_key1 in used_aliases_in_join and alias_key2 in used_aliases_in_join:
-                where_constraints.append(join_condition)
+        # A base that does not touch the join built so far is retried once the
+        # aliases it depends on have been joined, so the result does not depend
+        # on the order of the join conditions.
+        pending = list(join_bases)
+        while pending:
+            deferred = []
+            for alias_key1, alias_key2, join_condition in pending:
+                if alias_key2 is None:
+                    where_constraints.append(join_condition)
+                elif alias_key1 in used_aliases_in_join and alias_key2 not in used_aliases_in_join:
+                    used_aliases_in_join.add(alias_key2)
+                    join_base = join_base.join(aliases[alias_key2], join_condition)
+                elif alias_key2 in used_aliases_in_join and alias_key1 not in used_aliases_in_join:
+                    used_aliases_in_join.add(alias_key1)
+                    join_base = join_base.join(aliases[alias_key1], join_condition)
+                elif alias_key1 in used_aliases_in_join and alias_key2 in used_aliases_in_join:
+                    where_constraints.append(join_condition)
+                else:
+                    deferred.append((alias_key1, alias_key2, join_condition))
+            if len(deferred) == len(pending):
+                break
+            pending = deferred
 
         return join_base, where_constraints
 
@@ -335,6 +1620,7 @@ class QueryUtility:
         primary_key_conditions: List[Any] = None,
         count_over: List[List[Tuple[str, int, str]]] = None,
         aliases: Dict[str, Any] = None,
+        limit=None,
     ):
         if count_over and not aliases:
             raise ValueError("Aliases must be provided when count_over is specified.")
@@ -353,9 +1639,17 @@ class QueryUtility:
             inner_query = select(*count_over_clause).distinct().select_from(join_base)
             if primary_key_conditions:
                 inner_query = inner_query.where(and_(*primary_key_conditions))
+            if limit is not None:
+                inner_query = inner_query.limit(limit)
             #query = select(func.count()).select_from(inner_query)
             query = select(func.count()).select_from(inner_query.subquery()) # for future version of sqlalchemy
 
+        elif limit is not None:
+            inner_query = select(literal(1)).select_from(join_base)
+            if primary_key_conditions:
+                inner_query = inner_query.where(and_(*primary_key_conditions))
+            query = select(func.count()).select_from(inner_query.limit(limit).subquery())
+
         else:
             query = select(func.count()).distinct().select_from(join_base)
             if primary_key_conditions:
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# Shared by all runs and processes unless another path is given.
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[2] / ".cache" / "query_results.sqlite"
+
+# Bytes of the SQLite header hashed into the fingerprint; they include the file
+# change counter, incremented by every write transaction in rollback-journal mode.
+SQLITE_HEADER_BYTES = 100
+
+# Estimated bytes of a buffered result (key, value and dict slot), for the memory budget.
+PENDING_ENTRY_BYTES = 160
+
+
+def database_fingerprint(database: str) -> str:
+    """
+    Fingerprint of a SQLite database file: its size, modification time and header,
+    and the size and modification time of its write-ahead log, which holds the
+    commits not yet checkpointed into the file. Any write to the database changes
+    it, so cached results never outlive the data.
+    """
+    stat = os.stat(database)
+    with open(database, "rb") as f:
+        header = f.read(SQLITE_HEADER_BYTES)
+    digest = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}:".encode("utf-8"))
+    digest.update(header)
+    wal = f"{database}-wal"
+    if os.path.exists(wal):
+        wal_stat = os.stat(wal)
+        digest.update(f":{wal_stat.st_size}:{wal_stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def purge_result_cache(path: Path = DEFAULT_CACHE_PATH) -> bool:
+    """Delete the cache file and its WAL side files; return True if a cache existed."""
+    existed = False
+    for suffix in ("", "-wal", "-shm"):
+        file = Path(f"{path}{suffix}")
+        if file.exists():
+            file.unlink()
+            existed = True
+    return existed
+
+
+class ResultCache:
+    """
+    Persistent cache of scalar query results in a SQLite side file.
+
+    Entries are keyed by the fingerprint of the queried database and by the
+    signature of the query (its canonical SQL text and parameters), so repeated
+    runs and parameter sweeps over the same database reuse each other's counts.
+    New entries are buffered and written in batches in a single transaction; the
+    file is in WAL mode with a busy timeout, so parallel processes can share it.
+    Once more than ``max_entries`` are stored, the oldest entries are evicted.
+
+    :param fingerprint: The fingerprint of the queried database.
+    :param path: The cache file.
+    :param max_entries: Maximum number of stored results.
+    :param flush_every: Number of new results buffered before they are written.
+    """
+
+    def __init__(
+        self,
+        fingerprint: str,
+        path: Path = DEFAULT_CACHE_PATH,
+        max_entries: int = 1000000,
+        flush_every: int = 256,
+    ):
+        self.fingerprint = fingerprint
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self._pending: Dict[bytes, int] = {}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key BLOB PRIMARY KEY, fingerprint TEXT, value INTEGER, created REAL"
+            ") WITHOUT ROWID"
+        )
+
+    def _key(self, signature: str) -> bytes:
+        return hashlib.sha1(f"{self.fingerprint}\x00{signature}".encode("utf-8")).digest()
+
+    def get(self, signature: str) -> Optional[int]:
+        """Return the cached result of a query, or None."""
+        key = self._key(signature)
+        value = self._pending.get(key)
+        if value is None:
+            row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            value = row[0] if row else None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, signature: str, value: int):
+        """Store the result of a query."""
+        self._pending[self._key(signature)] = value
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered results, then evict the oldest entries over the limit."""
+        if not self._pending:
+            return
+        now = time.time()
+        rows = [(key, self.fingerprint, value, now) for key, value in self._pending.items()]
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+            excess = self._conn.execute("SELECT count(*) FROM results").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM results WHERE key IN "
+                    "(SELECT key FROM results ORDER BY created LIMIT ?)",
+                    (excess,),
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._pending.clear()
+
+    def memory_usage(self) -> int:
+        """Estimated bytes of the buffered results."""
+        return len(self._pending) * PENDING_ENTRY_BYTES
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+        return f"Result cache: {self.hits} hits, {self.misses} misses ({rate:.1%} hit rate)"
@@ -0,0 +1,239 @@
+import json
+import os
+from bisect import bisect_left
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# Values kept per column by collect(): most frequent values and histogram buckets.
+DEFAULT_TOP_K = 10
+DEFAULT_HISTOGRAM_BUCKETS = 10
+
+
+class ColumnStatistics(NamedTuple):
+    """
+    Statistics of a column collected by StatisticsCatalog.collect.
+
+    ``distinct_count`` counts the non-NULL values, ``most_common`` holds the most
+    frequent non-NULL values with their counts (most frequent first) and
+    ``histogram`` the bounds of equi-depth buckets of the non-NULL values (the
+    smallest value, then the largest value of each bucket).
+    """
+    distinct_count: int
+    null_fraction: float
+    most_common: List[Tuple[Any, int]]
+    histogram: List[Any]
+
+
+def _json_value(value):
+    return value if value is None or isinstance(value, (bool, int, float, str)) else str(value)
+
+
+class StatisticsCatalog:
+    """
+    Cached table statistics: row counts, per-column distinct counts and the
+    cardinalities of two-column equi-joins.
+
+    Each statistic is read from the database the first time it is requested and
+    kept for the rest of the run, so it costs one scan per table or column.
+    ``collect`` instead profiles every table up front (row count, distinct values,
+    NULL fraction, most frequent values and an equi-depth histogram per column),
+    which feeds the join size estimates; the profile can be saved and loaded back
+    while the database file is unchanged.
+    """
+
+    def __init__(self, query_utility):
+        self.query_utility = query_utility
+        self._row_counts: Dict[str, int] = {}
+        self._distinct_counts: Dict[Tuple[str, str], int] = {}
+        self._join_counts: Dict[Tuple, int] = {}
+        self._columns: Dict[Tuple[str, str], ColumnStatistics] = {}
+        self._max_frequencies: Dict[Tuple[str, str], int] = {}
+
+    def row_count(self, table_name: str) -> int:
+        """Return the number of rows of a table."""
+        if table_name not in self._row_counts:
+            self._row_counts[table_name] = self.query_utility.get_table_row_count(table_name)
+        return self._row_counts[table_name]
+
+    def distinct_count(self, table_name: str, attribute_name: str) -> int:
+        """Return the number of distinct values of a column, NULL included."""
+        key = (table_name, attribute_name)
+        if key not in self._distinct_counts:
+            self._distinct_counts[key] = self.query_utility.get_column_distinct_count(
+                table_name, attribute_name
+            )
+        return self._distinct_counts[key]
+
+    def join_row_count(
+        self,
+        table1: str,
+        attribute1: str,
+        table2: str,
+        attribute2: str,
+        same_row: bool = False,
+        limit: Optional[int] = None,
+    ) -> int:
+        """
+        Return the number of rows of the join ``table1.attribute1 = table2.attribute2``,
+        or the number of rows of the table where both attributes are equal when
+        ``same_row`` is set (a condition between two attributes of one occurrence).
+        With ``limit`` the count stops at that value.
+        """
+        key = (table1, attribute1, table2, attribute2, same_row, limit)
+        if key not in self._join_counts:
+            join_conditions = [(table1, 0, attribute1, table2, 0 if same_row else 1, attribute2)]
+            if limit is None:
+                count = self.query_utility.get_join_row_count(join_conditions)
+            else:
+                count = self.query_utility.count_up_to(join_conditions, limit)
+            self._join_counts[key] = count
+        return self._join_counts[key]
+
+    def collect(
+        self,
+        tables: List[str],
+        top_k: int = DEFAULT_TOP_K,
+        histogram_buckets: int = DEFAULT_HISTOGRAM_BUCKETS,
+    ):
+        """
+        Profile the given tables: one aggregate scan per table for the row count
+        and the distinct and NULL counts of all its columns, then one grouped query
+        per column for its most frequent values and one for its histogram.
+        """
+        for table_name in tables:
+            row_count, profile = self.query_utility.get_table_profile(table_name)
+            self._row_counts[table_name] = row_count
+            for attribute_name, (distinct, nulls) in profile.items():
+                key = (table_name, attribute_name)
+                self._distinct_counts[key] = distinct + (1 if nulls else 0)
+                self._columns[key] = ColumnStatistics(
+                    distinct,
+                    nulls / row_count if row_count else 0.0,
+                    self.query_utility.get_most_common_values(table_name, attribute_name, top_k),
+                    self.query_utility.get_histogram_bounds(table_name, attribute_name, histogram_buckets),
+                )
+
+    def column_statistics(self, table_name: str, attribute_name: str) -> Optional[ColumnStatistics]:
+        """Return the collected statistics of a column, or None if it was not profiled."""
+        return self._columns.get((table_name, attribute_name))
+
+    def max_frequency(self, table_name: str, attribute_name: str) -> int:
+        """Return the number of rows of the most frequent non-NULL value of a column."""
+        key = (table_name, attribute_name)
+        if key not in self._max_frequencies:
+            column = self._columns.get(key)
+            if column is None or (column.distinct_count and not column.most_common):
+                most_common = self.query_utility.get_most_common_values(table_name, attribute_name, 1)
+            else:
+                most_common = column.most_common
+            self._max_frequencies[key] = most_common[0][1] if most_common else 0
+        return self._max_frequencies[key]
+
+    def fraction_below(self, table_name: str, attribute_name: str, value) -> Optional[float]:
+        """
+        Estimate the fraction of the non-NULL values of a column that are at most
+        ``value`` from its histogram, or None if the column has no histogram.
+        """
+        column = self._columns.get((table_name, attribute_name))
+        if column is None or len(column.histogram) < 2:
+            return None
+        try:
+            if value < column.histogram[0]:
+                return 0.0
+            bucket = bisect_left(column.histogram, value, 1)
+        except TypeError:
+            return None
+        return min(1.0, bucket / (len(column.histogram) - 1))
+
+    def _disjoint_ranges(self, column1: ColumnStatistics, column2: ColumnStatistics) -> bool:
+        """True if the histograms show that two columns share no value."""
+        if not column1.histogram or not column2.histogram:
+            return False
+        try:
+            return column1.histogram[-1] < column2.histogram[0] or column2.histogram[-1] < column1.histogram[0]
+        except TypeError:
+            return False
+
+    def join_size_estimate(self, table1: str, attribute1: str, table2: str, attribute2: str) -> float:
+        """
+        Estimate the number of rows of the join ``table1.attribute1 = table2.attribute2``.
+
+        The most frequent values known on both sides contribute their exact product
+        of frequencies; the remaining rows are assumed uniform over the distinct
+        values of the side with more of them (the usual 1 / max(NDV) selectivity).
+        NULL values never join, nor columns whose histograms do not overlap.
+        """
+        columns = (self._columns.get((table1, attribute1)), self._columns.get((table2, attribute2)))
+        if None not in columns and self._disjoint_ranges(*columns):
+            return 0.0
+        sides = []
+        for table_name, attribute_name in ((table1, attribute1), (table2, attribute2)):
+            column = self._columns.get((table_name, attribute_name))
+            rows = self.row_count(table_name)
+            if column is None:
+                distinct = self.distinct_count(table_name, attribute_name)
+                sides.append((rows, distinct, {}))
+            else:
+                non_null = rows * (1 - column.null_fraction)
+                sides.append((non_null, column.distinct_count, dict(column.most_common)))
+        (rows1, distinct1, common1), (rows2, distinct2, common2) = sides
+        if not distinct1 or not distinct2:
+            return 0.0
+        estimate = 0.0
+        for value in common1.keys() & common2.keys():
+            estimate += common1[value] * common2[value]
+            rows1 -= common1[value]
+            rows2 -= common2[value]
+            distinct1 -= 1
+            distinct2 -= 1
+        if distinct1 > 0 and distinct2 > 0:
+            estimate += max(rows1, 0) * max(rows2, 0) / max(distinct1, distinct2)
+        return estimate
+
+    def save(self, path: str, fingerprint: Optional[str] = None):
+        """Write the collected statistics to a JSON file, with the database fingerprint."""
+        columns = {}
+        for (table_name, attribute_name), column in self._columns.items():
+            columns.setdefault(table_name, {})[attribute_name] = {
+                "distinct_count": column.distinct_count,
+                "null_fraction": column.null_fraction,
+                "most_common": [[_json_value(value), count] for value, count in column.most_common],
+                "histogram": [_json_value(value) for value in column.histogram],
+            }
+        with open(path, "w") as f:
+            json.dump(
+                {"fingerprint": fingerprint, "row_counts": self._row_counts, "columns": columns},
+                f,
+                indent=4,
+            )
+
+    def load(self, path: str, fingerprint: Optional[str] = None) -> bool:
+        """
+        Read statistics written by ``save``. Nothing is loaded, and False returned,
+        when the file is missing or was written for another version of the database.
+        """
+        if fingerprint is None or not os.path.exists(path):
+            return False
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("fingerprint") != fingerprint:
+            return False
+        self._row_counts.update(data["row_counts"])
+        for table_name, columns in data["columns"].items():
+            for attribute_name, column in columns.items():
+                key = (table_name, attribute_name)
+                self._columns[key] = ColumnStatistics(
+                    column["distinct_count"],
+                    column["null_fraction"],
+                    [tuple(entry) for entry in column["most_common"]],
+                    column["histogram"],
+                )
+                self._distinct_counts[key] = column["distinct_count"] + (1 if column["null_fraction"] else 0)
+        return True
+
+    def clear(self):
+        """Forget all cached statistics (e.g. after the data changed)."""
+        self._row_counts.clear()
+        self._distinct_counts.clear()
+        self._join_counts.clear()
+        self._columns.clear()
+        self._max_frequencies.clear()
@@ -8,6 +8,7 @@ candidate rules based on database statistics.
 
 from typing import Tuple
 from algorithms.MATILDA.constraint_graph import AttributeMapper, JoinableIndexedAttributes
+from algorithms.MATILDA.rule_plan import RulePlan
 from database.alchemy_utility import AlchemyUtility
 
 
@@ -31,11 +32,18 @@ class PathSearchHeuristics:
         """
         self.db_inspector = db_inspector
         self.mapper = mapper
+        # The statistics catalog of AlchemyUtility, when available, provides the
+        # table sizes and the join size estimates.
+        self.statistics = getattr(db_inspector, "statistics", None)
         self._table_sizes = {}
         self._cache_table_sizes()
     
     def _cache_table_sizes(self):
         """Cache table sizes for faster lookups."""
+        if self.statistics is not None:
+            for table in self.db_inspector.get_table_names():
+                self._table_sizes[table] = self.statistics.row_count(table)
+            return
         try:
             tables = self.db_inspector.get_tables()
             for table in tables:
@@ -115,24 +123,79 @@ class PathSearchHeuristics:
         
         # Estimate result cardinality after all joins
         # Start with size of first table
-        first_attr = candidate_rule[0][0] if candidate_rule[0] else None
+        first_attr = next(iter(candidate_rule[0]), None)
         if not first_attr:
             return float('inf')
         
         first_table = self._get_table_name(first_attr, mapper)
         result_size = self._table_sizes.get(first_table, 1000)
+
+        if self.statistics is not None:
+            return self._estimated_join_size(candidate_rule, mapper, first_attr, result_size)
         
-        # Apply join selectivity for each additional table
+        # Apply join selectivity for each additional table occurrence, including
+        # the other side of the first join.
         # Typical join selectivity is 0.1 (10% of Cartesian product remains)
-        for i in range(1, len(candidate_rule)):
-            join_selectivity = 0.1  # Conservative estimate
-            for attr in candidate_rule[i]:
+        join_selectivity = 0.1  # Conservative estimate
+        reached = {(first_attr.i, first_attr.j)}
+        for jia in candidate_rule:
+            for attr in jia:
+                if (attr.i, attr.j) in reached:
+                    continue
+                reached.add((attr.i, attr.j))
                 table_name = self._get_table_name(attr, mapper)
                 table_size = self._table_sizes.get(table_name, 1000)
                 result_size = result_size * table_size * join_selectivity
         
         return result_size
     
+    def _estimated_join_size(self, candidate_rule: CandidateRule, mapper: AttributeMapper,
+                             first_attr, first_size: float) -> float:
+        """
+        Estimate the rows of the join of a candidate rule from the statistics catalog:
+        each join condition keeps the fraction of the cross product given by the
+        NDV-based join size estimate of its two columns.
+        """
+        result_size = float(first_size)
+        reached = {(first_attr.i, first_attr.j)}
+        for attr1, attr2 in candidate_rule:
+            table1 = self._get_table_name(attr1, mapper)
+            table2 = self._get_table_name(attr2, mapper)
+            size1 = self._table_sizes.get(table1, 0)
+            size2 = self._table_sizes.get(table2, 0)
+            if not size1 or not size2:
+                return 0.0
+            selectivity = self.statistics.join_size_estimate(
+                table1, mapper.index_to_attribute_name[(attr1.i, attr1.k)],
+                table2, mapper.index_to_attribute_name[(attr2.i, attr2.k)],
+            ) / (size1 * size2)
+            for attr, size in ((attr1, size1), (attr2, size2)):
+                if (attr.i, attr.j) not in reached:
+                    reached.add((attr.i, attr.j))
+                    result_size *= size
+            result_size *= selectivity
+        return result_size
+
+    def query_cost_heuristic(self, candidate_rule: CandidateRule, mapper: AttributeMapper,
+                             db_inspector: AlchemyUtility) -> float:
+        """
+        Query cost heuristic: prefer rules whose join is predicted to be fast to count.
+
+        Uses the learned cost model of the database inspector (see CostModel); until
+        it has enough observations, falls back to the naive heuristic.
+
+        :param candidate_rule: Current candidate rule.
+        :param mapper: Attribute mapper for resolving attributes.
+        :param db_inspector: Database inspector holding the cost model.
+        :return: Predicted latency in seconds of the count over the rule's join.
+        """
+        estimate_query_cost = getattr(self.db_inspector, "estimate_query_cost", None)
+        if candidate_rule and estimate_query_cost is not None:
+            cost = estimate_query_cost(RulePlan(candidate_rule, mapper).join_conditions)
+            if cost is not None:
+                return cost
+        return self.naive_heuristic(candidate_rule, mapper, db_inspector)
+
     def hybrid_heuristic(self, candidate_rule: CandidateRule, mapper: AttributeMapper,
                         db_inspector: AlchemyUtility) -> float:
         """
@@ -181,6 +244,9 @@ class PathSearchHeuristics:
         try:
             # Get table name from mapper
             table_idx = attr.i
+            index_to_table_name = getattr(mapper, "index_to_table_name", None)
+            if index_to_table_name is not None:
+                return index_to_table_name.get(table_idx, f"table_{table_idx}")
             if table_idx < len(mapper.tables):
                 return mapper.tables[table_idx]
             return f"table_{table_idx}"
@@ -191,13 +257,15 @@ class PathSearchHeuristics:
         """
         Get a heuristic function by name.
         
-        :param name: Name of the heuristic ('naive', 'table_size', 'join_selectivity', 'hybrid').
+        :param name: Name of the heuristic ('naive', 'table_size', 'join_selectivity',
+                     'query_cost', 'hybrid').
         :return: Heuristic function that can be passed to A-star.
         """
         heuristics = {
             'naive': self.naive_heuristic,
             'table_size': self.table_size_heuristic,
             'join_selectivity': self.join_selectivity_heuristic,
+            'query_cost': self.query_cost_heuristic,
             'hybrid': self.hybrid_heuristic,
         }
         return heuristics.get(name.lower(), self.hybrid_heuristic)
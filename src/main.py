@@ -1,4 +1,5 @@
 import argparse
+import heapq
 import threading
 import shutil
 import datetime
@@ -25,6 +26,7 @@ from algorithms.matilda import MATILDA
 
 from database.alchemy_utility import AlchemyUtility
 from utils.logging_utils import configure_global_logger
+from utils.memory_budget import MemoryBudget, SpillableList
 from utils.monitor import ResourceMonitor
 from utils.config_loader import load_config
 from utils.rules import RuleIO
@@ -67,6 +69,16 @@ def parse_arguments() -> argparse.Namespace:
         default="config.yaml",
         help="Path to the configuration file (default: config.yaml)",
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the MATILDA run of the same configuration from its last checkpoint",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Forecast the size and run time of the MATILDA run without running it",
+    )
     return parser.parse_args()
 
 
@@ -90,6 +102,8 @@ class DatabaseProcessor:
         logger: logging.Logger,
         use_mlflow: bool = False,
         config: dict = None,
+        resume: bool = False,
+        plan: bool = False,
     ):
         self.algorithm_name = algorithm_name
         self.database_name = database_name
@@ -98,6 +112,8 @@ class DatabaseProcessor:
         self.logger = logger
         self.use_mlflow = use_mlflow
         self.config = config or {}
+        self.resume = resume
+        self.plan = plan
 
     def discover_rules(self) -> int:
         """Runs the rule discovery algorithm synchronously."""
@@ -115,7 +131,14 @@ class DatabaseProcessor:
         db_uri = f"sqlite:///{db_file_path}"
         try:
             self.logger.info(f"Using database URI: {db_uri}")
-            with AlchemyUtility(db_uri, database_path=str(self.database_path), create_index=False) as db_util:
+            db_config = self.config.get("database", {})
+            with AlchemyUtility(
+                db_uri,
+                database_path=str(self.database_path),
+                create_index=False,
+                pragma_profile=db_config.get("pragma_profile", "default"),
+                pool_size=db_config.get("pool_size"),
+            ) as db_util:
                 algo: BaseAlgorithm = selected_algorithm(db_util)
                 rules = []
 
@@ -124,13 +147,70 @@ class DatabaseProcessor:
                 # Prepare kwargs for MATILDA with traversal algorithm setting
                 discover_kwargs = {"results_dir": str(self.results_dir)}
                 if self.algorithm_name.upper() == "MATILDA":
-                    traversal_algorithm = self.config.get("algorithm", {}).get("matilda", {}).get("traversal_algorithm", "dfs")
+                    matilda_config = self.config.get("algorithm", {}).get("matilda", {})
+                    traversal_algorithm = matilda_config.get("traversal_algorithm", "dfs")
                     discover_kwargs["traversal_algorithm"] = traversal_algorithm
                     self.logger.info(f"MATILDA using traversal algorithm: {traversal_algorithm}")
+                    if matilda_config.get("top_k") is not None:
+                        discover_kwargs["top_k"] = matilda_config["top_k"]
+                        self.logger.info(f"MATILDA keeping the top {matilda_config['top_k']} rules")
+                    for setting in ("min_support", "min_confidence", "sampling_rate",
+                                    "sampling_tolerance", "sampling_confidence",
+                                    "query_time_budget", "query_step_budget", "query_budget_retry",
+                                    "parallel_partitions", "parallel_min_rows", "index_advisor",
+                                    "index_advisor_warmup", "index_advisor_max_indexes", "result_cache",
+                                    "result_cache_path", "result_cache_max_entries", "max_head_size",
+                                    "collect_statistics", "astar_heuristic", "cost_model",
+                                    "cost_model_path", "timeout", "max_queries",
+                                    "checkpoint_interval", "checkpoint_path", "nb_occurrence",
+                                    "max_table", "max_vars", "plan_probes", "plan_seed",
+                                    "auto_occurrence_limits", "occurrence_limits",
+                                    "subsumption_pruning", "incremental_materialization",
+                                    "materialization_row_budget", "min_node_join_rows"):
+                        if matilda_config.get(setting) is not None:
+                            discover_kwargs[setting] = matilda_config[setting]
+                    monitor_timeout = self.config.get("monitor", {}).get("timeout")
+                    if "timeout" not in discover_kwargs and monitor_timeout is not None:
+                        # The resource monitor cannot interrupt discovery: MATILDA stops by
+                        # itself at the same timeout and the partial results are saved.
+                        discover_kwargs["timeout"] = monitor_timeout
+                    # Opt-in: caches are evicted and frontiers spilled past this many bytes.
+                    memory_budget = matilda_config.get("memory_budget")
+                    if memory_budget is not None:
+                        # One budget for the run: the rules collected here register with it too.
+                        budget = MemoryBudget(memory_budget, spill_dir=matilda_config.get("spill_dir"))
+                        discover_kwargs["memory_budget"] = budget
+                        rules = SpillableList(spill_dir=budget.spill_dir)
+                        budget.register("rules", rules.memory_usage, rules.release_memory)
+                        self.logger.info(f"MATILDA memory budget: {memory_budget} bytes")
+                    if self.resume:
+                        discover_kwargs["resume"] = True
+                        self.logger.info("MATILDA resuming from its last checkpoint")
+                    if self.plan:
+                        algo.plan_discovery(**discover_kwargs)
+                        self.logger.info(f"MATILDA plan saved in {self.results_dir}")
+                        return 0
+                    if matilda_config.get("auto_limits") and "timeout" in discover_kwargs:
+                        recommended = algo.plan_discovery(**discover_kwargs).get("recommended")
+                        if recommended is not None:
+                            discover_kwargs["max_table"] = recommended["max_table"]
+                            discover_kwargs["max_vars"] = recommended["max_vars"]
+                            self.logger.info(
+                                f"MATILDA limits chosen for the timeout: max_table="
+                                f"{recommended['max_table']}, max_vars={recommended['max_vars']}"
+                            )
+                        else:
+                            self.logger.warning("No MATILDA limits fit in the timeout; keeping the configured ones")
                 
                 for rule in algo.discover_rules(**discover_kwargs):
                     self.logger.info(f"Discovered rule: {rule}")
                     rules.append(rule)
+                summary = getattr(algo, "discovery_summary", None)
+                if summary and not summary["completed"]:
+                    self.logger.warning(
+                        f"Discovery stopped early ({summary['stop_reason']}); saving the "
+                        f"{len(rules)} rules found, {summary['unexplored_paths']} paths unexplored."
+                    )
 
                 json_file_name = f"{self.algorithm_name}_{self.database_name.stem}_results.json"
                 result_path = self.results_dir / json_file_name
@@ -165,7 +245,7 @@ class DatabaseProcessor:
                 if self.algorithm_name.upper() == "SPIDER":
                     self.generate_report(number_of_rules, result_path,[])
                 else:
-                    top_rules = sorted(rules,key=lambda x:-x.accuracy)[:5]
+                    top_rules = heapq.nlargest(5, rules, key=lambda x: x.accuracy)
                     self.generate_report(number_of_rules, result_path,top_rules)
 
                 if self.use_mlflow:
@@ -304,6 +384,8 @@ def main() -> None:
         logger=logger,
         use_mlflow=use_mlflow,
         config=config,
+        resume=args.resume,
+        plan=args.plan,
     )
 
     logger.info("Starting rule discovery process.")
@@ -0,0 +1,65 @@
+import asyncio
+import random
+
+import pytest
+
+from algorithms.MATILDA.evaluation_pipeline import EvaluationPipeline
+
+
+def mutating_traversal(n):
+    """Yield the same list object mutated in place, like the DFS traversal."""
+    path = []
+    for i in range(n):
+        path.append(i)
+        yield path
+
+
+def test_results_keep_traversal_order():
+    async def evaluate(candidate):
+        await asyncio.sleep(random.random() / 100)
+        return sum(candidate)
+
+    pipeline = EvaluationPipeline(evaluate, queue_size=4)
+    results = list(pipeline.run(mutating_traversal(20)))
+
+    assert [candidate for candidate, _ in results] == [list(range(i + 1)) for i in range(20)]
+    assert [value for _, value in results] == [sum(range(i + 1)) for i in range(20)]
+
+
+def test_start_and_stop_hooks_run_in_the_event_loop():
+    events = []
+
+    async def on_start():
+        events.append(("start", asyncio.get_running_loop()))
+
+    async def on_stop():
+        events.append(("stop", asyncio.get_running_loop()))
+
+    async def evaluate(candidate):
+        return len(candidate)
+
+    pipeline = EvaluationPipeline(evaluate, on_start=on_start, on_stop=on_stop)
+    assert len(list(pipeline.run(mutating_traversal(3)))) == 3
+    assert [name for name, _ in events] == ["start", "stop"]
+    assert events[0][1] is events[1][1]
+
+
+def test_evaluation_errors_are_raised_to_the_consumer():
+    async def evaluate(candidate):
+        if len(candidate) == 3:
+            raise RuntimeError("query failed")
+        return len(candidate)
+
+    pipeline = EvaluationPipeline(evaluate, queue_size=2)
+    with pytest.raises(RuntimeError):
+        list(pipeline.run(mutating_traversal(10)))
+
+
+def test_consumer_can_stop_early():
+    async def evaluate(candidate):
+        return len(candidate)
+
+    pipeline = EvaluationPipeline(evaluate, queue_size=2)
+    for candidate, _ in pipeline.run(mutating_traversal(1000)):
+        if len(candidate) == 5:
+            break
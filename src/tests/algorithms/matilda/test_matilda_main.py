@@ -2,6 +2,7 @@ import pytest
 from unittest.mock import MagicMock, patch
 
 from algorithms.matilda import MATILDA
+from database.alchemy_utility import QueryBudgetExceeded
 from utils.rules import Rule, TGDRuleFactory
 
 
@@ -17,8 +18,7 @@ def matilda_instance(mock_database):
     return MATILDA(database=mock_database)
 
 
-@patch('algorithms.matilda.instantiate_tgd')
-@patch('algorithms.matilda.TGDRuleFactory.str_to_tgd')
+@patch('algorithms.matilda.build_tgd_rule')
 @patch('algorithms.matilda.split_pruning')
 @patch('algorithms.matilda.split_candidate_rule')
 @patch('algorithms.matilda.dfs')
@@ -28,8 +28,7 @@ def test_discover_rules_no_jia_list(
     mock_dfs,
     mock_split_candidate_rule,
     mock_split_pruning,
-    mock_str_to_tgd,
-    mock_instantiate_tgd,
+    mock_build_tgd_rule,
     matilda_instance
 ):
     """
@@ -62,6 +61,7 @@ import pytest
 from unittest.mock import MagicMock, patch
 
 from algorithms.matilda import MATILDA
+from database.alchemy_utility import QueryBudgetExceeded
 from utils.rules import Rule, TGDRuleFactory
 
 
@@ -91,8 +91,7 @@ def test_init_method(matilda_instance, mock_database):
     assert matilda_with_settings.settings == settings
 
 
-@patch('algorithms.matilda.instantiate_tgd')
-@patch('algorithms.matilda.TGDRuleFactory.str_to_tgd')
+@patch('algorithms.matilda.build_tgd_rule')
 @patch('algorithms.matilda.split_pruning')
 @patch('algorithms.matilda.split_candidate_rule')
 @patch('algorithms.matilda.dfs')
@@ -102,8 +101,7 @@ def test_discover_rules_split_pruning_false(
     mock_dfs,
     mock_split_candidate_rule,
     mock_split_pruning,
-    mock_str_to_tgd,
-    mock_instantiate_tgd,
+    mock_build_tgd_rule,
     matilda_instance
 ):
     """
@@ -136,12 +134,11 @@ def test_discover_rules_split_pruning_false(
     # Assert that no rules are yielded since split_pruning returned False
     assert len(results) == 0
 
-    # Ensure str_to_tgd was not called
-    mock_str_to_tgd.assert_not_called()
+    # Ensure no rule was built
+    mock_build_tgd_rule.assert_not_called()
 
 
-@patch('algorithms.matilda.instantiate_tgd')
-@patch('algorithms.matilda.TGDRuleFactory.str_to_tgd')
+@patch('algorithms.matilda.build_tgd_rule')
 @patch('algorithms.matilda.split_pruning')
 @patch('algorithms.matilda.split_candidate_rule')
 @patch('algorithms.matilda.dfs')
@@ -151,8 +148,7 @@ def test_discover_rules_invalid_splits(
     mock_dfs,
     mock_split_candidate_rule,
     mock_split_pruning,
-    mock_str_to_tgd,
-    mock_instantiate_tgd,
+    mock_build_tgd_rule,
     matilda_instance
 ):
     """
@@ -186,6 +182,181 @@ def test_discover_rules_invalid_splits(
     # Assert that no rules are yielded due to invalid splits
     assert len(results) == 0
 
-    # Ensure split_pruning and str_to_tgd were not called
+    # Ensure split_pruning was not called and no rule was built
     mock_split_pruning.assert_not_called()
-    mock_str_to_tgd.assert_not_called()
+    mock_build_tgd_rule.assert_not_called()
+
+
+@patch('algorithms.matilda.RulePlan')
+@patch('algorithms.matilda.release_path')
+@patch('algorithms.matilda.build_tgd_rule')
+@patch('algorithms.matilda.split_pruning')
+@patch('algorithms.matilda.split_candidate_rule')
+@patch('algorithms.matilda.traverse_graph')
+@patch('algorithms.matilda.init')
+def test_discover_rules_retries_splits_over_the_query_budget(
+    mock_init,
+    mock_traverse_graph,
+    mock_split_candidate_rule,
+    mock_split_pruning,
+    mock_build_tgd_rule,
+    mock_release_path,
+    mock_rule_plan,
+    matilda_instance,
+    mock_database,
+):
+    """
+    A split whose query exceeds the budget is recorded and skipped, then
+    evaluated again with a larger budget after the traversal.
+    """
+    mock_init.return_value = (MagicMock(name='cg'), MagicMock(name='mapper'), ['jia1'])
+    mock_traverse_graph.side_effect = lambda *args, **kwargs: iter([[MagicMock(name='JoinableIndexedAttributes')]])
+    mock_split_candidate_rule.return_value = [({'body'}, {'head'})]
+    mock_split_pruning.side_effect = [
+        QueryBudgetExceeded("steps", "SELECT 1", 0.1),
+        QueryBudgetExceeded("steps", "SELECT 1", 0.5),
+    ]
+
+    results = list(matilda_instance.discover_rules(query_step_budget=1000, query_budget_retry="exact"))
+
+    assert results == []
+    assert [split.reason for split in matilda_instance.budget_exceeded] == ["steps"]
+    budgets = [call.args for call in mock_database.set_query_budget.call_args_list]
+    assert budgets == [(None, 1000), (None, 10000), (None, 1000)]
+
+    mock_split_pruning.side_effect = [
+        QueryBudgetExceeded("time", "SELECT 1", 1.0),
+        (True, 2, 1),
+    ]
+    results = list(matilda_instance.discover_rules(query_time_budget=1.0, query_budget_retry="exact"))
+
+    assert results == [mock_build_tgd_rule.return_value]
+    assert matilda_instance.budget_exceeded == []
+
+
+@patch('algorithms.matilda.RulePlan')
+@patch('algorithms.matilda.build_tgd_rule')
+@patch('algorithms.matilda.split_pruning')
+@patch('algorithms.matilda.split_candidate_rule')
+@patch('algorithms.matilda.traverse_graph')
+@patch('algorithms.matilda.init')
+def test_discover_rules_stops_at_the_query_budget(
+    mock_init,
+    mock_traverse_graph,
+    mock_split_candidate_rule,
+    mock_split_pruning,
+    mock_build_tgd_rule,
+    mock_rule_plan,
+    matilda_instance,
+    mock_database,
+):
+    """
+    Once the query budget is spent, the remaining paths are cut without queries
+    and the rules found so far are returned with a summary of the run.
+    """
+    mock_init.return_value = (MagicMock(name='cg'), MagicMock(name='mapper'), ['jia1'])
+    candidates = [[MagicMock(name=f'JoinableIndexedAttributes{i}')] for i in range(3)]
+    mock_traverse_graph.side_effect = lambda cg, start, pruning, db, mapper, **kwargs: (
+        candidate for candidate in candidates if pruning(candidate, mapper, db)
+    )
+    mock_split_candidate_rule.return_value = [({'body'}, {'head'})]
+    queries = [0]
+    mock_database.executed_queries.side_effect = lambda: queries[0]
+
+    def split_pruning(*args, **kwargs):
+        queries[0] += 1
+        return True, 1, 1
+
+    mock_split_pruning.side_effect = split_pruning
+
+    results = list(matilda_instance.discover_rules(max_queries=2))
+
+    assert len(results) == 2
+    summary = matilda_instance.discovery_summary
+    assert (summary["completed"], summary["stop_reason"]) == (False, "query_budget")
+    assert (summary["queries"], summary["rules"], summary["unexplored_paths"]) == (2, 2, 1)
+
+
+
+@patch('algorithms.matilda.RulePlan')
+@patch('algorithms.matilda.build_tgd_rule')
+@patch('algorithms.matilda.split_pruning')
+@patch('algorithms.matilda.split_candidate_rule')
+@patch('algorithms.matilda.traverse_graph')
+@patch('algorithms.matilda.init')
+def test_discover_rules_resumes_from_the_checkpoint(
+    mock_init,
+    mock_traverse_graph,
+    mock_split_candidate_rule,
+    mock_split_pruning,
+    mock_build_tgd_rule,
+    mock_rule_plan,
+    matilda_instance,
+    mock_database,
+    tmp_path,
+):
+    """
+    A run stopped by its budget checkpoints the last fully evaluated candidate;
+    resuming it skips the start nodes and candidates already evaluated and
+    returns the same rules as an uninterrupted run, without duplicates.
+    """
+    mock_init.return_value = (MagicMock(name='cg'), MagicMock(name='mapper'), ['jia1'])
+    start_nodes = [[["a"], ["a", "b"]], [["c"], ["c", "d"]]]
+    traversed = []
+
+    def traverse_graph(cg, start, pruning, db, mapper, start_index=0, start_callback=None, **kwargs):
+        for index, candidates in enumerate(start_nodes):
+            if index < start_index:
+                continue
+            if start_callback is not None:
+                start_callback(index)
+            for candidate in candidates:
+                if pruning(candidate, mapper, db):
+                    traversed.append(candidate)
+                    yield candidate
+
+    mock_traverse_graph.side_effect = traverse_graph
+    mock_split_candidate_rule.return_value = [({'body'}, {'head'})]
+    mock_build_tgd_rule.side_effect = lambda candidate_rule, *args, **kwargs: "".join(candidate_rule)
+    mock_database.fingerprint.return_value = "fingerprint"
+    queries = [0]
+    mock_database.executed_queries.side_effect = lambda: queries[0]
+
+    def split_pruning(candidate_rule, *args, **kwargs):
+        queries[0] += 1
+        return True, 1, 1
+
+    mock_split_pruning.side_effect = split_pruning
+    checkpoint = dict(checkpoint_path=str(tmp_path / "checkpoint.pkl.gz"), checkpoint_interval=0)
+
+    uninterrupted = list(matilda_instance.discover_rules(max_queries=10))
+    partial = list(matilda_instance.discover_rules(max_queries=3, **checkpoint))
+    assert partial == ["a", "ab", "c"]
+
+    evaluated = mock_split_pruning.call_count
+    resumed = list(matilda_instance.discover_rules(resume=True, **checkpoint))
+    assert resumed == uninterrupted == ["a", "ab", "c", "cd"]
+    # The start node of "c" is replayed, but only "c" and "cd" are evaluated again.
+    assert mock_split_pruning.call_count - evaluated == 2
+    assert traversed[-2:] == [["c"], ["c", "d"]]
+    assert matilda_instance.checkpoint.saves > 0
+
+    evaluated = mock_split_pruning.call_count
+    assert list(matilda_instance.discover_rules(resume=True, **checkpoint)) == uninterrupted
+    assert mock_split_pruning.call_count == evaluated
+
+    assert list(matilda_instance.discover_rules(resume=True, checkpoint_path=checkpoint["checkpoint_path"],
+                                                max_table=2)) == ["a", "ab", "c", "cd"]
+    assert mock_split_pruning.call_count == evaluated + 4
+
+
+@pytest.mark.parametrize("setting", [
+    dict(top_k=5),
+    dict(sampling_rate=0.5),
+    dict(query_time_budget=1.0),
+    dict(query_step_budget=1000),
+    dict(query_budget_retry="exact"),
+])
+def test_discover_rules_rejects_settings_unsupported_by_async_evaluation(matilda_instance, setting):
+    with pytest.raises(ValueError, match=next(iter(setting))):
+        list(matilda_instance.discover_rules(async_evaluation=True, **setting))
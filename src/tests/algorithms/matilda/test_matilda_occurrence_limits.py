@@ -0,0 +1,64 @@
+from unittest.mock import MagicMock
+
+from algorithms.MATILDA.constraint_graph import Attribute
+from algorithms.MATILDA.occurrence_limits import (
+    derive_occurrence_limits,
+    graph_size,
+    occurrence_limits_report,
+)
+
+
+def make_statistics(rows, distinct):
+    statistics = MagicMock()
+    statistics.column_statistics.return_value = None
+    statistics.row_count.side_effect = lambda table: rows[table]
+    statistics.distinct_count.side_effect = lambda table, column: distinct[(table, column)]
+    return statistics
+
+
+def test_limits_follow_distinct_values_keys_and_self_joins():
+    flag = Attribute("person", "flag")
+    person_id = Attribute("person", "id", is_key=True)
+    manager = Attribute("person", "manager")
+    city = Attribute("address", "city")
+    statistics = make_statistics(
+        {"person": 100, "address": 50},
+        {("person", "flag"): 2, ("person", "id"): 100, ("person", "manager"): 10, ("address", "city"): 20},
+    )
+    pairs = [(flag, flag), (person_id, manager), (manager, city)]
+
+    limits, reasons = derive_occurrence_limits(pairs, statistics, 3)
+
+    assert limits == {"person": {"flag": 1, "id": 2}, "address": {"city": 2}}
+    assert reasons == {
+        "person": {"flag": "low_ndv", "id": "unique"},
+        "address": {"city": "no_self_join"},
+    }
+
+
+def test_overrides_replace_derived_limits():
+    city = Attribute("address", "city")
+    street = Attribute("address", "street")
+    statistics = make_statistics({"address": 50}, {("address", "city"): 1, ("address", "street"): 40})
+
+    limits, reasons = derive_occurrence_limits(
+        [(city, street)], statistics, 3, overrides={"address": 3}, auto=False
+    )
+    assert limits == {"address": {"city": 3, "street": 3}}
+    assert reasons["address"]["city"] == "override"
+
+    limits, _ = derive_occurrence_limits([(city, street)], statistics, 3, overrides={"address": {"street": 1}})
+    assert limits == {"address": {"city": 1, "street": 1}}
+
+
+def test_graph_size_counts_nodes_and_shared_occurrences():
+    a = Attribute("t", "a")
+    b = Attribute("u", "b")
+    # t.a = u.b over 2 x 2 occurrences: 4 nodes, each sharing an occurrence with 2 others.
+    assert graph_size([(a, b)], 2) == (4, 4)
+    assert graph_size([(a, b)], 2, {"t": {"a": 1}}) == (2, 1)
+
+    report = occurrence_limits_report([(a, b)], 2, {"t": {"a": 1}}, {"t": {"a": "low_ndv"}})
+    assert report["limits"] == {"t": {"a": {"occurrences": 1, "reason": "low_ndv"}}}
+    assert (report["nodes_before"], report["nodes_after"]) == (4, 2)
+    assert (report["edges_before"], report["edges_after"]) == (4, 1)
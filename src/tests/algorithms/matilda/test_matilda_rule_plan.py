@@ -0,0 +1,73 @@
+import pytest
+from algorithms.MATILDA.constraint_graph import (
+    AttributeMapper,
+    IndexedAttribute,
+    JoinableIndexedAttributes,
+)
+from algorithms.MATILDA.candidate_rule_chains import CandidateRuleChains
+from algorithms.MATILDA.rule_plan import RulePlan
+from utils.rules import Predicate
+from algorithms.MATILDA.tgd_discovery import (
+    attr,
+    build_tgd_rule,
+    instantiate_tgd,
+    path_join_conditions,
+    side_conditions,
+    split_candidate_rule,
+)
+
+
+@pytest.fixture
+def mapper():
+    return AttributeMapper(
+        {"users": 0, "orders": 1},
+        {"users": {"id": 0, "name": 1}, "orders": {"user_id": 0, "item": 1}},
+    )
+
+
+@pytest.fixture
+def candidate_rule():
+    # users_0.id = orders_0.user_id = orders_1.user_id, users_0.name = orders_1.item
+    return [
+        JoinableIndexedAttributes(IndexedAttribute(0, 0, 0), IndexedAttribute(1, 0, 0)),
+        JoinableIndexedAttributes(IndexedAttribute(1, 0, 0), IndexedAttribute(1, 1, 0)),
+        JoinableIndexedAttributes(IndexedAttribute(0, 0, 1), IndexedAttribute(1, 1, 1)),
+    ]
+
+
+def test_rule_plan_matches_the_per_split_derivations(candidate_rule, mapper):
+    plan = RulePlan(candidate_rule, mapper)
+    chains = CandidateRuleChains(candidate_rule)
+    assert plan.join_conditions == path_join_conditions(candidate_rule, mapper)
+    for body, head in split_candidate_rule(candidate_rule):
+        for select in ({}, {"select_body": True}, {"select_head": True}):
+            assert plan.x_chains(body, head, **select) == chains.get_x_chains(body, head, mapper, **select)
+        for side in (body, head):
+            assert plan.side_conditions(side) == side_conditions(candidate_rule, side, mapper)
+    for occurrence in plan.table_occurrences:
+        assert plan.occurrence_attributes(occurrence) == attr(occurrence, candidate_rule)
+
+
+def test_rule_plan_gives_the_same_splits_and_rules(candidate_rule, mapper):
+    plan = RulePlan(candidate_rule, mapper)
+    splits = split_candidate_rule(candidate_rule)
+    assert split_candidate_rule(candidate_rule, plan) == splits
+    for split in splits:
+        assert instantiate_tgd(candidate_rule, split, mapper, plan) == instantiate_tgd(
+            candidate_rule, split, mapper
+        )
+
+
+def test_build_tgd_rule_needs_no_parsing(candidate_rule, mapper):
+    plan = RulePlan(candidate_rule, mapper)
+    split = (frozenset({(0, 0), (1, 0)}), frozenset({(1, 1)}))
+    rule = build_tgd_rule(candidate_rule, split, mapper, 0.5, 0.25, exact=False, plan=plan)
+
+    assert rule.display == instantiate_tgd(candidate_rule, split, mapper)
+    assert rule.body == (
+        Predicate("id", "users_0", "x0"),
+        Predicate("name", "users_0", "x1"),
+        Predicate("user_id", "orders_0", "x0"),
+    )
+    assert rule.head == (Predicate("user_id", "orders_1", "x0"), Predicate("item", "orders_1", "x1"))
+    assert (rule.accuracy, rule.confidence, rule.exact) == (0.5, 0.25, False)
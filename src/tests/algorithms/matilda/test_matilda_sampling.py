@@ -0,0 +1,36 @@
+import pytest
+
+from algorithms.MATILDA.sampling import SplitSampler
+from database.query_utility import SAMPLE_BUCKETS
+
+
+def test_rate_is_rounded_to_buckets():
+    sampler = SplitSampler(0.1)
+    assert sampler.buckets == round(0.1 * SAMPLE_BUCKETS)
+    assert sampler.rate == sampler.buckets / SAMPLE_BUCKETS
+    with pytest.raises(ValueError):
+        SplitSampler(0)
+
+
+def test_full_sample_is_exact():
+    sampler = SplitSampler(1.0)
+    estimate = sampler.estimate(prediction=8, body=4, head=2)
+    assert (estimate.support_low, estimate.support, estimate.support_high) == (2, 2, 2)
+    assert (estimate.confidence_low, estimate.confidence, estimate.confidence_high) == (4, 4, 4)
+    assert estimate.relative_error == 0
+
+
+def test_intervals_contain_the_estimate_and_shrink_with_the_sample():
+    sampler = SplitSampler(0.25)
+    small = sampler.estimate(prediction=10, body=20, head=5)
+    large = sampler.estimate(prediction=1000, body=2000, head=500)
+    for estimate in (small, large):
+        assert estimate.support_low <= estimate.support <= estimate.support_high
+        assert estimate.confidence_low <= estimate.confidence <= estimate.confidence_high
+    assert large.relative_error < small.relative_error
+
+
+def test_empty_sample_keeps_an_upper_bound():
+    low, high = SplitSampler(0.25).count_interval(0)
+    assert low == 0
+    assert high > 0
@@ -0,0 +1,62 @@
+from unittest.mock import MagicMock
+
+from algorithms.MATILDA.constraint_graph import (
+    ConstraintGraph,
+    IndexedAttribute,
+    JoinableIndexedAttributes,
+)
+from algorithms.MATILDA.search_space import (
+    TRAVERSAL_ALGORITHMS,
+    SearchSpaceEstimator,
+    recommend_limits,
+)
+
+
+def make_estimator(graph, queries_per_split=3):
+    executed = [0]
+
+    def evaluate_split(candidate_rule, body, head, plan):
+        executed[0] += queries_per_split
+        return True
+
+    return SearchSpaceEstimator(graph, MagicMock(), evaluate_split, lambda: executed[0], probes=4), executed
+
+
+def test_empty_graph_forecasts_nothing():
+    estimator, _ = make_estimator(ConstraintGraph())
+    planned = estimator.estimate(3, 6)
+    assert planned["probes"] == 0
+    for algorithm in TRAVERSAL_ALGORITHMS:
+        assert planned["forecasts"][algorithm]["candidates"] == 0
+        assert planned["forecasts"][algorithm]["queries"] == 0
+
+
+def test_single_node_is_estimated_exactly():
+    graph = ConstraintGraph()
+    graph.add_node(JoinableIndexedAttributes(IndexedAttribute(0, 0, 0), IndexedAttribute(1, 0, 1)))
+    estimator, executed = make_estimator(graph)
+    forecast = estimator.estimate(3, 6)["forecasts"]["bfs"]
+    # One candidate over two tables: one split per head occurrence.
+    assert forecast["candidates"] == 1
+    assert forecast["candidates_relative_error"] == 0
+    assert forecast["splits"] == 2
+    assert forecast["queries"] == 6
+    assert forecast["rules"] == 2
+    # The sampled split is evaluated once whatever the number of probes and estimates.
+    estimator.estimate(2, 2)
+    assert executed[0] == 3
+
+
+def test_recommend_limits_lowers_max_vars_first():
+    def estimate(max_table, max_vars):
+        seconds = 10.0 * max_table * max_vars
+        return {
+            "max_table": max_table,
+            "max_vars": max_vars,
+            "forecasts": {"dfs": {"seconds": seconds}},
+        }
+
+    assert recommend_limits(estimate, 3, 6, 1000)["max_vars"] == 6
+    recommended = recommend_limits(estimate, 3, 6, 100)
+    assert (recommended["max_table"], recommended["max_vars"]) == (3, 3)
+    assert recommend_limits(estimate, 3, 6, 10) is None
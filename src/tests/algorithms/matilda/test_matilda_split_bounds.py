@@ -0,0 +1,69 @@
+from unittest.mock import Mock
+
+from algorithms.MATILDA.split_bounds import SplitBounds, below_thresholds, measure_upper_bound
+
+
+def make_bounds(row_counts, distinct_counts, max_frequencies=None):
+    statistics = Mock()
+    statistics.row_count.side_effect = lambda table: row_counts[table]
+    statistics.distinct_count.side_effect = lambda table, column: distinct_counts[(table, column)]
+    statistics.max_frequency.side_effect = lambda table, column: max_frequencies[(table, column)]
+    return SplitBounds(statistics, join_frequencies=max_frequencies is not None)
+
+
+def test_prediction_bound_uses_projected_distinct_counts():
+    bounds = make_bounds({"a": 100, "b": 50}, {("a", "x"): 4, ("b", "y"): 3})
+    join_conditions = [("a", 0, "x", "b", 0, "y")]
+
+    # Only the first attribute of each x-chain is projected.
+    assert bounds.prediction_upper_bound(join_conditions, [[("a", 0, "x"), ("b", 0, "y")]]) == 4
+    assert bounds.prediction_upper_bound(join_conditions, [[("a", 0, "x")], [("b", 0, "y")]]) == 12
+
+
+def test_prediction_bound_without_projection_counts_join_rows():
+    bounds = make_bounds({"a": 10, "b": 5}, {})
+    join_conditions = [("a", 0, "x", "b", 0, "y"), ("b", 0, "y", "a", 1, "x")]
+
+    assert bounds.prediction_upper_bound(join_conditions, []) == 10 * 5 * 10
+
+
+def test_join_frequencies_tighten_the_row_bound():
+    bounds = make_bounds({"a": 10, "b": 5}, {}, {("a", "x"): 2, ("b", "y"): 1})
+    join_conditions = [("a", 0, "x", "b", 0, "y")]
+
+    # Each row of b meets at most 2 rows of a, each row of a at most 1 row of b.
+    assert bounds.join_rows_upper_bound(join_conditions, {("a", 0), ("b", 0)}) == min(5 * 2, 10 * 1)
+    assert bounds.join_rows_upper_bound(join_conditions, {("a", 0), ("b", 0), ("a", 1)}) == 10 * 10
+
+
+def test_below_thresholds():
+    assert below_thresholds(2, 2, 0, min_support=3)
+    assert below_thresholds(5, 1, 0, min_confidence=2)
+    assert below_thresholds(1, 1, 1)
+    assert not below_thresholds(1, 1, 0)
+    assert not below_thresholds(3, 2, 2, min_support=3, min_confidence=2)
+
+
+def test_measure_bound_divides_by_the_side_count():
+    x_chains = [[("a", 0, "x"), ("b", 0, "y")]]
+
+    # A side counts every projected tuple of the prediction, so no measure exceeds 1.
+    assert measure_upper_bound(12, x_chains) == 1
+    assert measure_upper_bound(0, x_chains) == 0
+    assert below_thresholds(measure_upper_bound(12, x_chains), measure_upper_bound(12, x_chains), 0, min_support=1.5)
+    assert below_thresholds(measure_upper_bound(12, x_chains), measure_upper_bound(12, x_chains), 1)
+    # Without a projection only the side count of at least 1 bounds the ratio.
+    assert measure_upper_bound(12, []) == 12
+
+
+def test_splits_are_ordered_by_predicted_cost():
+    plan = Mock()
+    plan.split_queries.side_effect = lambda body, head: {"prediction": (sorted(body), None)}
+    costs = {("a",): 3.0, ("b",): 1.0, ("c",): 2.0}
+    bounds = SplitBounds(Mock(), query_cost=lambda join_conditions, count_over: costs[tuple(join_conditions)])
+    splits = [({"a"}, {"x"}), ({"b"}, {"x"}), ({"c"}, {"x"})]
+
+    assert bounds.order_splits(plan, splits) == [splits[1], splits[2], splits[0]]
+    # Without a trained model the order is kept.
+    untrained = SplitBounds(Mock(), query_cost=lambda join_conditions, count_over: None)
+    assert untrained.order_splits(plan, splits) == splits
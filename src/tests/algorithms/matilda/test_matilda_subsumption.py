@@ -0,0 +1,52 @@
+from algorithms.MATILDA.constraint_graph import IndexedAttribute, JoinableIndexedAttributes
+from algorithms.MATILDA.subsumption import SubsumptionIndex
+
+
+def jia(attr1, attr2):
+    return JoinableIndexedAttributes(IndexedAttribute(*attr1), IndexedAttribute(*attr2))
+
+
+# Head (0, 0) joined to the body (1, 0); (2, 0) and (3, 0) extend the body.
+HEAD_JOIN = jia((0, 0, 0), (1, 0, 0))
+BODY_JOIN = jia((1, 0, 1), (2, 0, 0))
+OTHER_BODY_JOIN = jia((1, 0, 2), (2, 0, 1))
+EXTRA_BODY_JOIN = jia((2, 0, 1), (3, 0, 0))
+
+
+def test_specializations_of_a_rule_of_support_one_are_subsumed():
+    index = SubsumptionIndex()
+    assert index.add([HEAD_JOIN, BODY_JOIN], {(1, 0), (2, 0)}, {(0, 0)}, support=1.0)
+
+    # The rule itself and a larger body over the same head.
+    assert index.subsumed([HEAD_JOIN, BODY_JOIN], {(1, 0), (2, 0)}, {(0, 0)})
+    assert index.subsumed(
+        [HEAD_JOIN, BODY_JOIN, EXTRA_BODY_JOIN], {(1, 0), (2, 0), (3, 0)}, {(0, 0)}
+    )
+    assert index.splits_skipped == 2
+
+    # Same occurrences joined differently, a smaller body, another head.
+    assert not index.subsumed([HEAD_JOIN, OTHER_BODY_JOIN], {(1, 0), (2, 0)}, {(0, 0)})
+    assert not index.subsumed([HEAD_JOIN], {(1, 0)}, {(0, 0)})
+    assert not index.subsumed([HEAD_JOIN, BODY_JOIN], {(0, 0), (2, 0)}, {(1, 0)})
+    # A head joined to the extra occurrence is not implied.
+    assert not index.subsumed(
+        [HEAD_JOIN, BODY_JOIN, jia((0, 0, 1), (3, 0, 0))], {(1, 0), (2, 0), (3, 0)}, {(0, 0)}
+    )
+
+
+def test_only_exact_rules_of_support_one_are_indexed():
+    index = SubsumptionIndex()
+    assert not index.add([HEAD_JOIN], {(1, 0)}, {(0, 0)}, support=0.9)
+    assert not index.add([HEAD_JOIN], {(1, 0)}, {(0, 0)}, support=1.0, exact=False)
+    assert len(index) == 0
+    assert not index.subsumed([HEAD_JOIN, BODY_JOIN], {(1, 0), (2, 0)}, {(0, 0)})
+
+
+def test_restored_state_subsumes_the_same_splits():
+    index = SubsumptionIndex()
+    index.add([HEAD_JOIN], {(1, 0)}, {(0, 0)}, support=1.0)
+    restored = SubsumptionIndex()
+    restored.restore(index.state())
+
+    assert len(restored) == 1
+    assert restored.subsumed([HEAD_JOIN, BODY_JOIN], {(1, 0), (2, 0)}, {(0, 0)})
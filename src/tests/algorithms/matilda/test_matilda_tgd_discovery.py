@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import copy
 from unittest.mock import Mock
@@ -9,6 +10,7 @@ from algorithms.MATILDA.constraint_graph import (
 )
 from database.alchemy_utility import AlchemyUtility
 from algorithms.MATILDA.candidate_rule_chains import CandidateRuleChains
+from algorithms.MATILDA.split_bounds import SplitBounds
 from algorithms.MATILDA.tgd_discovery import *
 
 @pytest.fixture
@@ -20,6 +22,7 @@ def mock_db_inspector():
     inspector.get_attribute_names.side_effect = lambda table: [0, 1]
     inspector.check_threshold.return_value = True
     inspector.get_join_row_count.return_value = 10
+    inspector.count_up_to.side_effect = lambda join_conditions, n, **kwargs: min(10, n)
     return inspector
 
 @pytest.fixture
@@ -107,6 +110,127 @@ def test_split_pruning(mock_mapper, mock_db_inspector):
     assert isinstance(support, (float, int)) and support >= 0, "Support should be non-negative."
     assert isinstance(confidence, (float, int)) and confidence >= 0, "Confidence should be non-negative."
 
+def test_split_pruning_async_matches_split_pruning(mock_mapper, mock_db_inspector):
+    mock_db_inspector.get_join_row_count_async.return_value = 10
+    candidate_rule = [
+        JoinableIndexedAttributes(
+            IndexedAttribute(0, 0, 0), IndexedAttribute(1, 0, 1)
+        )
+    ]
+    body = {(0, 0)}
+    head = {(1, 0)}
+    expected = split_pruning(candidate_rule, body, head, mock_db_inspector, mock_mapper)
+    result = asyncio.run(split_pruning_async(candidate_rule, body, head, mock_db_inspector, mock_mapper))
+    assert result == expected
+    # Prediction, support and confidence counts are all sent in one batch.
+    assert mock_db_inspector.get_join_row_count_async.await_count == 3
+
+def test_split_pruning_skips_queries_below_statistics_bound(mock_mapper, mock_db_inspector):
+    statistics = Mock()
+    statistics.row_count.return_value = 100
+    statistics.distinct_count.return_value = 2
+    bounds = SplitBounds(statistics)
+    candidate_rule = [
+        JoinableIndexedAttributes(
+            IndexedAttribute(0, 0, 0), IndexedAttribute(1, 0, 1)
+        )
+    ]
+    body = {(0, 0)}
+    head = {(1, 0)}
+
+    # At most 2 distinct projected values: support and confidence cannot reach 3.
+    result = split_pruning(candidate_rule, body, head, mock_db_inspector, mock_mapper,
+                           min_support=3, bounds=bounds)
+    assert result == (False, 0, 0)
+    mock_db_inspector.check_threshold.assert_not_called()
+    mock_db_inspector.get_join_row_count.assert_not_called()
+    assert bounds.splits_pruned == 1
+    assert bounds.queries_avoided == 6
+
+    # A reachable threshold runs the queries and keeps the default result.
+    expected = split_pruning(candidate_rule, body, head, mock_db_inspector, mock_mapper)
+    assert split_pruning(candidate_rule, body, head, mock_db_inspector, mock_mapper,
+                         min_support=1, bounds=bounds) == expected
+    assert bounds.queries_avoided == 6
+
+
+def test_split_pruning_counts_up_to_the_threshold(mock_mapper, mock_db_inspector):
+    candidate_rule = [
+        JoinableIndexedAttributes(
+            IndexedAttribute(0, 0, 0), IndexedAttribute(1, 0, 1)
+        )
+    ]
+    body = {(0, 0)}
+    head = {(1, 0)}
+
+    # 10 predicted tuples: a confidence of 0.5 needs at most 20 head tuples, so the
+    # head is counted up to 21 and the split is rejected once 21 are found.
+    mock_db_inspector.count_up_to.side_effect = lambda join_conditions, n, **kwargs: n
+    result, _, _ = split_pruning(candidate_rule, body, head, mock_db_inspector, mock_mapper,
+                                 min_confidence=0.5)
+    assert not result
+    assert [call.args[1] for call in mock_db_inspector.count_up_to.call_args_list] == [21]
+
+    # No measure exceeds 1, so a confidence of 2 is ruled out once the prediction is counted.
+    mock_db_inspector.count_up_to.reset_mock()
+    result, _, _ = split_pruning(candidate_rule, body, head, mock_db_inspector, mock_mapper,
+                                 min_confidence=2)
+    assert not result
+    assert not mock_db_inspector.count_up_to.called
+
+
+def test_sampled_split_pruning_verifies_instead_of_rejecting(mock_mapper, mock_db_inspector):
+    candidate_rule = [
+        JoinableIndexedAttributes(
+            IndexedAttribute(0, 0, 0), IndexedAttribute(1, 0, 1)
+        )
+    ]
+    sampler = SplitSampler(0.5)
+    # The sample finds almost no predicted tuple, but the exact counts pass.
+    mock_db_inspector.get_sampled_row_count.side_effect = [0, 5, 5]
+
+    keep, support, confidence, exact = split_pruning_sampled(
+        candidate_rule, {(0, 0)}, {(1, 0)}, mock_db_inspector, mock_mapper, sampler, min_confidence=0.5
+    )
+    assert keep and exact
+    assert (support, confidence) == (1, 1)
+    assert sampler.verified == 1 and sampler.accepted == 0
+
+
+def test_prune_sparse_nodes_counts_each_join_once(mock_mapper):
+    statistics = Mock()
+    statistics.join_row_count.side_effect = (
+        lambda table1, attribute1, table2, attribute2, same_row, limit: 0 if same_row else 5
+    )
+    across = JoinableIndexedAttributes(IndexedAttribute(0, 0, 0), IndexedAttribute(0, 1, 0))
+    across_again = JoinableIndexedAttributes(IndexedAttribute(0, 1, 0), IndexedAttribute(0, 2, 0))
+    same_row = JoinableIndexedAttributes(IndexedAttribute(0, 0, 0), IndexedAttribute(0, 0, 0))
+
+    kept = prune_sparse_nodes([across, same_row, across_again], mock_mapper, statistics)
+    assert kept == [across, across_again]
+    assert statistics.join_row_count.call_count == 2
+
+    assert prune_sparse_nodes([across, same_row], mock_mapper, statistics, min_rows=6) == []
+
+
+def test_split_candidate_rule_enumerates_heads_up_to_the_size_limit():
+    candidate_rule = [
+        JoinableIndexedAttributes(IndexedAttribute(0, 0, 0), IndexedAttribute(1, 0, 1)),
+        JoinableIndexedAttributes(IndexedAttribute(1, 0, 1), IndexedAttribute(0, 1, 0)),
+    ]
+    occurrences = {(0, 0), (0, 1), (1, 0)}
+
+    splits = split_candidate_rule(candidate_rule)
+    assert splits == {
+        (frozenset(occurrences - {head}), frozenset({head})) for head in occurrences
+    }
+
+    pairs = split_candidate_rule(candidate_rule, max_head_size=2)
+    assert len(pairs) == 6 and splits < pairs
+    assert all(len(head) <= 2 and body == frozenset(occurrences - head) for body, head in pairs)
+    assert (frozenset(), frozenset(occurrences)) in split_candidate_rule(candidate_rule, max_head_size=None)
+
+
 
 # Additional helper tests
 def test_duplicate_test():
@@ -0,0 +1,47 @@
+import pytest
+
+from algorithms.MATILDA.top_k import TopKRules
+
+
+def test_threshold_is_none_until_full():
+    top_rules = TopKRules(2)
+    assert top_rules.threshold is None
+    top_rules.push(0.5, "a")
+    assert top_rules.threshold is None
+    top_rules.push(0.7, "b")
+    assert top_rules.threshold == 0.5
+
+
+def test_keeps_best_rules_first_discovered_on_ties():
+    top_rules = TopKRules(3)
+    for score, rule in [(0.5, "a"), (0.9, "b"), (0.5, "c"), (0.7, "d"), (0.9, "e"), (0.7, "f")]:
+        top_rules.push(score, rule)
+
+    assert top_rules.rules() == ["b", "e", "d"]
+    assert top_rules.threshold == 0.7
+
+
+def test_rule_equal_to_threshold_is_rejected():
+    top_rules = TopKRules(1)
+    assert top_rules.push(1.0, "a")
+    assert not top_rules.push(1.0, "b")
+    assert top_rules.push(2.0, "c")
+    assert top_rules.rules() == ["c"]
+
+
+def test_k_must_be_positive():
+    with pytest.raises(ValueError):
+        TopKRules(0)
+
+
+def test_restored_state_keeps_ranking_and_ties():
+    top_rules = TopKRules(2)
+    for score, rule in [(0.5, "a"), (0.9, "b")]:
+        top_rules.push(score, rule)
+    restored = TopKRules(2)
+    restored.restore(top_rules.state())
+
+    for rules in (top_rules, restored):
+        rules.push(0.9, "c")
+        rules.push(0.7, "d")
+    assert restored.rules() == top_rules.rules() == ["b", "c"]
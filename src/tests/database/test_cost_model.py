@@ -0,0 +1,60 @@
+import logging
+
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine
+
+from database.cost_model import MIN_OBSERVATIONS, CostModel
+from database.query_utility import QueryUtility
+
+ROWS = {"small": 10, "large": 100000}
+
+
+def plan_key(table, occurrences, kind="count"):
+    conditions = tuple((table, j, "a", table, j + 1, "a") for j in range(occurrences - 1))
+    return kind, conditions, False, None, False
+
+
+def test_learns_that_larger_joins_are_slower(tmp_path):
+    model = CostModel(ROWS.get)
+    assert model.predict_latency(plan_key("large", 2)) is None
+    for _ in range(MIN_OBSERVATIONS):
+        model.observe(plan_key("small", 2), 0.001, 10)
+        model.observe(plan_key("large", 2), 0.1, 100000)
+        model.observe(plan_key("large", 3), 1.0, 1000000)
+
+    assert model.trained
+    small, large, larger = (model.predict_latency(plan_key(*shape)) for shape in
+                            (("small", 2), ("large", 2), ("large", 3)))
+    assert small < large < larger
+    assert abs(model.predict_rows(plan_key("large", 2)) - 100000) / 100000 < 0.1
+
+    path = tmp_path / "models.json"
+    model.save(path, "data.db")
+    reloaded = CostModel(ROWS.get)
+    assert not reloaded.load(path, "other.db")
+    assert reloaded.load(path, "data.db")
+    assert reloaded.predict_latency(plan_key("large", 2)) == model.predict_latency(plan_key("large", 2))
+
+
+def test_query_utility_observes_executed_counts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'data.db'}")
+    metadata = MetaData()
+    table = Table("t", metadata, Column("id", Integer, primary_key=True), Column("a", Integer))
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{"id": i, "a": i % 3} for i in range(30)])
+    utility = QueryUtility(engine, metadata, logging.getLogger("t_time"), logging.getLogger("t_results"))
+    path = tmp_path / "models.json"
+    assert utility.enable_cost_model(path)
+
+    join_conditions = [("t", 0, "a", "t", 1, "a")]
+    for _ in range(MIN_OBSERVATIONS):
+        utility.get_join_row_count(join_conditions)
+    assert utility.cost_model.latency.observations == MIN_OBSERVATIONS
+    assert utility.estimate_query_cost(join_conditions) >= 0
+    utility.save_cost_model()
+    utility.close()
+
+    reopened = QueryUtility(engine, metadata, logging.getLogger("t_time"), logging.getLogger("t_results"))
+    reopened.enable_cost_model(path)
+    assert reopened.cost_model.trained
+    reopened.close()
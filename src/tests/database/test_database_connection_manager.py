@@ -73,3 +73,41 @@ def test_database_connection_manager_close(mock_create_engine, mock_metadata):
         # Check that manager's engine and conn are set to None
         assert manager.conn is None
         assert manager.engine is None
+
+
+def test_pragma_profile_applied_to_pooled_connections(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'pragma.db'}"
+    manager = DatabaseConnectionManager(db_url, pragma_profile="low_memory")
+    try:
+        # A second pooled connection must get the profile too, not only manager.conn.
+        raw = manager.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            assert cursor.execute("PRAGMA cache_size").fetchone()[0] == -16000
+            assert cursor.execute("PRAGMA temp_store").fetchone()[0] == 1
+            cursor.close()
+        finally:
+            raw.close()
+    finally:
+        manager.close()
+
+
+def test_read_only_profile_allows_temporary_tables(tmp_path):
+    manager = DatabaseConnectionManager(f"sqlite:///{tmp_path / 'read_only.db'}", pragma_profile="read_only")
+    try:
+        raw = manager.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            # Materialized paths are temporary tables.
+            cursor.execute("CREATE TEMP TABLE matilda_path_1 AS SELECT 1 AS x")
+            assert cursor.execute("SELECT count(*) FROM matilda_path_1").fetchone()[0] == 1
+            cursor.close()
+        finally:
+            raw.close()
+    finally:
+        manager.close()
+
+
+def test_unknown_pragma_profile_raises(mock_create_engine, mock_metadata):
+    with pytest.raises(ValueError):
+        DatabaseConnectionManager("sqlite:///:memory:", pragma_profile="missing")
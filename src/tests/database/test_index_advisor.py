@@ -0,0 +1,17 @@
+from database.index_advisor import IndexAdvisor
+
+
+def test_recommends_covering_indexes_for_hot_access_paths():
+    advisor = IndexAdvisor()
+    join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+    count_over = [[("posts", 0, "post_id")]]
+    for _ in range(3):
+        advisor.record(("count", 1), join_conditions, count_over, statement="hot")
+    advisor.record(("count", 2), [("users", 0, "name", "users", 1, "name")], statement="cold")
+
+    assert advisor.recommend(2) == [("users", ("id",)), ("posts", ("user_id", "post_id"))]
+    # A path already served by the leading columns of an index is skipped.
+    assert advisor.recommend(1, existing={"users": [("id", "name")]}) == [
+        ("posts", ("user_id", "post_id"))
+    ]
+    assert advisor.hottest_statements(1) == ["hot"]
@@ -77,3 +77,24 @@ def test_create_composed_indexes(setup_index_manager):
 
     # Also check that commit was called twice (once for each created index)
     assert conn.commit.call_count == 2
+
+def test_create_covering_indexes(setup_index_manager):
+    index_manager, conn, metadata = setup_index_manager
+
+    index_manager.create_covering_indexes([("table1", ("age", "id", "name")), ("table2", ("value",))])
+
+    expected_statements = [
+        'CREATE INDEX IF NOT EXISTS "idx_table1_age_id_name" ON "table1" ("age", "id", "name");',
+        'CREATE INDEX IF NOT EXISTS "idx_table2_value" ON "table2" ("value");',
+        'ANALYZE;',
+    ]
+    assert [str(call_args[0]) for call_args, _ in conn.execute.call_args_list] == expected_statements
+
+def test_create_covering_indexes_quotes_identifiers(setup_index_manager):
+    index_manager, conn, metadata = setup_index_manager
+
+    index_manager.create_covering_indexes([("order", ("group", 'odd "name'))])
+
+    assert str(conn.execute.call_args_list[0][0][0]) == (
+        'CREATE INDEX IF NOT EXISTS "idx_order_group_odd ""name" ON "order" ("group", "odd ""name");'
+    )
@@ -1,12 +1,22 @@
+import time
+
 import pytest
 from unittest.mock import MagicMock, patch
-from sqlalchemy import MetaData, Table, Column, Integer, String, create_engine
+from sqlalchemy import MetaData, Table, Column, Integer, String, URL, create_engine
 from sqlalchemy.sql import text, and_
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import func, select
 from typing import List, Tuple
 
-from database.query_utility import QueryUtility
+from database.statistics_catalog import StatisticsCatalog
+from database.query_utility import (
+    SAMPLE_BUCKETS,
+    STATEMENT_CACHE_ENTRY_BYTES,
+    QueryBudgetExceeded,
+    QueryUtility,
+    _sample_bucket,
+)
+from utils.memory_budget import MemoryBudget
 
 @pytest.fixture
 def mock_logger():
@@ -175,3 +185,443 @@ def test_count_over_clause(query_utility, mock_engine):
     )
     assert result == 10
     assert conn.execute.called
+
+@pytest.fixture
+def sqlite_query_utility(mock_logger):
+    """QueryUtility over a real in-memory SQLite database."""
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    users = Table('users', metadata,
+                  Column('id', Integer, primary_key=True),
+                  Column('name', String))
+    posts = Table('posts', metadata,
+                  Column('post_id', Integer, primary_key=True),
+                  Column('user_id', Integer))
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(users.insert(), [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}, {"id": 3, "name": "c"}])
+        conn.execute(posts.insert(), [{"post_id": 10, "user_id": 1}, {"post_id": 11, "user_id": 1},
+                                      {"post_id": 12, "user_id": 2}])
+    logger_query_time, logger_query_results = mock_logger
+    utility = QueryUtility(engine, metadata, logger_query_time, logger_query_results)
+    yield utility
+    utility.close()
+
+def test_statement_cache_reuses_compiled_sql(sqlite_query_utility):
+    join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+    count_over = [[("users", 0, "id"), ("posts", 0, "user_id")]]
+
+    assert sqlite_query_utility.get_join_row_count(join_conditions, count_over=count_over) == 2
+    assert sqlite_query_utility.get_join_row_count(join_conditions * 2, count_over=count_over) == 2
+    assert sqlite_query_utility.cache_misses == 1
+    assert sqlite_query_utility.cache_hits == 1
+
+def test_statement_cache_key_normalizes_orientation_and_keeps_distinct(sqlite_query_utility):
+    count_over = [[("users", 0, "id")]]
+
+    assert sqlite_query_utility.get_join_row_count(
+        [("users", 0, "id", "posts", 0, "user_id")], count_over=count_over
+    ) == 2
+    assert sqlite_query_utility.get_join_row_count(
+        [("posts", 0, "user_id", "users", 0, "id")], count_over=count_over
+    ) == 2
+    assert sqlite_query_utility.cache_hits == 1
+    sqlite_query_utility.get_join_row_count(
+        [("users", 0, "id", "posts", 0, "user_id")], distinct=True, count_over=count_over
+    )
+    assert sqlite_query_utility.cache_misses == 2
+
+def test_threshold_is_a_statement_parameter(sqlite_query_utility):
+    join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+    count_over = [[("users", 0, "id")]]
+
+    # The threshold query counts the rows of the join (three posts by known users).
+    assert sqlite_query_utility.check_threshold(join_conditions, count_over=count_over, threshold=2) == 1
+    assert sqlite_query_utility.check_threshold(join_conditions, count_over=count_over, threshold=3) == 0
+    assert len(sqlite_query_utility._statement_cache) == 1
+
+def test_join_order_does_not_drop_conditions(sqlite_query_utility):
+    # The second condition does not touch the first one; it must be joined once
+    # the third condition has brought its aliases into the join.
+    join_conditions = [
+        ("users", 0, "id", "posts", 0, "user_id"),
+        ("users", 1, "id", "posts", 1, "user_id"),
+        ("posts", 0, "user_id", "users", 1, "id"),
+    ]
+    query, _, _ = sqlite_query_utility._construct_count_query(join_conditions, False, False, None)
+    assert "posts AS posts_1" in str(query)
+
+def test_incremental_materialization_matches_regular_counts(sqlite_query_utility):
+    parent = [("users", 0, "id", "posts", 0, "user_id")]
+    child = parent + [("posts", 0, "user_id", "users", 1, "id")]
+    count_over = [[("users", 0, "name")], [("posts", 0, "post_id")]]
+    expected = [
+        sqlite_query_utility.get_join_row_count(path, count_over=count_over) for path in (parent, child)
+    ]
+
+    sqlite_query_utility.enable_incremental_materialization(row_budget=100)
+    for path, count in zip((parent, child), expected):
+        assert sqlite_query_utility.get_join_row_count(path, count_over=count_over, materialize=True) == count
+        assert sqlite_query_utility.check_threshold(path, threshold=2, materialize=True) == 1
+    # The child join was built from the parent's materialization, then reused.
+    assert sqlite_query_utility.materialization_builds == 2
+    assert sqlite_query_utility.materialization_hits == 2
+
+    sqlite_query_utility.release_materialization(child)
+    sqlite_query_utility.release_materialization(parent)
+    cursor = sqlite_query_utility._get_raw_cursor()
+    assert cursor.execute("SELECT count(*) FROM sqlite_temp_master").fetchone()[0] == 0
+
+def test_materialized_count_keeps_reversed_conditions_on_their_columns(mock_logger):
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    a = Table('a', metadata, Column('id', Integer, primary_key=True), Column('x', Integer))
+    b = Table('b', metadata, Column('id', Integer, primary_key=True), Column('x', Integer))
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(a.insert(), [{"id": 1, "x": 10}, {"id": 2, "x": 20}, {"id": 3, "x": 30}])
+        conn.execute(b.insert(), [{"id": 10, "x": 5}, {"id": 20, "x": 6}])
+    utility = QueryUtility(engine, metadata, *mock_logger)
+    # Written larger occurrence first: b.id = a.x, while b.x = a.id would also resolve.
+    path = [("b", 1, "id", "a", 0, "x")]
+    count_over = [[("a", 0, "id")]]
+    try:
+        assert utility.get_join_row_count(path, count_over=count_over) == 2
+        utility.enable_incremental_materialization(row_budget=100)
+        assert utility.get_join_row_count(path, count_over=count_over, materialize=True) == 2
+        assert utility.materialization_builds == 1
+    finally:
+        utility.close()
+
+def test_oversized_join_is_not_materialized(sqlite_query_utility):
+    sqlite_query_utility.enable_incremental_materialization(row_budget=2)
+    path = [("users", 0, "id", "posts", 0, "user_id")]
+    # Three rows: the probe gives up before any temporary table is created.
+    assert sqlite_query_utility.get_join_row_count(path, materialize=True) == 3
+    assert sqlite_query_utility.materialization_builds == 0
+    cursor = sqlite_query_utility._get_raw_cursor()
+    assert cursor.execute("SELECT count(*) FROM sqlite_temp_master").fetchone()[0] == 0
+
+def test_materialized_counts_are_counted_as_executed(sqlite_query_utility):
+    sqlite_query_utility.enable_incremental_materialization(row_budget=100)
+    path = [("users", 0, "id", "posts", 0, "user_id")]
+    count_over = [[("posts", 0, "post_id")]]
+
+    assert sqlite_query_utility.get_join_row_count(path, count_over=count_over, materialize=True) == 3
+    # The probe, the build and its row count, then the count over the materialization.
+    assert sqlite_query_utility.queries_executed == 4
+    assert sqlite_query_utility.get_join_row_count(path, count_over=count_over, materialize=True) == 3
+    assert sqlite_query_utility.queries_executed == 5
+
+def test_memory_budget_evicts_caches_and_materializations(sqlite_query_utility):
+    budget = MemoryBudget(1, track_rss=False)
+    sqlite_query_utility.enable_memory_budget(budget)
+    sqlite_query_utility.enable_incremental_materialization(row_budget=100)
+    path = [("users", 0, "id", "posts", 0, "user_id")]
+    count_over = [[("posts", 0, "post_id")]]
+    # A plain count fills the statement cache, a materialized one the materializations.
+    assert sqlite_query_utility.get_join_row_count(path, count_over=count_over) == 3
+    assert sqlite_query_utility.get_join_row_count(path, count_over=count_over, materialize=True) == 3
+    usage = budget.usage()
+    assert usage["statement_cache"] > 0 and usage["materializations"] > 0
+
+    assert budget.check() > 0
+    assert budget.usage() == {"result_cache": 0, "statement_cache": 0, "materializations": 0}
+    cursor = sqlite_query_utility._get_raw_cursor()
+    assert cursor.execute("SELECT count(*) FROM sqlite_temp_master").fetchone()[0] == 0
+    # Evicted entries are rebuilt on demand.
+    assert sqlite_query_utility.get_join_row_count(path, count_over=count_over, materialize=True) == 3
+
+def test_statement_cache_evicts_the_least_recently_used(sqlite_query_utility):
+    first = [("users", 0, "id", "posts", 0, "user_id")]
+    second = [("users", 0, "id", "posts", 0, "post_id")]
+    sqlite_query_utility.get_join_row_count(first)
+    sqlite_query_utility.get_join_row_count(second)
+    # A hit makes the first statement the most recently used.
+    sqlite_query_utility.get_join_row_count(first)
+
+    sqlite_query_utility._evict_statements(STATEMENT_CACHE_ENTRY_BYTES)
+    sqlite_query_utility.get_join_row_count(first)
+    assert sqlite_query_utility.cache_misses == 2
+    sqlite_query_utility.get_join_row_count(second)
+    assert sqlite_query_utility.cache_misses == 3
+
+def test_statistics_statements_are_kept_least_recently_used(sqlite_query_utility):
+    sqlite_query_utility.get_table_row_count("users")
+    sqlite_query_utility.get_join_row_count([("users", 0, "id", "posts", 0, "user_id")])
+    # Reusing the row count statement makes the count statement the oldest.
+    sqlite_query_utility.get_table_row_count("users")
+
+    sqlite_query_utility._evict_statements(STATEMENT_CACHE_ENTRY_BYTES)
+    assert list(sqlite_query_utility._statement_cache) == [("row_count", "users")]
+
+def test_acyclic_count_uses_semijoin_reduction(sqlite_query_utility):
+    join_conditions = [
+        ("users", 0, "id", "posts", 0, "user_id"),
+        ("posts", 0, "user_id", "users", 1, "id"),
+    ]
+    count_over = [[("users", 0, "name")], [("users", 1, "id")]]
+    query = sqlite_query_utility._construct_acyclic_count_query(join_conditions, count_over)
+    assert query is not None
+    assert "WITH" in str(query)
+
+    expected = sqlite_query_utility.get_join_row_count(join_conditions, count_over=count_over)
+    sqlite_query_utility.semijoin_reduction = False
+    sqlite_query_utility._statement_cache.clear()
+    assert sqlite_query_utility.get_join_row_count(join_conditions, count_over=count_over) == expected == 2
+
+def test_cyclic_count_keeps_flat_plan(sqlite_query_utility):
+    join_conditions = [
+        ("users", 0, "id", "posts", 0, "user_id"),
+        ("posts", 0, "user_id", "users", 1, "id"),
+        ("users", 0, "id", "users", 1, "id"),
+    ]
+    count_over = [[("users", 0, "name")]]
+    assert sqlite_query_utility._construct_acyclic_count_query(join_conditions, count_over) is None
+    assert sqlite_query_utility.get_join_row_count(join_conditions, count_over=count_over) == 2
+
+def test_async_count_matches_sync_count(mock_logger, tmp_path):
+    import asyncio
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    db_path = tmp_path / "async.db"
+    engine = create_engine(f"sqlite:///{db_path}")
+    metadata = MetaData()
+    users = Table('users', metadata, Column('id', Integer, primary_key=True), Column('name', String))
+    posts = Table('posts', metadata, Column('post_id', Integer, primary_key=True), Column('user_id', Integer))
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(users.insert(), [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}])
+        conn.execute(posts.insert(), [{"post_id": 10, "user_id": 1}, {"post_id": 11, "user_id": 2}])
+    logger_query_time, logger_query_results = mock_logger
+    utility = QueryUtility(engine, metadata, logger_query_time, logger_query_results)
+    join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+    count_over = [[("users", 0, "name")]]
+
+    async def count():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        try:
+            return await asyncio.gather(*[
+                utility.get_join_row_count_async(async_engine, join_conditions, count_over=count_over)
+                for _ in range(3)
+            ])
+        finally:
+            await async_engine.dispose()
+
+    try:
+        assert asyncio.run(count()) == [utility.get_join_row_count(join_conditions, count_over=count_over)] * 3 == [2] * 3
+    finally:
+        utility.close()
+        engine.dispose()
+
+@pytest.mark.parametrize("semijoin_reduction", [True, False])
+def test_bounded_count_stops_at_limit(sqlite_query_utility, semijoin_reduction):
+    sqlite_query_utility.semijoin_reduction = semijoin_reduction
+    join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+    count_over = [[("posts", 0, "post_id")]]
+
+    assert sqlite_query_utility.get_join_row_count(join_conditions, count_over=count_over) == 3
+    assert sqlite_query_utility.get_join_row_count(join_conditions, count_over=count_over, limit=2) == 2
+    assert sqlite_query_utility.get_join_row_count(join_conditions, count_over=count_over, limit=5) == 3
+
+def test_table_statistics(sqlite_query_utility):
+    with sqlite_query_utility.engine.begin() as conn:
+        conn.execute(text("INSERT INTO posts (post_id, user_id) VALUES (13, NULL)"))
+
+    assert sqlite_query_utility.get_table_row_count("posts") == 4
+    # NULL counts as one value, as in the DISTINCT projections of count queries.
+    assert sqlite_query_utility.get_column_distinct_count("posts", "user_id") == 3
+    assert sqlite_query_utility.get_column_distinct_count("posts", "missing") == 0
+    assert sqlite_query_utility.get_table_row_count("missing") == 0
+
+def test_join_row_count_is_cached(sqlite_query_utility):
+    catalog = StatisticsCatalog(sqlite_query_utility)
+
+    assert catalog.join_row_count("users", "id", "posts", "user_id") == 3
+    assert catalog.join_row_count("users", "id", "posts", "user_id", limit=1) == 1
+    assert catalog.join_row_count("users", "id", "users", "id", same_row=True) == 3
+    with sqlite_query_utility.engine.begin() as conn:
+        conn.execute(text("DELETE FROM posts"))
+    assert catalog.join_row_count("users", "id", "posts", "user_id") == 3
+    catalog.clear()
+    assert catalog.join_row_count("users", "id", "posts", "user_id") == 0
+
+def test_collected_statistics_estimate_joins(sqlite_query_utility, tmp_path):
+    catalog = StatisticsCatalog(sqlite_query_utility)
+    catalog.collect(["users", "posts"], top_k=1, histogram_buckets=2)
+
+    posts = catalog.column_statistics("posts", "user_id")
+    assert (posts.distinct_count, posts.null_fraction, posts.most_common) == (2, 0.0, [(1, 2)])
+    assert posts.histogram == [1, 1, 2]
+    assert catalog.row_count("users") == 3
+    assert catalog.max_frequency("posts", "user_id") == 2
+    assert catalog.fraction_below("users", "id", 0) == 0.0
+    assert catalog.fraction_below("users", "id", 3) == 1.0
+    # Matches the exact join size on this uniform data.
+    assert catalog.join_size_estimate("users", "id", "posts", "user_id") == 3
+    # Post ids never fall in the range of user ids.
+    assert catalog.join_size_estimate("users", "id", "posts", "post_id") == 0
+
+    path = str(tmp_path / "statistics.json")
+    catalog.save(path, "v1")
+    loaded = StatisticsCatalog(sqlite_query_utility)
+    assert not loaded.load(path, "v2")
+    assert loaded.load(path, "v1")
+    assert loaded.column_statistics("posts", "user_id") == posts
+    assert loaded.distinct_count("posts", "user_id") == 2
+
+
+def test_count_up_to_stops_at_n(sqlite_query_utility):
+    join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+    count_over = [[("users", 0, "id")]]
+
+    # Three joined rows, two distinct users.
+    assert sqlite_query_utility.count_up_to(join_conditions, 2) == 2
+    assert sqlite_query_utility.count_up_to(join_conditions, 10) == 3
+    assert sqlite_query_utility.count_up_to(join_conditions, 1, count_over=count_over) == 1
+    assert sqlite_query_utility.count_up_to(join_conditions, 10, count_over=count_over) == 2
+    statement = sqlite_query_utility._get_compiled_statement("threshold", join_conditions, False, False, None)
+    assert "LIMIT" in statement.sql
+
+def test_sampled_count_keeps_joined_values_together(sqlite_query_utility):
+    join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+    count_over = [[("users", 0, "id"), ("posts", 0, "user_id")]]
+
+    assert sqlite_query_utility.get_sampled_row_count(
+        join_conditions, SAMPLE_BUCKETS, count_over=count_over
+    ) == 2
+    assert sqlite_query_utility.get_sampled_row_count(join_conditions, 0, count_over=count_over) == 0
+    # A joined user is counted iff the bucket of its id is sampled.
+    buckets = _sample_bucket(1) + 1
+    expected = sum(_sample_bucket(user_id) < buckets for user_id in (1, 2))
+    assert sqlite_query_utility.get_sampled_row_count(
+        join_conditions, buckets, count_over=count_over
+    ) == expected
+    assert sqlite_query_utility.get_sampled_row_count(join_conditions, 1) is None
+
+def test_sampled_count_hashes_the_projected_tuple(sqlite_query_utility):
+    join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+    count_over = [[("users", 0, "id")], [("posts", 0, "post_id")]]
+    tuples = [(1, 10), (1, 11), (2, 12)]
+
+    assert _sample_bucket(1) == _sample_bucket(*[1])
+    assert _sample_bucket(1, None) is None
+    # Each projected tuple is sampled on its own, not with the tuples sharing its first value.
+    for buckets in sorted({_sample_bucket(*values) + 1 for values in tuples}):
+        expected = sum(_sample_bucket(*values) < buckets for values in tuples)
+        assert sqlite_query_utility.get_sampled_row_count(
+            join_conditions, buckets, count_over=count_over
+        ) == expected
+
+def test_query_budget_interrupts_and_resets(sqlite_query_utility):
+    join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+    sqlite_query_utility.set_query_budget(steps=1)
+
+    with pytest.raises(QueryBudgetExceeded) as error:
+        sqlite_query_utility.get_join_row_count(join_conditions)
+    assert error.value.reason == "steps"
+
+    sqlite_query_utility.set_query_budget()
+    assert sqlite_query_utility.get_join_row_count(join_conditions) == 3
+
+def test_run_deadline_interrupts_queries(sqlite_query_utility, monkeypatch):
+    monkeypatch.setattr("database.query_utility.PROGRESS_HANDLER_STEPS", 1)
+    join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+    sqlite_query_utility.set_run_deadline(time.monotonic() - 1)
+
+    with pytest.raises(QueryBudgetExceeded) as error:
+        sqlite_query_utility.get_join_row_count(join_conditions)
+    assert error.value.reason == "deadline"
+
+    sqlite_query_utility.set_run_deadline(None)
+    assert sqlite_query_utility.get_join_row_count(join_conditions) == 3
+    assert sqlite_query_utility.queries_executed == 2
+
+def test_partitioned_count_matches_the_plain_count(tmp_path, mock_logger):
+    # Workers open the file through a URI, so its path must be percent-encoded.
+    directory = tmp_path / "odd #name%"
+    directory.mkdir()
+    engine = create_engine(URL.create("sqlite", database=str(directory / "partitions.db")))
+    metadata = MetaData()
+    users = Table('users', metadata, Column('id', Integer, primary_key=True), Column('name', String))
+    posts = Table('posts', metadata, Column('post_id', Integer, primary_key=True), Column('user_id', Integer))
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(users.insert(), [{"id": i, "name": str(i % 7)} for i in range(200)])
+        conn.execute(posts.insert(), [{"post_id": i, "user_id": i % 150} for i in range(500)])
+    utility = QueryUtility(engine, metadata, *mock_logger)
+    join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+    count_over = [[("users", 0, "name")]]
+    try:
+        for projection in (None, count_over):
+            expected = utility.get_join_row_count(join_conditions, count_over=projection)
+            assert utility.get_partitioned_row_count(join_conditions, 3, count_over=projection) == expected
+
+        row_counts = []
+        utility.enable_partitioned_counting(
+            3, min_rows=500, row_count=lambda table: row_counts.append(table) or utility.get_table_row_count(table)
+        )
+        executed = utility.queries_executed
+        assert utility.get_join_row_count(join_conditions) == 500
+        assert utility.partitioned_counts == 3
+        # One statement per partition, besides the row counts of the partitioning decision.
+        assert utility.queries_executed - executed == 3 + len(row_counts)
+        # The decision is taken once per set of joined tables.
+        looked_up = len(row_counts)
+        assert utility.get_join_row_count(join_conditions, distinct=True) == 500
+        assert utility.partitioned_counts == 4
+        assert len(row_counts) == looked_up
+    finally:
+        utility.close()
+
+    assert QueryUtility(create_engine("sqlite://"), metadata, *mock_logger).get_partitioned_row_count(
+        join_conditions, 3
+    ) is None
+
+def test_result_cache_serves_repeated_counts(tmp_path, mock_logger):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cached.db'}")
+    metadata = MetaData()
+    Table('users', metadata, Column('id', Integer, primary_key=True))
+    Table('posts', metadata, Column('post_id', Integer, primary_key=True), Column('user_id', Integer))
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id) VALUES (1), (2)"))
+        conn.execute(text("INSERT INTO posts (post_id, user_id) VALUES (10, 1), (11, 1), (12, 2)"))
+    join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+    cache_path = tmp_path / "results.sqlite"
+
+    first = QueryUtility(engine, metadata, *mock_logger)
+    assert first.enable_result_cache(cache_path)
+    assert first.get_join_row_count(join_conditions) == 3
+    first.close()
+
+    second = QueryUtility(engine, metadata, *mock_logger)
+    second.enable_result_cache(cache_path)
+    assert second.get_join_row_count(join_conditions) == 3
+    assert second.result_cache.hits == 1
+    second.close()
+
+    assert not QueryUtility(create_engine("sqlite://"), metadata, *mock_logger).enable_result_cache(cache_path)
+
+def test_materialized_count_signature_is_not_recorded(tmp_path, mock_logger):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cached.db'}")
+    metadata = MetaData()
+    Table('users', metadata, Column('id', Integer, primary_key=True))
+    Table('posts', metadata, Column('post_id', Integer, primary_key=True), Column('user_id', Integer))
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id) VALUES (1), (2)"))
+        conn.execute(text("INSERT INTO posts (post_id, user_id) VALUES (10, 1), (11, 1), (12, 2)"))
+    utility = QueryUtility(engine, metadata, *mock_logger)
+    try:
+        utility.enable_result_cache(tmp_path / "results.sqlite")
+        utility.enable_index_advisor()
+        utility.enable_incremental_materialization(row_budget=100)
+        join_conditions = [("users", 0, "id", "posts", 0, "user_id")]
+
+        # The count statement only names the cache entry; it is never executed.
+        assert utility.get_join_row_count(join_conditions, materialize=True) == 3
+        assert not utility.index_advisor.plan_counts
+        assert (utility.cache_hits, utility.cache_misses) == (0, 0)
+    finally:
+        utility.close()
@@ -0,0 +1,55 @@
+import sqlite3
+
+from database.result_cache import ResultCache, database_fingerprint, purge_result_cache
+
+
+def test_results_persist_across_instances(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = ResultCache("db1", path, flush_every=2)
+    assert cache.get("SELECT 1") is None
+    cache.put("SELECT 1", 42)
+    assert cache.get("SELECT 1") == 42
+    cache.close()
+
+    reopened = ResultCache("db1", path)
+    assert reopened.get("SELECT 1") == 42
+    # Another database fingerprint does not see the result.
+    assert ResultCache("db2", path).get("SELECT 1") is None
+    assert (reopened.hits, reopened.misses) == (1, 0)
+    reopened.close()
+
+    assert purge_result_cache(path)
+    assert not path.exists()
+    assert not purge_result_cache(path)
+
+
+def test_oldest_results_are_evicted(tmp_path):
+    cache = ResultCache("db", tmp_path / "cache.sqlite", max_entries=2, flush_every=1)
+    for i in range(3):
+        cache.put(f"q{i}", i)
+    assert cache.get("q0") is None
+    assert [cache.get("q1"), cache.get("q2")] == [1, 2]
+    cache.close()
+
+
+def test_fingerprint_changes_with_the_data(tmp_path):
+    database = tmp_path / "data.db"
+    database.write_bytes(b"a" * 200)
+    fingerprint = database_fingerprint(str(database))
+    database.write_bytes(b"b" * 300)
+    assert database_fingerprint(str(database)) != fingerprint
+
+
+def test_fingerprint_sees_commits_still_in_the_wal(tmp_path):
+    database = tmp_path / "data.db"
+    connection = sqlite3.connect(database)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("CREATE TABLE t (x INTEGER)")
+    connection.commit()
+    fingerprint = database_fingerprint(str(database))
+    try:
+        connection.execute("INSERT INTO t VALUES (1)")
+        connection.commit()
+        assert database_fingerprint(str(database)) != fingerprint
+    finally:
+        connection.close()
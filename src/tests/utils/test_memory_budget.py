@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from utils.memory_budget import MemoryBudget, SpillableHeap, SpillableList, SpillableQueue
+
+
+def test_queue_keeps_fifo_order_across_spills():
+    queue = SpillableQueue(keep=2)
+    rng = random.Random(0)
+    popped, pushed = [], 0
+    for _ in range(2000):
+        draw = rng.random()
+        if draw < 0.5:
+            queue.append(pushed)
+            pushed += 1
+        elif draw < 0.6:
+            queue.release_memory()
+        elif queue:
+            popped.append(queue.popleft())
+    while queue:
+        popped.append(queue.popleft())
+    assert popped == list(range(pushed))
+
+
+def test_heap_pops_in_order_across_spills():
+    heap = SpillableHeap(keep=2)
+    rng = random.Random(0)
+    pending = []
+    for counter in range(2000):
+        draw = rng.random()
+        if draw < 0.5:
+            entry = (rng.randint(0, 20), counter)
+            heap.push(entry)
+            pending.append(entry)
+        elif draw < 0.6:
+            heap.release_memory()
+        elif heap:
+            entry = heap.pop()
+            assert entry == min(pending)
+            pending.remove(entry)
+    assert len(heap) == len(pending)
+
+
+def test_list_iterates_spilled_items_in_order():
+    items = SpillableList(range(10))
+    items.release_memory()
+    items.append(10)
+    iterator = iter(items)
+    head = [next(iterator) for _ in range(5)]
+    # A spill during the iteration does not change what it yields.
+    items.release_memory()
+    assert head + list(iterator) == list(range(11))
+    assert len(items) == 11
+    assert items.memory_usage() == 0
+
+
+def test_budget_releases_in_registration_order():
+    budget = MemoryBudget(100, low_water=0.5, track_rss=False)
+    held = {"cache": 80, "frontier": 80}
+    released = []
+
+    def consumer(name):
+        def release(target):
+            released.append(name)
+            freed = min(held[name], target)
+            held[name] -= freed
+            return freed
+        return lambda: held[name], release
+
+    budget.register("cache", *consumer("cache"))
+    budget.register("frontier", *consumer("frontier"))
+    # 160 bytes for a budget of 100: back to 50 bytes, the cache first.
+    assert budget.check() == 110
+    assert released == ["cache", "frontier"]
+    assert held == {"cache": 0, "frontier": 50}
+    assert budget.check() == 0
+    with pytest.raises(ValueError):
+        MemoryBudget(0)
@@ -192,6 +192,7 @@ def test_tgd_rule_export_to_json(sample_tgd_rule, tmp_path):
         "display": "Sample TGD Rule",
         "accuracy": 0.95,
         "confidence": 0.85,
+        "exact": True,
         "correct": True,
         "compatible": True
     }
@@ -285,6 +286,7 @@ def test_rule_io_rule_to_dict_tgd_rule(sample_tgd_rule):
         "display": "Sample TGD Rule",
         "accuracy": 0.95,
         "confidence": 0.85,
+        "exact": True,
         "correct": True,
         "compatible": True
     }
@@ -0,0 +1,351 @@
+"""
+Global memory budget of a run.
+
+The large structures of a run (query caches, materialized joins, traversal
+frontiers, rule buffers, loaded table data) register with a MemoryBudget an
+estimate of their size and a way to release memory: evicting entries that
+can be rebuilt, or spilling entries to disk. When the estimates, or the
+resident size of the process, exceed the budget, the consumers are asked in
+registration order to release memory until the estimates are back under the
+low-water mark, so the run slows down instead of running out of memory.
+"""
+
+import heapq
+import itertools
+import logging
+import pickle
+import sys
+import tempfile
+import time
+from collections import deque
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import psutil
+
+# Fraction of the budget the estimates are brought back under once it is exceeded.
+DEFAULT_LOW_WATER = 0.75
+
+# Seconds between two reads of the resident size of the process.
+RSS_INTERVAL = 1.0
+
+# Entries kept in memory at the front of a spilled frontier.
+DEFAULT_KEEP = 1024
+
+# Items between two size samples of a spillable container.
+SAMPLE_EVERY = 1024
+
+
+def approximate_size(obj: Any, depth: int = 4) -> int:
+    """
+    Rough deep size of an object in bytes: sys.getsizeof of the object and of
+    its items or attributes, ``depth`` levels deep. Shared objects are counted
+    once per reference.
+    """
+    size = sys.getsizeof(obj)
+    if depth == 0 or isinstance(obj, (str, bytes, int, float)):
+        return size
+    if isinstance(obj, dict):
+        items = itertools.chain(obj.keys(), obj.values())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        items = obj
+    elif hasattr(obj, "__dict__"):
+        items = vars(obj).values()
+    else:
+        return size
+    return size + sum(approximate_size(item, depth - 1) for item in items)
+
+
+class MemoryBudget:
+    """
+    Memory budget shared by the large structures of a run.
+
+    Each consumer registers two functions: ``usage()`` returns the estimated
+    bytes it holds, and ``release(target)`` frees about ``target`` bytes (or
+    all it can) and returns the bytes it freed. ``check`` is called at safe
+    points, between two candidates: once the sum of the estimates, or the
+    resident size of the process, is over the limit, the consumers release
+    memory in registration order, so the cheapest to rebuild should register
+    first. Consumers registered again under the same name are replaced.
+
+    :param limit: Budget in bytes.
+    :param low_water: Fraction of the limit the estimates are brought back under.
+    :param track_rss: Also compare the resident size of the process to the limit.
+    :param spill_dir: Directory of the spill files (default: the system temporary directory).
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        low_water: float = DEFAULT_LOW_WATER,
+        track_rss: bool = True,
+        spill_dir: Optional[str] = None,
+    ):
+        if limit <= 0:
+            raise ValueError(f"memory_budget must be a positive number of bytes: {limit}")
+        if not 0 < low_water <= 1:
+            raise ValueError(f"low_water must be in (0, 1]: {low_water}")
+        self.limit = int(limit)
+        self.low_water = low_water
+        self.spill_dir = spill_dir
+        self.checks = 0
+        self.releases = 0
+        self.released_bytes = 0
+        self.peak_bytes = 0
+        self._consumers: dict[str, tuple[Callable[[], int], Callable[[int], int]]] = {}
+        self._process = psutil.Process() if track_rss else None
+        self._rss = 0
+        self._rss_read = float("-inf")
+
+    def register(self, name: str, usage: Callable[[], int], release: Callable[[int], int]):
+        """Register a consumer (see the class docstring)."""
+        self._consumers.pop(name, None)
+        self._consumers[name] = (usage, release)
+
+    def unregister(self, name: str):
+        self._consumers.pop(name, None)
+
+    def usage(self) -> dict[str, int]:
+        """Estimated bytes held by each consumer."""
+        return {name: usage() for name, (usage, _) in self._consumers.items()}
+
+    def check(self) -> int:
+        """Release memory if the budget is exceeded; return the bytes released."""
+        self.checks += 1
+        usage = self.usage()
+        total = sum(usage.values())
+        self.peak_bytes = max(self.peak_bytes, total)
+        excess = total - self.limit
+        rss = self._resident_size()
+        if rss is not None:
+            excess = max(excess, rss - self.limit)
+        if excess <= 0:
+            return 0
+        target = min(total, excess + int(self.limit * (1 - self.low_water)))
+        freed = 0
+        for name, (_, release) in list(self._consumers.items()):
+            if freed >= target:
+                break
+            if usage.get(name, 0) > 0:
+                freed += release(target - freed)
+        self.releases += 1
+        self.released_bytes += freed
+        logging.debug(f"Memory budget exceeded by {excess} bytes, released {freed} bytes")
+        return freed
+
+    def _resident_size(self) -> Optional[int]:
+        if self._process is None:
+            return None
+        now = time.monotonic()
+        if now - self._rss_read >= RSS_INTERVAL:
+            self._rss = self._process.memory_info().rss
+            self._rss_read = now
+        return self._rss
+
+    def summary(self) -> str:
+        return (
+            f"Memory budget {self.limit / 2 ** 20:.0f} MiB: peak estimate "
+            f"{self.peak_bytes / 2 ** 20:.1f} MiB, {self.releases} releases, "
+            f"{self.released_bytes / 2 ** 20:.1f} MiB evicted or spilled"
+        )
+
+
+class _SizeSampler:
+    """Estimated size of the items of a container, sampled every SAMPLE_EVERY items."""
+
+    def __init__(self):
+        self.item_bytes = 0
+        self._seen = 0
+
+    def sample(self, item: Any):
+        if self._seen % SAMPLE_EVERY == 0:
+            self.item_bytes = approximate_size(item)
+        self._seen += 1
+
+
+def _spill_file(spill_dir: Optional[str], items: list):
+    """A new temporary file holding the pickled items."""
+    file = tempfile.TemporaryFile(dir=spill_dir)
+    pickle.dump(items, file, protocol=pickle.HIGHEST_PROTOCOL)
+    return file
+
+
+def _load_spill_file(file) -> list:
+    file.seek(0)
+    items = pickle.load(file)
+    file.close()
+    return items
+
+
+class SpillableList:
+    """
+    Append-only list whose items are moved to a temporary file under memory
+    pressure. Iteration yields the spilled items, then those in memory, in
+    order; the items appended during an iteration are not yielded by it.
+
+    :param items: Initial items.
+    :param spill_dir: Directory of the spill file.
+    """
+
+    def __init__(self, items: Iterable = (), spill_dir: Optional[str] = None):
+        self.spill_dir = spill_dir
+        self._items: list = []
+        self._file = None
+        self._chunks = 0
+        self._spilled = 0
+        self._sizes = _SizeSampler()
+        for item in items:
+            self.append(item)
+
+    def append(self, item: Any):
+        self._sizes.sample(item)
+        self._items.append(item)
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._items)
+
+    def __iter__(self) -> Iterator:
+        in_memory = list(self._items)
+        offset = 0
+        for _ in range(self._chunks):
+            # A spill during the iteration appends to the file and moves its position.
+            self._file.seek(offset)
+            chunk = pickle.load(self._file)
+            offset = self._file.tell()
+            yield from chunk
+        yield from in_memory
+
+    def memory_usage(self) -> int:
+        return len(self._items) * self._sizes.item_bytes
+
+    def release_memory(self, target: int = 0) -> int:
+        """Spill all the items in memory; return the estimated bytes freed."""
+        if not self._items:
+            return 0
+        freed = self.memory_usage()
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(dir=self.spill_dir)
+        self._file.seek(0, 2)
+        pickle.dump(self._items, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._chunks += 1
+        self._spilled += len(self._items)
+        self._items = []
+        return freed
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SpillableQueue:
+    """
+    FIFO queue (the ``append``/``popleft`` subset of a deque) whose entries past
+    the first ``keep`` ones are spilled to temporary files under memory pressure,
+    and loaded back in order once the entries before them are popped.
+
+    :param items: Initial entries.
+    :param spill_dir: Directory of the spill files.
+    :param keep: Entries kept in memory at the front of the queue when spilling.
+    """
+
+    def __init__(self, items: Iterable = (), spill_dir: Optional[str] = None, keep: int = DEFAULT_KEEP):
+        self.spill_dir = spill_dir
+        self.keep = keep
+        self._head: deque = deque()
+        # Spilled chunks come after the head; entries appended after a spill go to the tail.
+        self._chunks: deque = deque()
+        self._tail: deque = deque()
+        self._spilled = 0
+        self._sizes = _SizeSampler()
+        for item in items:
+            self.append(item)
+
+    def append(self, item: Any):
+        self._sizes.sample(item)
+        (self._tail if self._chunks or self._tail else self._head).append(item)
+
+    def popleft(self) -> Any:
+        if not self._head:
+            if self._chunks:
+                file, count = self._chunks.popleft()
+                self._head.extend(_load_spill_file(file))
+                self._spilled -= count
+            else:
+                self._head, self._tail = self._tail, self._head
+        return self._head.popleft()
+
+    def __len__(self) -> int:
+        return len(self._head) + self._spilled + len(self._tail)
+
+    def memory_usage(self) -> int:
+        return (len(self._head) + len(self._tail)) * self._sizes.item_bytes
+
+    def release_memory(self, target: int = 0) -> int:
+        """Spill the tail, or the head past its first ``keep`` entries; return the estimated bytes freed."""
+        if self._chunks:
+            items, self._tail = list(self._tail), deque()
+        else:
+            items = list(itertools.islice(self._head, self.keep, None))
+            for _ in items:
+                self._head.pop()
+        if not items:
+            return 0
+        self._chunks.append((_spill_file(self.spill_dir, items), len(items)))
+        self._spilled += len(items)
+        return len(items) * self._sizes.item_bytes
+
+
+class SpillableHeap:
+    """
+    Min-heap (``push``/``pop``) whose largest entries are spilled to temporary
+    files as sorted runs under memory pressure. A run is loaded back into the
+    heap once its smallest entry is smaller than the top of the heap, so
+    entries are popped in the same order as from a plain heap. Entries must
+    be totally ordered (e.g. tuples with a unique counter).
+
+    :param items: Initial entries.
+    :param spill_dir: Directory of the spill files.
+    :param keep: Smallest entries kept in memory when spilling.
+    """
+
+    def __init__(self, items: Iterable = (), spill_dir: Optional[str] = None, keep: int = DEFAULT_KEEP):
+        self.spill_dir = spill_dir
+        self.keep = keep
+        self._heap: list = []
+        # (smallest entry, run number, file, number of entries) of each spilled run.
+        self._runs: list = []
+        self._run_counter = 0
+        self._spilled = 0
+        self._sizes = _SizeSampler()
+        for item in items:
+            self.push(item)
+
+    def push(self, item: Any):
+        self._sizes.sample(item)
+        heapq.heappush(self._heap, item)
+
+    def pop(self) -> Any:
+        while self._runs and (not self._heap or self._runs[0][0] < self._heap[0]):
+            _, _, file, count = heapq.heappop(self._runs)
+            self._heap.extend(_load_spill_file(file))
+            heapq.heapify(self._heap)
+            self._spilled -= count
+        return heapq.heappop(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._heap) + self._spilled
+
+    def memory_usage(self) -> int:
+        return len(self._heap) * self._sizes.item_bytes
+
+    def release_memory(self, target: int = 0) -> int:
+        """Spill the entries past the ``keep`` smallest as a sorted run; return the estimated bytes freed."""
+        if len(self._heap) <= self.keep:
+            return 0
+        entries = sorted(self._heap)
+        # A sorted list is a valid heap.
+        self._heap, run = entries[:self.keep], entries[self.keep:]
+        self._run_counter += 1
+        heapq.heappush(self._runs, (run[0], self._run_counter, _spill_file(self.spill_dir, run), len(run)))
+        self._spilled += len(run)
+        return len(run) * self._sizes.item_bytes
@@ -113,6 +113,8 @@ class TGDRule:
     confidence: float
     correct: Optional[bool] = None
     compatible: Optional[bool] = None
+    # False when accuracy and confidence are estimated on a sample.
+    exact: bool = True
 
     def export_to_json(self, filepath: str):
         with open(filepath, 'w') as f:
@@ -122,6 +124,7 @@ class TGDRule:
                 "display": self.display,
                 "accuracy": self.accuracy,
                 "confidence": self.confidence,
+                "exact": self.exact,
                 "correct": self.correct,
                 "compatible": self.compatible
             }, f, indent=4)
@@ -299,6 +302,7 @@ class RuleIO:
                 "display": rule.display,
                 "accuracy": rule.accuracy,
                 "confidence": rule.confidence,
+                "exact": rule.exact,
                 "correct": rule.correct,
                 "compatible": rule.compatible
             }
@@ -352,7 +356,8 @@ class RuleIO:
                     accuracy=d.get("accuracy", 0.0),
                     confidence=d.get("confidence", 0.0),
                     correct=d.get("correct"),
-                    compatible=d.get("compatible")
+                    compatible=d.get("compatible"),
+                    exact=d.get("exact", True)
                 )
             else:
                 raise ValueError(f"Unknown rule type: {rule_type}")
@@ -407,7 +412,7 @@ class TGDRuleFactory:
     """
 
     @staticmethod
-    def str_to_tgd(tgd_str: str, support: float, confidence: float) -> TGDRule:
+    def str_to_tgd(tgd_str: str, support: float, confidence: float, exact: bool = True) -> TGDRule:
         # Regular expression pattern to match the TGD format
         pattern = r"∀ (.*): (.*?) ⇒ (∃.*:)?(.*?)$"
         match = re.match(pattern, tgd_str)
@@ -436,7 +441,8 @@ class TGDRuleFactory:
                 head=head,
                 display=tgd_str,
                 accuracy=support,
-                confidence=confidence
+                confidence=confidence,
+                exact=exact
             )
         else:
             raise ValueError(f"Invalid TGD string format: {tgd_str}")